@@ -8,8 +8,10 @@ import subprocess
 import sys
 import time
 import json
-import base64
 import os
+import re
+import socket
+import urllib.request
 from pathlib import Path
 
 class KubernetesDeployer:
@@ -18,6 +20,13 @@ class KubernetesDeployer:
         self.deployment_name = "cloudpose-deployment"
         self.service_name = "cloudpose-service"
         self.image_name = "cloudpose:latest"
+        # 节点本地模型仓库目录 (与deployment.yaml中的hostPath一致)
+        self.model_store_dir = os.getenv("MODEL_STORE_DIR", "/var/lib/cloudpose/models")
+        # 产物服务器地址，其他节点上的Pod缺失模型时从此处拉取
+        # (未设置且集群有多个节点时，部署脚本在本机启动产物服务器)
+        self.model_source = os.getenv("MODEL_SOURCE", "")
+        self.model_source_port = int(os.getenv("MODEL_SOURCE_PORT", "8081"))
+        self.model_sha256 = None
         
     def run_command(self, command, description=""):
         """运行命令并处理错误"""
@@ -96,47 +105,132 @@ metadata:
         
         return True
     
-    def create_model_configmap(self):
-        """创建模型ConfigMap"""
-        print("=== 创建模型ConfigMap ===")
+    def publish_model(self):
+        """将模型发布到节点本地的内容寻址模型仓库"""
+        print("=== 发布模型到本地仓库 ===")
         
         model_path = "yolo11l-pose.pt"
         if not os.path.exists(model_path):
             print(f"❌ 模型文件不存在: {model_path}")
             return False
         
-        # 将模型文件转换为base64
-        with open(model_path, "rb") as f:
-            model_data = base64.b64encode(f.read()).decode()
+        # 模型按校验和存放在hostPath目录中，Pod通过MODEL_SHA256定位模型；
+        # 其他节点上缺失时从本节点的产物服务器拉取 (不再把模型塞进ConfigMap)
+        sys.path.insert(0, "web_service")
+        from model_store import ModelStore
         
-        # 创建ConfigMap YAML
-        configmap_yaml = f"""
-apiVersion: v1
-kind: ConfigMap
-metadata:
-  name: cloudpose-model
-  namespace: {self.namespace}
-data:
-  yolo11l-pose.pt: |
-    {model_data}
-"""
+        store = ModelStore(self.model_store_dir)
+        try:
+            self.model_sha256 = store.add_file(model_path)
+        except OSError as e:
+            print(f"❌ 模型发布失败: {e}")
+            return False
         
-        with open("model-configmap.yaml", "w") as f:
-            f.write(configmap_yaml)
+        print(f"✅ 模型校验和: {self.model_sha256}")
         
-        # 应用ConfigMap
-        if self.run_command(f"kubectl apply -f model-configmap.yaml", "创建模型ConfigMap"):
-            os.remove("model-configmap.yaml")
-            return True
-        else:
+        # 其他节点的hostPath中没有模型，必须能从产物服务器拉取，否则这些Pod永远无法就绪
+        node_ips = self.get_node_ips()
+        if node_ips is None:
             return False
+        if len(node_ips) > 1 and not self.model_source:
+            self.model_source = self.start_artifact_server(node_ips)
+            if not self.model_source:
+                print("❌ 集群有多个节点，但没有可用的产物服务器 (可设置 MODEL_SOURCE 指定)")
+                return False
+        if self.model_source:
+            print(f"📦 其他节点从 {self.model_source} 拉取模型")
+        return True
+    
+    def get_node_ips(self):
+        """返回集群各节点的InternalIP列表，查询失败时返回None"""
+        output = self.run_command("kubectl get nodes -o json", "查询集群节点")
+        if output is None:
+            return None
+        ips = []
+        for node in json.loads(output)["items"]:
+            for address in node["status"].get("addresses", []):
+                if address["type"] == "InternalIP":
+                    ips.append(address["address"])
+        return ips
+    
+    def start_artifact_server(self, node_ips):
+        """
+        在本机后台启动产物服务器 (已在运行时直接复用)
+        Args:
+            node_ips: 集群节点的InternalIP，用于确定其他节点可以访问的本机地址
+        Returns:
+            str: 产物服务器地址，启动失败时返回None
+        """
+        # 向其他节点的地址发起UDP "连接" 不发送数据，只用于选出对应路由上的本机地址
+        local_ip = None
+        for ip in node_ips:
+            try:
+                with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+                    sock.connect((ip, self.model_source_port))
+                    candidate = sock.getsockname()[0]
+            except OSError:
+                continue
+            if candidate != ip:
+                local_ip = candidate
+                break
+        if local_ip is None:
+            print("❌ 无法确定其他节点可以访问的本机地址")
+            return None
+        
+        source = f"http://{local_ip}:{self.model_source_port}"
+        if not self.artifact_available(source):
+            print(f"🔄 在本机启动产物服务器 (端口 {self.model_source_port})")
+            log = open("model_store_server.log", "a")
+            subprocess.Popen(
+                [sys.executable, "web_service/model_store.py", "--root", self.model_store_dir,
+                 "serve", "--port", str(self.model_source_port)],
+                stdout=log, stderr=subprocess.STDOUT, start_new_session=True,
+            )
+            for _ in range(20):
+                time.sleep(0.5)
+                if self.artifact_available(source):
+                    break
+            else:
+                print("❌ 产物服务器未能提供模型，见 model_store_server.log")
+                return None
+        print(f"✅ 产物服务器: {source}")
+        return source
+    
+    def artifact_available(self, source):
+        """产物服务器是否能提供当前模型"""
+        url = f"{source}/sha256/{self.model_sha256}.pt"
+        request = urllib.request.Request(url, method="HEAD")
+        try:
+            with urllib.request.urlopen(request, timeout=5) as response:
+                return response.status == 200
+        except OSError:
+            return False
+    
+    def render_deployment(self, path="deployment.yaml"):
+        """
+        在部署配置中填入模型校验和及拉取来源
+        (写进应用的配置，避免kubectl apply把它们重置为空后再由kubectl set env触发第二次滚动更新)
+        """
+        with open(path) as f:
+            manifest = f.read()
+        for name, value in [("MODEL_SHA256", self.model_sha256 or ""), ("MODEL_SOURCE", self.model_source)]:
+            manifest, count = re.subn(
+                rf'(- name: {name}\n\s+value: )"[^"]*"', lambda m: f'{m.group(1)}"{value}"', manifest
+            )
+            if count != 1:
+                raise ValueError(f"{path} 中没有 {name} 环境变量")
+        return manifest
     
     def deploy_application(self):
         """部署应用程序"""
         print("=== 部署应用程序 ===")
         
-        # 应用部署配置
-        if not self.run_command(f"kubectl apply -f deployment.yaml", "部署应用程序"):
+        # 应用部署配置 (已填入模型校验和及拉取来源)
+        with open("deployment.rendered.yaml", "w") as f:
+            f.write(self.render_deployment())
+        applied = self.run_command("kubectl apply -f deployment.rendered.yaml", "部署应用程序")
+        os.remove("deployment.rendered.yaml")
+        if not applied:
             return False
         
         # 等待部署完成
@@ -284,9 +378,6 @@ data:
         # 删除服务
         self.run_command(f"kubectl delete service {self.service_name} -n {self.namespace}", "删除服务")
         
-        # 删除ConfigMap
-        self.run_command(f"kubectl delete configmap cloudpose-model -n {self.namespace}", "删除ConfigMap")
-        
         # 删除命名空间
         self.run_command(f"kubectl delete namespace {self.namespace}", "删除命名空间")
         
@@ -309,8 +400,8 @@ data:
         if not self.build_and_push_image():
             return False
         
-        # 4. 创建模型ConfigMap
-        if not self.create_model_configmap():
+        # 4. 发布模型到本地仓库
+        if not self.publish_model():
             return False
         
         # 5. 部署应用程序
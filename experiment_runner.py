@@ -14,9 +14,29 @@ from datetime import datetime
 import requests
 
 class ExperimentRunner:
-    def __init__(self, master_ip, nodeport):
+    def __init__(self, master_ip, nodeport, mode="users", rps_levels=None, slo_p95_ms=2000,
+                 open_loop_users=10, generator="locust", loadgen_processes=1):
+        """
+        Args:
+            mode: "users" 闭环模式，以最大并发用户数衡量容量；
+                "rps" 开环模式，以满足延迟目标的最大到达率衡量容量 (不受协调遗漏影响)
+            rps_levels: 开环模式依次测试的到达率 (请求/秒)
+            slo_p95_ms: 开环模式的P95延迟目标(毫秒)
+            open_loop_users: 开环模式的调度用户数 (合计到达率不变)
+            generator: 负载生成器，"locust" 或 "loadgen" (asyncio负载生成器，单机可产生更高的请求速率)
+            loadgen_processes: loadgen的负载进程数
+        """
         self.master_ip = master_ip
         self.nodeport = nodeport
+        self.mode = mode
+        self.rps_levels = rps_levels or [1, 2, 4, 6, 8, 10, 12, 16, 20, 24, 32]
+        self.slo_p95_ms = slo_p95_ms
+        self.open_loop_users = open_loop_users
+        self.generator = generator
+        self.loadgen_processes = loadgen_processes
+        # 实验结果中表示容量的字段
+        self.capacity_key = "max_rps" if mode == "rps" else "max_users"
+        self.capacity_label = "Max RPS" if mode == "rps" else "Max Users"
         self.service_url = f"http://{master_ip}:{nodeport}"
         self.results = []
         self.experiment_data = {
@@ -48,9 +68,12 @@ class ExperimentRunner:
         ):
             return False
         
-        # 等待Pod就绪
+        # 等待Pod就绪 (就绪探针在模型预热完成后才通过)
         print("⏳ 等待Pod就绪...")
-        time.sleep(60)
+        self.run_command(
+            "kubectl rollout status deployment cloudpose-deployment -n cloudpose --timeout=300s",
+            "等待Pod预热完成"
+        )
         
         # 检查Pod状态
         pod_status = self.run_command(
@@ -78,12 +101,15 @@ class ExperimentRunner:
             print(f"❌ 服务健康检查异常: {e}")
             return False
     
-    def run_locust_test(self, num_users, spawn_rate, run_time, test_location):
-        """运行Locust负载测试"""
+    def run_locust_test(self, num_users, spawn_rate, run_time, test_location, target_rps=0):
+        """运行Locust负载测试 (target_rps大于0时为开环模式)"""
         print(f"=== 运行Locust测试 ({test_location}) ===")
         print(f"用户数: {num_users}")
         print(f"生成速率: {spawn_rate} 用户/秒")
         print(f"运行时间: {run_time} 秒")
+        if target_rps:
+            print(f"目标到达率: {target_rps} 请求/秒")
+        tag = f"{target_rps:g}rps" if target_rps else f"{num_users}users"
         
         # 构建Locust命令
         cmd = [
@@ -94,22 +120,45 @@ class ExperimentRunner:
             "--spawn-rate", str(spawn_rate),
             "--run-time", f"{run_time}s",
             "--headless",
-            "--html", f"report_{test_location}_{num_users}users.html",
-            "--csv", f"results_{test_location}_{num_users}users"
+            "--html", f"report_{test_location}_{tag}.html",
+            "--csv", f"results_{test_location}_{tag}"
         ]
+        if self.generator == "loadgen":
+            # loadgen写出与Locust格式兼容的 _stats.csv，闭环模式的等待时间与 CloudPoseUser 相同
+            cmd = [
+                sys.executable, "loadgen.py",
+                "--host", self.service_url,
+                "--run-time", str(run_time),
+                "--processes", str(self.loadgen_processes),
+                "--csv", f"results_{test_location}_{tag}"
+            ] + (["--mode", "open", "--rps", str(target_rps)] if target_rps
+                 else ["--mode", "closed", "--users", str(num_users), "--wait", "1", "3"])
         
         try:
-            result = subprocess.run(cmd, capture_output=True, text=True)
+            env = dict(os.environ, LOCUST_TARGET_RPS=str(target_rps))
+            result = subprocess.run(cmd, capture_output=True, text=True, env=env)
             print("✅ Locust测试完成")
             
             # 解析结果
-            return self.parse_locust_results(f"results_{test_location}_{num_users}users_stats.csv")
+            return self.parse_locust_results(f"results_{test_location}_{tag}_stats.csv")
         except Exception as e:
             print(f"❌ Locust测试失败: {e}")
             return None
     
+    @staticmethod
+    def _column(row, *names):
+        """
+        按列名读取数值: 先用Locust 2.x的列名 (如 "95%"、"Requests/s")，没有时使用旧版列名
+        没有请求时Locust把百分位写为 "N/A"，按0处理
+        """
+        for name in names:
+            if name in row:
+                value = row[name]
+                return 0.0 if value in ("", "N/A") else float(value)
+        raise KeyError(names[0])
+
     def parse_locust_results(self, csv_file):
-        """解析Locust测试结果"""
+        """解析Locust测试结果 (<前缀>_stats.csv 中的 Aggregated 行)"""
         if not os.path.exists(csv_file):
             print(f"❌ 结果文件不存在: {csv_file}")
             return None
@@ -120,13 +169,13 @@ class ExperimentRunner:
                 for row in reader:
                     if row['Name'] == 'Aggregated':
                         return {
-                            'avg_response_time': float(row['Average Response Time']),
-                            'median_response_time': float(row['Median Response Time']),
-                            'p95_response_time': float(row['95% Response Time']),
-                            'p99_response_time': float(row['99% Response Time']),
-                            'requests_per_sec': float(row['Requests/sec']),
-                            'total_requests': int(row['Number of Requests']),
-                            'failed_requests': int(row['Number of Failures'])
+                            'avg_response_time': self._column(row, 'Average Response Time'),
+                            'median_response_time': self._column(row, 'Median Response Time'),
+                            'p95_response_time': self._column(row, '95%', '95% Response Time'),
+                            'p99_response_time': self._column(row, '99%', '99% Response Time'),
+                            'requests_per_sec': self._column(row, 'Requests/s', 'Requests/sec'),
+                            'total_requests': int(self._column(row, 'Request Count', 'Number of Requests')),
+                            'failed_requests': int(self._column(row, 'Failure Count', 'Number of Failures'))
                         }
         except Exception as e:
             print(f"❌ 解析结果失败: {e}")
@@ -162,6 +211,35 @@ class ExperimentRunner:
         
         return max_users, avg_response_time
     
+    def find_max_rps(self, test_location, max_pods):
+        """
+        开环模式: 找到满足P95延迟目标且没有失败的最大到达率
+        到达率与响应时间无关，服务变慢时负载不会随之下降，尾延迟如实反映排队
+        """
+        print(f"=== 寻找最大到达率 ({test_location}, {max_pods} Pods, P95目标 {self.slo_p95_ms}ms) ===")
+        
+        max_rps = 0
+        avg_response_time = 0
+        
+        for rps in self.rps_levels:
+            print(f"测试 {rps} 请求/秒...")
+            
+            result = self.run_locust_test(self.open_loop_users, self.open_loop_users, 60, test_location, rps)
+            
+            if result:
+                if result['failed_requests'] == 0 and result['p95_response_time'] <= self.slo_p95_ms:
+                    max_rps = rps
+                    avg_response_time = result['avg_response_time']
+                    print(f"✅ {rps} 请求/秒测试成功 (P95 {result['p95_response_time']}ms)")
+                else:
+                    print(f"❌ {rps} 请求/秒未达标 (失败 {result['failed_requests']}, P95 {result['p95_response_time']}ms)")
+                    break
+            else:
+                print(f"❌ {rps} 请求/秒测试异常")
+                break
+        
+        return max_rps, avg_response_time
+    
     def run_experiment(self, pod_count, test_location):
         """运行单个实验"""
         print(f"=== 运行实验: {pod_count} Pods, {test_location} ===")
@@ -174,13 +252,17 @@ class ExperimentRunner:
         if not self.test_service_health():
             return None
         
-        # 3. 寻找最大用户数
-        max_users, avg_response_time = self.find_max_users(test_location, pod_count)
+        # 3. 寻找最大用户数 (开环模式为最大到达率)
+        if self.mode == "rps":
+            capacity, avg_response_time = self.find_max_rps(test_location, pod_count)
+        else:
+            capacity, avg_response_time = self.find_max_users(test_location, pod_count)
         
         return {
             'pod_count': pod_count,
             'test_location': test_location,
-            'max_users': max_users,
+            'mode': self.mode,
+            self.capacity_key: capacity,
             'avg_response_time': avg_response_time
         }
     
@@ -209,7 +291,7 @@ class ExperimentRunner:
                         self.experiment_data[test_location] = {}
                     
                     self.experiment_data[test_location][pod_count] = {
-                        'max_users': result['max_users'],
+                        self.capacity_key: result[self.capacity_key],
                         'avg_response_time': result['avg_response_time']
                     }
                 
@@ -250,7 +332,7 @@ class ExperimentRunner:
         with open(csv_file, 'w', newline='') as f:
             writer = csv.writer(f)
             writer.writerow(['# of Pods', 'Nectar/Azure', '', '', 'Master', '', ''])
-            writer.writerow(['', 'Max Users', 'Avg. Response Time (ms)', '', 'Max Users', 'Avg. Response Time (ms)', ''])
+            writer.writerow(['', self.capacity_label, 'Avg. Response Time (ms)', '', self.capacity_label, 'Avg. Response Time (ms)', ''])
             
             for pod_count in [1, 2, 3, 4]:
                 row = [pod_count]
@@ -258,14 +340,14 @@ class ExperimentRunner:
                 # Nectar/Azure数据
                 if pod_count in self.experiment_data.get("nectar_azure", {}):
                     nectar_data = self.experiment_data["nectar_azure"][pod_count]
-                    row.extend([nectar_data['max_users'], nectar_data['avg_response_time'], ''])
+                    row.extend([nectar_data[self.capacity_key], nectar_data['avg_response_time'], ''])
                 else:
                     row.extend(['', '', ''])
                 
                 # Master数据
                 if pod_count in self.experiment_data.get("master_node", {}):
                     master_data = self.experiment_data["master_node"][pod_count]
-                    row.extend([master_data['max_users'], master_data['avg_response_time'], ''])
+                    row.extend([master_data[self.capacity_key], master_data['avg_response_time'], ''])
                 else:
                     row.extend(['', '', ''])
                 
@@ -287,14 +369,18 @@ class ExperimentRunner:
             pod_counts = [1, 2, 3, 4]
             
             # 最大用户数图表
-            master_users = [self.experiment_data.get("master_node", {}).get(pod, {}).get('max_users', 0) for pod in pod_counts]
-            nectar_users = [self.experiment_data.get("nectar_azure", {}).get(pod, {}).get('max_users', 0) for pod in pod_counts]
+            master_users = [self.experiment_data.get("master_node", {}).get(pod, {}).get(self.capacity_key, 0) for pod in pod_counts]
+            nectar_users = [self.experiment_data.get("nectar_azure", {}).get(pod, {}).get(self.capacity_key, 0) for pod in pod_counts]
             
             ax1.plot(pod_counts, master_users, 'o-', label='Master Node', linewidth=2, markersize=8)
             ax1.plot(pod_counts, nectar_users, 's-', label='Nectar/Azure', linewidth=2, markersize=8)
             ax1.set_xlabel('Number of Pods')
-            ax1.set_ylabel('Max Concurrent Users')
-            ax1.set_title('Maximum Concurrent Users vs Number of Pods')
+            if self.mode == "rps":
+                ax1.set_ylabel(f'Max RPS (P95 <= {self.slo_p95_ms}ms)')
+                ax1.set_title('Maximum Arrival Rate vs Number of Pods')
+            else:
+                ax1.set_ylabel('Max Concurrent Users')
+                ax1.set_title('Maximum Concurrent Users vs Number of Pods')
             ax1.legend()
             ax1.grid(True, alpha=0.3)
             
@@ -329,15 +415,15 @@ class ExperimentRunner:
         
         print("\n| # of Pods | Nectar/Azure |                         | Master    |                         |")
         print("| --------- | ------------ | ----------------------- | --------- | ----------------------- |")
-        print("|           | Max Users    | Avg. Response Time (ms) | Max Users | Avg. Response Time (ms) |")
+        print(f"|           | {self.capacity_label:<12} | Avg. Response Time (ms) | {self.capacity_label:<9} | Avg. Response Time (ms) |")
         
         for pod_count in [1, 2, 3, 4]:
             nectar_data = self.experiment_data.get("nectar_azure", {}).get(pod_count, {})
             master_data = self.experiment_data.get("master_node", {}).get(pod_count, {})
             
-            nectar_users = nectar_data.get('max_users', '')
+            nectar_users = nectar_data.get(self.capacity_key, '')
             nectar_response = nectar_data.get('avg_response_time', '')
-            master_users = master_data.get('max_users', '')
+            master_users = master_data.get(self.capacity_key, '')
             master_response = master_data.get('avg_response_time', '')
             
             print(f"| {pod_count}         | {nectar_users:<11} | {nectar_response:<24} | {master_users:<9} | {master_response:<24} |")
@@ -351,11 +437,20 @@ def main():
     parser.add_argument("--nodeport", type=int, default=30000, help="NodePort端口")
     parser.add_argument("--test-location", choices=["master_node", "nectar_azure", "both"], 
                        default="both", help="测试位置")
+    parser.add_argument("--mode", choices=["users", "rps"], default="users",
+                       help="users: 闭环模式，寻找最大并发用户数; rps: 开环模式，寻找满足P95目标的最大到达率")
+    parser.add_argument("--rps-levels", type=float, nargs="+", help="开环模式依次测试的到达率 (请求/秒)")
+    parser.add_argument("--slo-p95-ms", type=float, default=2000, help="开环模式的P95延迟目标(毫秒)")
+    parser.add_argument("--open-loop-users", type=int, default=10, help="开环模式的调度用户数")
+    parser.add_argument("--generator", choices=["locust", "loadgen"], default="locust", help="负载生成器")
+    parser.add_argument("--loadgen-processes", type=int, default=1, help="loadgen的负载进程数")
     
     args = parser.parse_args()
     
     # 创建实验运行器
-    runner = ExperimentRunner(args.master_ip, args.nodeport)
+    runner = ExperimentRunner(args.master_ip, args.nodeport, mode=args.mode, rps_levels=args.rps_levels,
+                              slo_p95_ms=args.slo_p95_ms, open_loop_users=args.open_loop_users,
+                              generator=args.generator, loadgen_processes=args.loadgen_processes)
     
     # 运行实验
     runner.run_all_experiments()
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+负载测试延迟报告
+客户端延迟记录在HDR风格的直方图中 (对数分桶，相对误差约为 precision/2)，直方图可以跨进程、跨Locust工作节点合并，
+合并后仍能给出直到p99.99的完整百分位曲线。
+/api/pose 的响应带有服务端各阶段耗时 (speed_decode、speed_queue、speed_inference 等)，
+把它们与同一请求的客户端延迟对应起来，就可以把延迟拆分为网络/排队时间 (客户端延迟 - 服务端总耗时) 和各阶段的计算时间。
+
+用法:
+    python latency_report.py results_8rps_latency.json [其他报告 ...]   # 合并并打印多个报告
+"""
+
+import collections
+import csv
+import json
+import math
+
+# 百分位曲线上的点
+PERCENTILES = [0, 10, 20, 30, 40, 50, 60, 70, 75, 80, 85, 90, 95, 97.5, 99, 99.5, 99.9, 99.95, 99.99, 100]
+
+# 服务端响应中的阶段耗时字段 (毫秒)
+SERVER_STAGES = [
+    ("decode", "speed_decode"),
+    ("queue", "speed_queue"),
+    ("preprocess", "speed_preprocess"),
+    ("inference", "speed_inference"),
+    ("postprocess", "speed_postprocess"),
+]
+
+# 报告中各序列的顺序
+SERIES = ["client", "network", "server_total"] + [stage for stage, _ in SERVER_STAGES] + ["server_other"]
+
+
+class LatencyHistogram:
+    """对数分桶的延迟直方图 (毫秒)，可合并"""
+
+    # 最小可分辨的延迟 (毫秒)，更小的值计入第一个桶
+    MIN_VALUE = 0.001
+
+    def __init__(self, precision=0.01):
+        """
+        Args:
+            precision: 相邻桶边界的相对间隔
+        """
+        self.precision = precision
+        self._log_base = math.log1p(precision)
+        self.counts = collections.Counter()
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def record(self, value):
+        """记录一个延迟值 (毫秒)"""
+        value = max(0.0, float(value))
+        index = int(math.log(value / self.MIN_VALUE) / self._log_base) if value > self.MIN_VALUE else 0
+        self.counts[index] += 1
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def _bucket_value(self, index):
+        """桶的代表值 (桶内的几何中点)"""
+        return self.MIN_VALUE * math.exp((index + 0.5) * self._log_base)
+
+    def merge(self, other):
+        """合并另一个直方图 (精度须相同)"""
+        if other.precision != self.precision:
+            raise ValueError("只能合并精度相同的直方图")
+        self.counts.update(other.counts)
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def value_at(self, percentile):
+        """
+        百分位对应的延迟
+        Args:
+            percentile: 0-100
+        """
+        if not self.count:
+            return 0.0
+        if percentile <= 0:
+            return self.min
+        if percentile >= 100:
+            return self.max
+        target = math.ceil(percentile / 100 * self.count)
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                return min(max(self._bucket_value(index), self.min), self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            "precision": self.precision,
+            "counts": {str(index): count for index, count in self.counts.items()},
+            "count": self.count,
+            "total": self.total,
+            "min": self.min if self.count else None,
+            "max": self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls(data["precision"])
+        histogram.counts = collections.Counter({int(index): count for index, count in data["counts"].items()})
+        histogram.count = data["count"]
+        histogram.total = data["total"]
+        histogram.min = data["min"] if data["min"] is not None else math.inf
+        histogram.max = data["max"]
+        return histogram
+
+
+class StageRecorder:
+    """按序列 (客户端、网络/排队、服务端各阶段) 记录延迟直方图"""
+
+    def __init__(self, precision=0.01):
+        self.precision = precision
+        self.histograms = {}
+
+    def _histogram(self, series):
+        if series not in self.histograms:
+            self.histograms[series] = LatencyHistogram(self.precision)
+        return self.histograms[series]
+
+    def record_response(self, client_ms, body=None):
+        """
+        记录一个请求
+        Args:
+            client_ms: 客户端测得的延迟(毫秒)
+            body: 解析后的响应 (带 speed_* 字段时记录服务端阶段耗时)
+        """
+        self._histogram("client").record(client_ms)
+        server_total = body.get("speed_total") if isinstance(body, dict) else None
+        if server_total is None:
+            return
+        self._histogram("server_total").record(server_total)
+        self._histogram("network").record(max(0.0, client_ms - server_total))
+        stages_total = 0.0
+        for stage, field in SERVER_STAGES:
+            if field in body:
+                self._histogram(stage).record(body[field])
+                stages_total += body[field]
+        self._histogram("server_other").record(max(0.0, server_total - stages_total))
+
+    def export(self, reset=False):
+        """导出为可序列化的字典 (reset=True时清空，用于向Locust主节点增量汇报)"""
+        data = {series: histogram.to_dict() for series, histogram in self.histograms.items()}
+        if reset:
+            self.histograms = {}
+        return data
+
+    def merge_dict(self, data):
+        """合并另一个进程或工作节点导出的直方图"""
+        for series, histogram in data.items():
+            self._histogram(series).merge(LatencyHistogram.from_dict(histogram))
+
+    def report(self):
+        """
+        生成报告
+        Returns:
+            dict: series 为每个序列的统计和百分位曲线，breakdown 为客户端平均延迟的拆分
+        """
+        series = {}
+        for name in SERIES:
+            histogram = self.histograms.get(name)
+            if histogram is None or not histogram.count:
+                continue
+            series[name] = {
+                "count": histogram.count,
+                "mean": round(histogram.mean, 3),
+                "min": round(histogram.min, 3),
+                "max": round(histogram.max, 3),
+                "percentiles": {f"{p:g}": round(histogram.value_at(p), 3) for p in PERCENTILES},
+            }
+
+        # 平均值可以相加: 客户端平均延迟 = 网络/排队 + 服务端各阶段 + 其他
+        breakdown = {}
+        client = series.get("client")
+        if client and "server_total" in series:
+            for name in ["network"] + [stage for stage, _ in SERVER_STAGES] + ["server_other"]:
+                if name in series:
+                    breakdown[name] = {
+                        "mean_ms": series[name]["mean"],
+                        "share": round(series[name]["mean"] / client["mean"], 4) if client["mean"] else 0.0,
+                    }
+        return {"series": series, "breakdown": breakdown}
+
+    def write(self, prefix):
+        """写出 <prefix>_latency.json (报告和可合并的直方图) 和 <prefix>_latency.csv (百分位曲线)"""
+        report = self.report()
+        report["histograms"] = self.export()
+        with open(f"{prefix}_latency.json", "w") as f:
+            json.dump(report, f, indent=2)
+        with open(f"{prefix}_latency.csv", "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["Series", "Count", "Mean"] + [f"{p:g}%" for p in PERCENTILES])
+            for name, stats in report["series"].items():
+                writer.writerow([name, stats["count"], stats["mean"]] + list(stats["percentiles"].values()))
+        return report
+
+    def print_summary(self):
+        """打印各序列的关键百分位和平均延迟的拆分"""
+        report = self.report()
+        columns = ["50", "90", "99", "99.9", "99.99", "100"]
+        print(f"{'序列':>14} | {'请求数':>8} | {'平均':>9} | " + " | ".join(f"p{c:>6}" for c in columns))
+        for name, stats in report["series"].items():
+            print(f"{name:>14} | {stats['count']:>8} | {stats['mean']:>9.2f} | "
+                  + " | ".join(f"{stats['percentiles'][c]:>7.2f}" for c in columns))
+        if report["breakdown"]:
+            print("客户端平均延迟拆分: " + ", ".join(
+                f"{name} {entry['mean_ms']:.2f}ms ({entry['share'] * 100:.1f}%)"
+                for name, entry in report["breakdown"].items()
+            ))
+
+
+def load_report(path):
+    """读取 _latency.json 中的直方图"""
+    recorder = StageRecorder()
+    with open(path) as f:
+        recorder.merge_dict(json.load(f)["histograms"])
+    return recorder
+
+
+def main():
+    """命令行入口: 合并多个延迟报告 (如多台负载机) 并打印"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="合并并打印负载测试延迟报告")
+    parser.add_argument("reports", nargs="+", help="_latency.json 文件")
+    parser.add_argument("--output", help="合并结果的前缀 (写出 <前缀>_latency.json/.csv)")
+    args = parser.parse_args()
+
+    merged = StageRecorder()
+    for path in args.reports:
+        merged.merge_dict(load_report(path).export())
+    merged.print_summary()
+    if args.output:
+        merged.write(args.output)
+        print(f"结果已保存: {args.output}_latency.json")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+asyncio负载生成器
+单个Locust进程在服务饱和之前往往先耗尽自己的CPU。本工具用httpx连接池和asyncio发送请求，
+使用与 locustfile.py 相同的请求语料 (pose_corpus.py) 和端点，每个核心可以产生高得多的请求速率。
+
+- closed: 闭环模式，--users 个并发用户各自收到响应 (并等待 --wait) 后发送下一个请求，端点比例与 CloudPoseUser 相同
+- open: 开环模式，按 --rps 的泊松或固定间隔到达率向 --path 发送请求，响应时间从计划发送时间开始计算
+--processes 把负载分到多个进程 (每个进程一个事件循环)，结果合并后写出与Locust格式兼容的
+<csv前缀>_stats.csv 和 <csv前缀>_failures.csv，experiment_runner.py 可以直接解析。
+/api/pose 响应中的服务端阶段耗时记录在可合并的延迟直方图中 (latency_report.py)，写出 <csv前缀>_latency.json/.csv。
+
+用法:
+    python loadgen.py --host http://$NODE_IP:$NODEPORT --mode closed --users 200 --run-time 60 --csv results
+    python loadgen.py --host http://$NODE_IP:$NODEPORT --mode open --rps 500 --processes 4 --csv results_500rps
+"""
+
+import asyncio
+import collections
+import csv
+import random
+import time
+
+import httpx
+
+from latency_report import StageRecorder
+from pose_corpus import get_corpus
+
+# 闭环模式的端点和权重 (与 locustfile.CloudPoseUser 的任务相同)
+TASKS = [
+    ("POST", "/api/pose", 3),
+    ("POST", "/api/pose_image", 1),
+    ("GET", "/health", 1),
+    ("GET", "/docs", 1),
+]
+
+PERCENTILES = [0.5, 0.66, 0.75, 0.8, 0.9, 0.95, 0.98, 0.99, 0.999, 0.9999, 1.0]
+
+
+class Stats:
+    """按端点统计响应时间、失败数和响应大小"""
+
+    def __init__(self):
+        self.times = collections.defaultdict(list)
+        self.failures = collections.Counter()
+        self.bytes = collections.Counter()
+        self.errors = collections.Counter()
+        self.latency = StageRecorder()
+        # 施加负载的时长(秒)，多个进程合并时取最长的一个
+        self.elapsed = 0.0
+
+    def record(self, method, name, response_time, length, error=None):
+        """
+        记录一个请求
+        Args:
+            response_time: 响应时间(毫秒)
+            error: 失败原因，成功时为None
+        """
+        key = (method, name)
+        self.times[key].append(response_time)
+        self.bytes[key] += length
+        if error is not None:
+            self.failures[key] += 1
+            self.errors[(method, name, error)] += 1
+
+    def to_dict(self):
+        return {"times": dict(self.times), "failures": dict(self.failures),
+                "bytes": dict(self.bytes), "errors": dict(self.errors),
+                "latency": self.latency.export(), "elapsed": self.elapsed}
+
+    def merge(self, data):
+        """合并另一个进程的统计 (to_dict的返回值)"""
+        for key, times in data["times"].items():
+            self.times[key].extend(times)
+        self.failures.update(data["failures"])
+        self.bytes.update(data["bytes"])
+        self.errors.update(data["errors"])
+        self.latency.merge_dict(data["latency"])
+        self.elapsed = max(self.elapsed, data["elapsed"])
+
+    def rows(self, elapsed):
+        """按Locust _stats.csv 的格式生成各端点和汇总 (Aggregated) 行"""
+        rows = [self._row(method, name, self.times[(method, name)], self.failures[(method, name)],
+                          self.bytes[(method, name)], elapsed)
+                for method, name in sorted(self.times, key=lambda key: key[1])]
+        all_times = [t for times in self.times.values() for t in times]
+        rows.append(self._row("", "Aggregated", all_times, sum(self.failures.values()),
+                              sum(self.bytes.values()), elapsed))
+        return rows
+
+    @staticmethod
+    def _row(method, name, times, failures, total_bytes, elapsed):
+        count = len(times)
+        ordered = sorted(times)
+
+        def percentile(p):
+            if not ordered:
+                return 0
+            return round(ordered[min(count - 1, max(0, int(round(p * count)) - 1))])
+
+        median = percentile(0.5)
+        average = sum(ordered) / count if count else 0.0
+        rps = count / elapsed if elapsed else 0.0
+        row = {
+            "Type": method,
+            "Name": name,
+            "Request Count": count,
+            "Failure Count": failures,
+            "Median Response Time": median,
+            "Average Response Time": round(average, 2),
+            "Min Response Time": round(ordered[0]) if ordered else 0,
+            "Max Response Time": round(ordered[-1]) if ordered else 0,
+            "Average Content Size": round(total_bytes / count) if count else 0,
+            "Requests/s": round(rps, 2),
+            "Failures/s": round(failures / elapsed, 2) if elapsed else 0.0,
+        }
+        row.update({f"{p * 100:g}%": percentile(p) for p in PERCENTILES})
+        return row
+
+    def write_csv(self, prefix, elapsed):
+        """写出 <prefix>_stats.csv、<prefix>_failures.csv 和 <prefix>_latency.json/.csv"""
+        rows = self.rows(elapsed)
+        with open(f"{prefix}_stats.csv", "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+            writer.writeheader()
+            writer.writerows(rows)
+        with open(f"{prefix}_failures.csv", "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["Method", "Name", "Error", "Occurrences"])
+            for (method, name, error), count in self.errors.most_common():
+                writer.writerow([method, name, error, count])
+        self.latency.write(prefix)
+
+    def print_table(self, elapsed):
+        """打印汇总表"""
+        columns = ["Type", "Name", "Request Count", "Failure Count", "Average Response Time",
+                   "50%", "95%", "99%", "Requests/s"]
+        print(" | ".join(f"{c:>14}" for c in columns))
+        print("-" * (17 * len(columns)))
+        for row in self.rows(elapsed):
+            print(" | ".join(f"{str(row[c]):>14}" for c in columns))
+
+
+async def send(client, stats, corpus, method, path, start):
+    """
+    发送一个请求并记录
+    Args:
+        start: 计算响应时间的起点 (time.monotonic)，开环模式为计划发送时间
+    """
+    error, length, response = None, 0, None
+    try:
+        if method == "POST":
+            response = await client.post(path, content=random.choice(corpus)["body"],
+                                         headers={"Content-Type": "application/json"})
+        else:
+            response = await client.get(path)
+        length = len(response.content)
+        if response.status_code != 200:
+            error = f"HTTP错误: {response.status_code}"
+    except httpx.HTTPError as e:
+        error = f"{type(e).__name__}: {e}"
+    response_time = (time.monotonic() - start) * 1000
+    stats.record(method, path, response_time, length, error)
+    if error is None and path == "/api/pose":
+        # 客户端延迟与同一响应中的服务端阶段耗时对应记录 (解析响应的时间不计入延迟)
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        stats.latency.record_response(response_time, body)
+
+
+async def closed_loop(client, stats, corpus, users, duration, wait):
+    """闭环: 每个用户收到响应并等待后才发送下一个请求"""
+    methods_paths = [(method, path) for method, path, _ in TASKS]
+    weights = [weight for _, _, weight in TASKS]
+    end = time.monotonic() + duration
+    in_flight = {}  # 用户编号 -> (方法, 端点, 发送时间)
+
+    async def user(index):
+        while time.monotonic() < end:
+            method, path = random.choices(methods_paths, weights)[0]
+            in_flight[index] = (method, path, time.monotonic())
+            await send(client, stats, corpus, method, path, in_flight[index][2])
+            del in_flight[index]
+            if wait[1] > 0:
+                await asyncio.sleep(random.uniform(*wait))
+
+    tasks = [asyncio.create_task(user(i)) for i in range(users)]
+    await asyncio.wait(tasks, timeout=duration)
+    # 与开环模式相同: 结束时仍未完成的请求记为失败 (响应时间记到结束时刻)
+    now = time.monotonic()
+    pending = list(in_flight.values())
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    for method, path, start in pending:
+        stats.record(method, path, (now - start) * 1000, 0, "测试结束时未完成")
+
+
+async def open_loop(client, stats, corpus, rps, duration, path, arrival, max_in_flight):
+    """开环: 按计划时间发送请求，不等待前一个请求完成"""
+    in_flight = {}  # 任务 -> 计划发送时间
+    start = intended = time.monotonic()
+    end = start + duration
+    while True:
+        intended += random.expovariate(rps) if arrival == "poisson" else 1.0 / rps
+        if intended >= end:
+            break
+        delay = intended - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if len(in_flight) >= max_in_flight:
+            stats.record("POST", path, (time.monotonic() - intended) * 1000, 0, "负载生成器在途请求数已达上限")
+            continue
+        task = asyncio.create_task(send(client, stats, corpus, "POST", path, intended))
+        in_flight[task] = intended
+        task.add_done_callback(lambda done: in_flight.pop(done, None))
+
+    # 结束时仍未完成的请求记为失败 (响应时间记到结束时刻)，过载时的尾延迟不会被丢掉
+    now = time.monotonic()
+    pending = list(in_flight.items())
+    for task, _ in pending:
+        task.cancel()
+    await asyncio.gather(*(task for task, _ in pending), return_exceptions=True)
+    for _, task_intended in pending:
+        stats.record("POST", path, (now - task_intended) * 1000, 0, "测试结束时未完成")
+
+
+async def run(args, users, rps):
+    """在当前进程的事件循环中施加负载，返回统计"""
+    corpus = get_corpus()
+    stats = Stats()
+    limits = httpx.Limits(max_connections=args.max_connections, max_keepalive_connections=args.max_connections)
+    async with httpx.AsyncClient(base_url=args.host, limits=limits, timeout=args.timeout) as client:
+        start = time.monotonic()
+        if args.mode == "closed":
+            await closed_loop(client, stats, corpus, users, args.run_time, args.wait)
+        else:
+            await open_loop(client, stats, corpus, rps, args.run_time, args.path, args.arrival, args.max_in_flight)
+        # 请求速率按实际运行时长计算 (包括等待最后一批请求的时间)
+        stats.elapsed = time.monotonic() - start
+    return stats
+
+
+def _worker(args, users, rps):
+    """负载进程入口 (可选使用uvloop)"""
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
+    return asyncio.run(run(args, users, rps)).to_dict()
+
+
+def main():
+    """命令行入口"""
+    import argparse
+    from concurrent.futures import ProcessPoolExecutor
+
+    parser = argparse.ArgumentParser(description="CloudPose asyncio负载生成器")
+    parser.add_argument("--host", required=True, help="服务地址")
+    parser.add_argument("--mode", choices=["closed", "open"], default="closed", help="闭环或开环模式")
+    parser.add_argument("--users", type=int, default=10, help="闭环模式的并发用户数 (所有进程合计)")
+    parser.add_argument("--wait", type=float, nargs=2, default=[0.0, 0.0], metavar=("MIN", "MAX"),
+                        help="闭环模式每个请求后的等待时间范围(秒)，1 3 与 CloudPoseUser 相同")
+    parser.add_argument("--rps", type=float, default=10.0, help="开环模式的目标到达率 (所有进程合计)")
+    parser.add_argument("--arrival", choices=["poisson", "fixed"], default="poisson", help="开环模式的到达过程")
+    parser.add_argument("--path", default="/api/pose", help="开环模式请求的端点")
+    parser.add_argument("--run-time", type=float, default=60, help="运行时间(秒)")
+    parser.add_argument("--processes", type=int, default=1, help="负载进程数")
+    parser.add_argument("--max-connections", type=int, default=1000, help="每个进程的最大连接数")
+    parser.add_argument("--max-in-flight", type=int, default=10000, help="开环模式每个进程同时在途的请求上限")
+    parser.add_argument("--timeout", type=float, default=60, help="请求超时时间(秒)")
+    parser.add_argument("--csv", help="CSV结果前缀 (写出 <前缀>_stats.csv 和 <前缀>_failures.csv)")
+    args = parser.parse_args()
+
+    # 先在主进程中构建语料缓存，子进程 (fork) 直接继承
+    get_corpus()
+    shares = [(args.users // args.processes + (i < args.users % args.processes), args.rps / args.processes)
+              for i in range(args.processes)]
+    print(f"模式: {args.mode}, 进程数: {args.processes}, "
+          + (f"用户数: {args.users}" if args.mode == "closed" else f"目标到达率: {args.rps} 请求/秒"))
+
+    stats = Stats()
+    if args.processes == 1:
+        stats.merge(_worker(args, *shares[0]))
+    else:
+        with ProcessPoolExecutor(args.processes) as executor:
+            for data in executor.map(_worker, [args] * args.processes, *zip(*shares)):
+                stats.merge(data)
+    stats.print_table(stats.elapsed)
+    stats.latency.print_summary()
+    if args.csv:
+        stats.write_csv(args.csv, stats.elapsed)
+        print(f"结果已保存: {args.csv}_stats.csv")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,81 +2,74 @@
 """
 Locust负载测试脚本
 用于测试CloudPose服务的性能
+
+/api/pose 的客户端延迟和响应中的服务端阶段耗时记录在可合并的延迟直方图中 (latency_report.py)，
+分布式模式下各工作节点定期把直方图增量汇报给主节点合并，测试结束时写出 <csv前缀>_latency.json/.csv
 """
 
 import time
 import json
-import base64
 import os
 import random
-from locust import HttpUser, task, between
-from PIL import Image
-import io
+import gevent
+from gevent.pool import Pool
+import requests
+from requests.adapters import HTTPAdapter
+from locust import HttpUser, User, task, between, constant, events
+from locust.runners import WorkerRunner
+from latency_report import StageRecorder
+from pose_corpus import get_corpus
+
+# 开环模式: LOCUST_TARGET_RPS大于0时，按目标到达率发送请求，不等待响应 (避免协调遗漏)，
+# 延迟从计划发送时间开始计算；否则使用闭环的 CloudPoseUser
+TARGET_RPS = float(os.getenv("LOCUST_TARGET_RPS", "0"))
+# 到达过程: poisson (指数分布的间隔) 或 fixed (固定间隔)
+ARRIVAL = os.getenv("LOCUST_ARRIVAL", "poisson")
+OPEN_LOOP_PATH = os.getenv("LOCUST_OPEN_LOOP_PATH", "/api/pose")
+# 每个进程同时在途的请求上限，超过时记为失败 (负载生成器本身过载)
+MAX_IN_FLIGHT = int(os.getenv("LOCUST_MAX_IN_FLIGHT", "1000"))
+REQUEST_TIMEOUT = float(os.getenv("LOCUST_REQUEST_TIMEOUT", "60"))
+
+# 本进程的延迟直方图 (主节点上为各工作节点汇报的合并结果)
+latency_recorder = StageRecorder()
+# 本进程所有开环用户共用的在途请求协程池 (MAX_IN_FLIGHT按进程计)
+in_flight = Pool()
+
+@events.init.add_listener
+def on_locust_init(environment, **kwargs):
+    """进程启动时构建语料 (或加载缓存)，不占用用户生成阶段的时间"""
+    get_corpus()
+
+@events.report_to_master.add_listener
+def on_report_to_master(client_id, data):
+    """工作节点: 把上次汇报之后的直方图增量附加到统计消息中"""
+    data["latency_histograms"] = latency_recorder.export(reset=True)
+
+@events.worker_report.add_listener
+def on_worker_report(client_id, data):
+    """主节点: 合并工作节点汇报的直方图"""
+    latency_recorder.merge_dict(data.get("latency_histograms", {}))
+
+@events.quitting.add_listener
+def on_quitting(environment, **kwargs):
+    """主节点或单机模式: 写出延迟报告并打印客户端延迟的拆分"""
+    if isinstance(environment.runner, WorkerRunner) or not latency_recorder.histograms:
+        return
+    latency_recorder.print_summary()
+    prefix = getattr(environment.parsed_options, "csv_prefix", None)
+    if prefix:
+        latency_recorder.write(prefix)
 
 class CloudPoseUser(HttpUser):
-    """CloudPose负载测试用户类"""
+    """CloudPose负载测试用户类 (闭环: 收到响应并等待后才发送下一个请求)"""
     
+    abstract = TARGET_RPS > 0
     wait_time = between(1, 3)  # 用户等待时间1-3秒
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.images = []
-        self.load_test_images()
-    
-    def load_test_images(self):
-        """加载测试图像"""
-        # 图像文件夹路径
-        image_folder = "../client/inputfolder"
-        
-        if os.path.exists(image_folder):
-            # 获取所有图像文件
-            image_files = [f for f in os.listdir(image_folder) 
-                         if f.lower().endswith(('.jpg', '.jpeg', '.png'))]
-            
-            for image_file in image_files[:20]:  # 限制加载20张图像
-                image_path = os.path.join(image_folder, image_file)
-                try:
-                    # 读取图像并转换为base64
-                    with open(image_path, "rb") as f:
-                        image_data = f.read()
-                    
-                    # 压缩图像以减少传输大小
-                    img = Image.open(io.BytesIO(image_data))
-                    img = img.resize((640, 480))  # 调整大小
-                    
-                    # 转换为JPEG格式
-                    buffer = io.BytesIO()
-                    img.save(buffer, format='JPEG', quality=85)
-                    compressed_data = buffer.getvalue()
-                    
-                    # 转换为base64
-                    base64_image = base64.b64encode(compressed_data).decode('utf-8')
-                    
-                    self.images.append({
-                        'id': f"test_{image_file}",
-                        'image': base64_image
-                    })
-                    
-                except Exception as e:
-                    print(f"加载图像失败 {image_file}: {e}")
-        
-        # 如果没有找到图像，创建测试数据
-        if not self.images:
-            self.create_test_data()
-    
-    def create_test_data(self):
-        """创建测试数据"""
-        # 创建一个简单的测试图像
-        img = Image.new('RGB', (640, 480), color='white')
-        buffer = io.BytesIO()
-        img.save(buffer, format='JPEG')
-        test_image_data = buffer.getvalue()
-        base64_image = base64.b64encode(test_image_data).decode('utf-8')
-        
-        self.images.append({
-            'id': 'test_image_1',
-            'image': base64_image
-        })
+        # 语料每个进程只构建一次，所有用户共享同一份只读的请求体
+        self.images = get_corpus()
     
     @task(3)
     def test_pose_detection_json(self):
@@ -84,28 +77,26 @@ class CloudPoseUser(HttpUser):
         if not self.images:
             return
         
-        # 随机选择一张图像
+        # 随机选择一张图像 (请求体已预先序列化)
         test_data = random.choice(self.images)
         
-        # 准备请求数据
-        payload = {
-            "id": test_data['id'],
-            "image": test_data['image']
-        }
-        
         # 发送请求
+        start = time.perf_counter()
         with self.client.post(
             "/api/pose",
-            json=payload,
+            data=test_data['body'],
             headers={"Content-Type": "application/json"},
             catch_response=True
         ) as response:
+            client_ms = (time.perf_counter() - start) * 1000
             if response.status_code == 200:
                 try:
                     result = response.json()
                     # 验证响应格式
                     if 'count' in result and 'keypoints' in result:
                         response.success()
+                        # 记录客户端延迟和服务端各阶段耗时 (speed_*)
+                        latency_recorder.record_response(client_ms, result)
                     else:
                         response.failure("响应格式不正确")
                 except json.JSONDecodeError:
@@ -119,19 +110,13 @@ class CloudPoseUser(HttpUser):
         if not self.images:
             return
         
-        # 随机选择一张图像
+        # 随机选择一张图像 (请求体已预先序列化)
         test_data = random.choice(self.images)
         
-        # 准备请求数据
-        payload = {
-            "id": test_data['id'],
-            "image": test_data['image']
-        }
-        
         # 发送请求
         with self.client.post(
             "/api/pose_image",
-            json=payload,
+            data=test_data['body'],
             headers={"Content-Type": "application/json"},
             catch_response=True
         ) as response:
@@ -166,6 +151,88 @@ class CloudPoseUser(HttpUser):
             else:
                 response.failure(f"文档访问失败: {response.status_code}")
 
+class OpenLoopUser(User):
+    """
+    开环负载用户: 按泊松或固定间隔的计划时间发送请求，不等待前一个请求完成
+    所有用户合计的到达率为 LOCUST_TARGET_RPS；服务变慢时发送速率不变，
+    响应时间从计划发送时间开始计算，因此负载生成器落后于计划时的排队时间也计入延迟
+    """
+    
+    abstract = TARGET_RPS <= 0
+    wait_time = constant(0)
+    
+    def on_start(self):
+        self.images = get_corpus()
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=MAX_IN_FLIGHT))
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=MAX_IN_FLIGHT))
+        # 本用户在途的请求 {协程: 计划发送时间}
+        self.pending = {}
+    
+    def on_stop(self):
+        """测试结束时仍在途的请求记为失败 (延迟从计划发送时间算起)，再终止其协程"""
+        pending, self.pending = self.pending, {}
+        for greenlet, intended in pending.items():
+            self.report(intended, 0, Exception("测试结束时未完成"))
+        gevent.killall(list(pending))
+    
+    @task
+    def schedule(self):
+        """按计划时间持续发起请求 (每个请求在独立的协程中发送)"""
+        users = max(1, self.environment.parsed_options.num_users or 1)
+        rate = TARGET_RPS / users
+        intended = time.time()
+        while True:
+            intended += random.expovariate(rate) if ARRIVAL == "poisson" else 1.0 / rate
+            delay = intended - time.time()
+            if delay > 0:
+                gevent.sleep(delay)
+            if len(in_flight) >= MAX_IN_FLIGHT:
+                self.report(intended, 0, Exception("负载生成器在途请求数已达上限"))
+                continue
+            greenlet = in_flight.spawn(self.send, intended)
+            self.pending[greenlet] = intended
+    
+    def send(self, intended):
+        """发送一个请求，按计划发送时间记录响应时间"""
+        test_data = random.choice(self.images)
+        exception, length, response = None, 0, None
+        try:
+            response = self.session.post(
+                self.host + OPEN_LOOP_PATH,
+                data=test_data['body'],
+                headers={"Content-Type": "application/json"},
+                timeout=REQUEST_TIMEOUT
+            )
+            length = len(response.content)
+            if response.status_code != 200:
+                exception = Exception(f"HTTP错误: {response.status_code}")
+        except Exception as e:
+            exception = e
+        if self.pending.pop(gevent.getcurrent(), None) is None:
+            # on_stop已经把这个请求记为未完成
+            return
+        response_time = self.report(intended, length, exception)
+        if exception is None and OPEN_LOOP_PATH == "/api/pose":
+            try:
+                result = response.json()
+            except ValueError:
+                result = None
+            latency_recorder.record_response(response_time, result)
+    
+    def report(self, intended, length, exception):
+        """触发Locust的request事件，返回记录的响应时间(毫秒)"""
+        response_time = (time.time() - intended) * 1000
+        self.environment.events.request.fire(
+            request_type="POST",
+            name=OPEN_LOOP_PATH,
+            response_time=response_time,
+            response_length=length,
+            exception=exception,
+            context={}
+        )
+        return response_time
+
 class CloudPoseLoadTest:
     """CloudPose负载测试类"""
     
@@ -193,14 +260,16 @@ class CloudPoseLoadTest:
         except Exception as e:
             print(f"API文档访问失败: {e}")
     
-    def run_performance_test(self, num_users=10, spawn_rate=1, run_time=60):
-        """运行性能测试"""
+    def run_performance_test(self, num_users=10, spawn_rate=1, run_time=60, target_rps=0):
+        """运行性能测试 (target_rps大于0时为开环模式)"""
         import subprocess
         
         print(f"=== 性能测试 ===")
         print(f"用户数: {num_users}")
         print(f"生成速率: {spawn_rate} 用户/秒")
         print(f"运行时间: {run_time} 秒")
+        if target_rps:
+            print(f"开环模式，目标到达率: {target_rps} 请求/秒 ({ARRIVAL})")
         
         # 构建Locust命令
         cmd = [
@@ -216,7 +285,8 @@ class CloudPoseLoadTest:
         ]
         
         try:
-            result = subprocess.run(cmd, capture_output=True, text=True)
+            env = dict(os.environ, LOCUST_TARGET_RPS=str(target_rps))
+            result = subprocess.run(cmd, capture_output=True, text=True, env=env)
             print("性能测试完成")
             print(f"退出码: {result.returncode}")
             if result.stdout:
@@ -235,6 +305,7 @@ def main():
     parser.add_argument("--users", type=int, default=10, help="并发用户数")
     parser.add_argument("--spawn-rate", type=int, default=1, help="用户生成速率")
     parser.add_argument("--run-time", type=int, default=60, help="运行时间(秒)")
+    parser.add_argument("--target-rps", type=float, default=0, help="开环模式的目标到达率 (0表示闭环模式)")
     parser.add_argument("--test-type", choices=["basic", "performance", "both"], 
                        default="both", help="测试类型")
     
@@ -247,7 +318,7 @@ def main():
         tester.run_basic_test()
     
     if args.test_type in ["performance", "both"]:
-        tester.run_performance_test(args.users, args.spawn_rate, args.run_time)
+        tester.run_performance_test(args.users, args.spawn_rate, args.run_time, args.target_rps)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
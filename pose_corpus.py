@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+负载测试图像语料
+每个负载生成进程只构建一次语料 (或从预先构建的磁盘缓存加载)，所有模拟用户只读共享。
+语料中每一项是已经序列化好的请求体字节，发送请求时不再做JSON和base64编码。
+
+缓存文件为JSONL格式，每行就是一个完整的 /api/pose 请求体:
+    python pose_corpus.py --images ../client/inputfolder --output corpus.jsonl
+    CORPUS_CACHE=corpus.jsonl locust -f locustfile.py ...
+"""
+
+import base64
+import io
+import json
+import os
+import threading
+
+# 语料来源 (可用环境变量覆盖)
+DEFAULT_IMAGE_FOLDER = os.getenv("CORPUS_IMAGES", "../client/inputfolder")
+DEFAULT_CACHE = os.getenv("CORPUS_CACHE", "")
+DEFAULT_LIMIT = int(os.getenv("CORPUS_LIMIT", "20"))
+
+_corpus = None
+_lock = threading.Lock()
+
+
+def encode_image(image_data, size=(640, 480), quality=85):
+    """缩放图像并重新编码为JPEG (减少传输大小)"""
+    from PIL import Image
+
+    img = Image.open(io.BytesIO(image_data)).convert("RGB")
+    img = img.resize(size)
+    buffer = io.BytesIO()
+    img.save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+def make_body(image_id, jpeg_data):
+    """生成序列化好的请求体"""
+    return json.dumps({
+        "id": image_id,
+        "image": base64.b64encode(jpeg_data).decode("utf-8")
+    }).encode("utf-8")
+
+
+def build_corpus(image_folder=DEFAULT_IMAGE_FOLDER, limit=DEFAULT_LIMIT):
+    """
+    从图像目录构建语料，目录不存在或没有可用图像时使用一张白色测试图像
+    Returns:
+        list: [{"id": 图像ID, "body": 请求体字节}, ...]
+    """
+    corpus = []
+    if os.path.exists(image_folder):
+        image_files = sorted(f for f in os.listdir(image_folder)
+                             if f.lower().endswith(('.jpg', '.jpeg', '.png')))
+        for image_file in image_files[:limit]:
+            try:
+                with open(os.path.join(image_folder, image_file), "rb") as f:
+                    jpeg_data = encode_image(f.read())
+                image_id = f"test_{image_file}"
+                corpus.append({"id": image_id, "body": make_body(image_id, jpeg_data)})
+            except Exception as e:
+                print(f"加载图像失败 {image_file}: {e}")
+
+    if not corpus:
+        from PIL import Image
+
+        buffer = io.BytesIO()
+        Image.new('RGB', (640, 480), color='white').save(buffer, format='JPEG')
+        corpus.append({"id": "test_image_1", "body": make_body("test_image_1", buffer.getvalue())})
+    return corpus
+
+
+def save_corpus(corpus, path):
+    """保存为JSONL缓存 (每行一个请求体)"""
+    with open(path, "wb") as f:
+        for entry in corpus:
+            f.write(entry["body"] + b"\n")
+
+
+def read_corpus(path):
+    """读取JSONL缓存"""
+    corpus = []
+    with open(path, "rb") as f:
+        for line in f:
+            body = line.rstrip(b"\n")
+            if body:
+                corpus.append({"id": json.loads(body)["id"], "body": body})
+    return corpus
+
+
+def get_corpus(image_folder=DEFAULT_IMAGE_FOLDER, cache=DEFAULT_CACHE, limit=DEFAULT_LIMIT):
+    """
+    返回本进程共享的语料 (首次调用时构建或从缓存加载，之后直接返回同一份只读数据)
+    Returns:
+        tuple: 语料项元组
+    """
+    global _corpus
+    if _corpus is None:
+        with _lock:
+            if _corpus is None:
+                if cache and os.path.exists(cache):
+                    corpus = read_corpus(cache)
+                else:
+                    corpus = build_corpus(image_folder, limit)
+                    if cache:
+                        save_corpus(corpus, cache)
+                _corpus = tuple(corpus)
+                print(f"测试语料已加载: {len(_corpus)} 张图像")
+    return _corpus
+
+
+def main():
+    """命令行入口: 预先构建语料缓存"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="构建负载测试图像语料缓存")
+    parser.add_argument("--images", default=DEFAULT_IMAGE_FOLDER, help="图像目录")
+    parser.add_argument("--limit", type=int, default=DEFAULT_LIMIT, help="最多使用的图像数量")
+    parser.add_argument("--output", default="corpus.jsonl", help="缓存文件路径")
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.images, args.limit)
+    save_corpus(corpus, args.output)
+    size = sum(len(entry["body"]) for entry in corpus)
+    print(f"已保存 {len(corpus)} 个请求体 ({size / 1024:.1f} KB): {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+实验结果解析测试: Locust 2.x 的 _stats.csv 列名，以及旧版列名的兼容
+"""
+
+import csv
+
+import pytest
+
+pytest.importorskip("requests")
+from experiment_runner import ExperimentRunner
+
+LOCUST_COLUMNS = [
+    "Type", "Name", "Request Count", "Failure Count", "Median Response Time", "Average Response Time",
+    "Min Response Time", "Max Response Time", "Average Content Size", "Requests/s", "Failures/s",
+    "50%", "66%", "75%", "80%", "90%", "95%", "98%", "99%", "99.9%", "99.99%", "100%",
+]
+LEGACY_COLUMNS = [
+    "Type", "Name", "Number of Requests", "Number of Failures", "Median Response Time",
+    "Average Response Time", "Requests/sec", "95% Response Time", "99% Response Time",
+]
+
+
+def write_stats(path, columns, aggregated):
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=columns, restval="0")
+        writer.writeheader()
+        writer.writerow({"Type": "POST", "Name": "/api/pose", **aggregated})
+        writer.writerow({"Type": "", "Name": "Aggregated", **aggregated})
+
+
+@pytest.fixture
+def runner():
+    return ExperimentRunner("127.0.0.1", 30000)
+
+
+def test_parses_locust_columns(tmp_path, runner):
+    path = tmp_path / "results_stats.csv"
+    write_stats(path, LOCUST_COLUMNS, {
+        "Request Count": "1200", "Failure Count": "3", "Median Response Time": "180",
+        "Average Response Time": "210.5", "Requests/s": "19.8", "95%": "450", "99%": "900",
+    })
+    assert runner.parse_locust_results(str(path)) == {
+        "avg_response_time": 210.5,
+        "median_response_time": 180.0,
+        "p95_response_time": 450.0,
+        "p99_response_time": 900.0,
+        "requests_per_sec": 19.8,
+        "total_requests": 1200,
+        "failed_requests": 3,
+    }
+
+
+def test_parses_legacy_columns(tmp_path, runner):
+    path = tmp_path / "results_stats.csv"
+    write_stats(path, LEGACY_COLUMNS, {
+        "Number of Requests": "10", "Number of Failures": "1", "Median Response Time": "100",
+        "Average Response Time": "120", "Requests/sec": "2.5",
+        "95% Response Time": "300", "99% Response Time": "400",
+    })
+    result = runner.parse_locust_results(str(path))
+    assert result["total_requests"] == 10
+    assert result["failed_requests"] == 1
+    assert result["p95_response_time"] == 300.0
+    assert result["requests_per_sec"] == 2.5
+
+
+def test_no_requests_reports_zero_percentiles(tmp_path, runner):
+    # 没有请求时Locust把百分位写为 N/A
+    path = tmp_path / "results_stats.csv"
+    write_stats(path, LOCUST_COLUMNS, {"95%": "N/A", "99%": "N/A"})
+    result = runner.parse_locust_results(str(path))
+    assert result["total_requests"] == 0
+    assert result["p95_response_time"] == 0.0
+
+
+def test_missing_file_returns_none(tmp_path, runner):
+    assert runner.parse_locust_results(str(tmp_path / "missing_stats.csv")) is None
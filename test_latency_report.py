@@ -0,0 +1,151 @@
+"""
+延迟直方图测试: 百分位精度、合并、序列化，以及客户端延迟的阶段拆分
+"""
+
+import json
+import math
+import random
+
+import pytest
+
+from latency_report import LatencyHistogram, StageRecorder, load_report
+
+
+def exact_percentile(values, percentile):
+    """与 value_at 相同定义的精确百分位 (第 ceil(p/100 × n) 个值)"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(percentile / 100 * len(ordered)) - 1)]
+
+
+def lognormal(count, seed=0):
+    rng = random.Random(seed)
+    return [rng.lognormvariate(math.log(200), 0.8) for _ in range(count)]
+
+
+@pytest.mark.parametrize("percentile", [1, 10, 50, 90, 99, 99.9])
+def test_percentiles_within_precision(percentile):
+    values = lognormal(20000)
+    histogram = LatencyHistogram(precision=0.01)
+    for value in values:
+        histogram.record(value)
+    exact = exact_percentile(values, percentile)
+    assert histogram.value_at(percentile) == pytest.approx(exact, rel=0.01)
+
+
+def test_extremes_and_mean_are_exact():
+    values = lognormal(1000)
+    histogram = LatencyHistogram()
+    for value in values:
+        histogram.record(value)
+    assert histogram.count == len(values)
+    assert histogram.value_at(0) == min(values)
+    assert histogram.value_at(100) == max(values)
+    assert histogram.mean == pytest.approx(sum(values) / len(values))
+
+
+def test_small_and_negative_values_fall_into_first_bucket():
+    histogram = LatencyHistogram()
+    for value in [-5, 0, LatencyHistogram.MIN_VALUE / 2]:
+        histogram.record(value)
+    assert set(histogram.counts) == {0}
+    assert histogram.min == 0.0
+
+
+def test_empty_histogram():
+    histogram = LatencyHistogram()
+    assert histogram.mean == 0.0
+    assert histogram.value_at(50) == 0.0
+    restored = LatencyHistogram.from_dict(json.loads(json.dumps(histogram.to_dict())))
+    assert restored.count == 0 and restored.min == math.inf
+
+
+def test_merge_equals_recording_everything():
+    parts = [lognormal(3000, seed) for seed in range(4)]
+    merged, combined = LatencyHistogram(), LatencyHistogram()
+    for values in parts:
+        part = LatencyHistogram()
+        for value in values:
+            part.record(value)
+            combined.record(value)
+        merged.merge(part)
+    assert merged.counts == combined.counts
+    assert (merged.count, merged.min, merged.max) == (combined.count, combined.min, combined.max)
+    assert merged.total == pytest.approx(combined.total)
+    for percentile in [50, 99, 99.99]:
+        assert merged.value_at(percentile) == combined.value_at(percentile)
+
+
+def test_merge_with_empty_histogram():
+    histogram = LatencyHistogram()
+    histogram.record(12.0)
+    histogram.merge(LatencyHistogram())
+    assert (histogram.count, histogram.min, histogram.max) == (1, 12.0, 12.0)
+
+
+def test_merge_rejects_different_precision():
+    with pytest.raises(ValueError):
+        LatencyHistogram(0.01).merge(LatencyHistogram(0.05))
+
+
+def test_round_trip_through_json():
+    histogram = LatencyHistogram()
+    for value in lognormal(500):
+        histogram.record(value)
+    restored = LatencyHistogram.from_dict(json.loads(json.dumps(histogram.to_dict())))
+    assert restored.counts == histogram.counts
+    assert [restored.value_at(p) for p in [0, 50, 99, 100]] == [histogram.value_at(p) for p in [0, 50, 99, 100]]
+
+
+def response(total=40.0, **stages):
+    body = {"speed_total": total}
+    body.update({f"speed_{stage}": value for stage, value in stages.items()})
+    return body
+
+
+def test_breakdown_splits_client_latency():
+    recorder = StageRecorder()
+    for _ in range(10):
+        recorder.record_response(100.0, response(total=40.0, decode=5.0, queue=10.0, inference=20.0))
+    report = recorder.report()
+    # 网络/排队 = 客户端 - 服务端总耗时；其他 = 服务端总耗时 - 各阶段之和
+    assert report["series"]["network"]["mean"] == pytest.approx(60.0)
+    assert report["series"]["server_other"]["mean"] == pytest.approx(5.0)
+    breakdown = report["breakdown"]
+    assert list(breakdown) == ["network", "decode", "queue", "inference", "server_other"]
+    assert sum(entry["mean_ms"] for entry in breakdown.values()) == pytest.approx(100.0)
+    assert sum(entry["share"] for entry in breakdown.values()) == pytest.approx(1.0, abs=1e-3)
+
+
+def test_response_without_server_timings_records_client_only():
+    recorder = StageRecorder()
+    recorder.record_response(50.0, None)
+    recorder.record_response(70.0, {"error": "bad request"})
+    report = recorder.report()
+    assert list(report["series"]) == ["client"]
+    assert report["series"]["client"]["count"] == 2
+    assert report["breakdown"] == {}
+
+
+def test_incremental_export_merges_to_total():
+    # Locust工作节点每次汇报增量 (export(reset=True))，主节点合并后等于全部记录
+    worker, master, everything = StageRecorder(), StageRecorder(), StageRecorder()
+    for batch in range(3):
+        for client_ms in lognormal(200, batch):
+            worker.record_response(client_ms, response(total=client_ms / 2, inference=client_ms / 4))
+            everything.record_response(client_ms, response(total=client_ms / 2, inference=client_ms / 4))
+        master.merge_dict(worker.export(reset=True))
+        assert worker.histograms == {}
+    assert master.report()["series"] == everything.report()["series"]
+
+
+def test_write_and_load_report(tmp_path):
+    recorder = StageRecorder()
+    for client_ms in lognormal(300):
+        recorder.record_response(client_ms, response(total=10.0, inference=8.0))
+    prefix = str(tmp_path / "results")
+    report = recorder.write(prefix)
+    assert load_report(f"{prefix}_latency.json").report() == {k: v for k, v in report.items() if k != "histograms"}
+    with open(f"{prefix}_latency.csv") as f:
+        rows = f.read().splitlines()
+    assert rows[0].startswith("Series,Count,Mean,0%")
+    assert len(rows) == 1 + len(report["series"])
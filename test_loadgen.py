@@ -0,0 +1,66 @@
+"""
+asyncio负载生成器测试: 结束时未完成的请求记为失败，统计合并与运行时长
+"""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("httpx")
+import loadgen
+
+
+class Response:
+    status_code = 200
+    content = b"{}"
+
+    def json(self):
+        return {}
+
+
+class SlowClient:
+    """/docs 和 /slow 比测试时长更慢，其余端点很快返回"""
+
+    async def request(self, path):
+        await asyncio.sleep(10 if path in ("/docs", "/slow") else 0.01)
+        return Response()
+
+    async def get(self, path):
+        return await self.request(path)
+
+    async def post(self, path, **kwargs):
+        return await self.request(path)
+
+
+CORPUS = [{"body": b"{}"}]
+
+
+def test_closed_loop_records_unfinished_requests():
+    stats = loadgen.Stats()
+    asyncio.run(loadgen.closed_loop(SlowClient(), stats, CORPUS, 20, 0.2, [0, 0]))
+    # 卡在 /docs 上的用户在结束时被记为失败，响应时间记到结束时刻 (不等待10秒的响应)
+    docs_times = stats.times[("GET", "/docs")]
+    assert docs_times
+    assert stats.errors[("GET", "/docs", "测试结束时未完成")] == len(docs_times)
+    assert max(docs_times) > 150
+    assert all(t < 1000 for t in docs_times)
+
+
+def test_open_loop_records_unfinished_requests():
+    stats = loadgen.Stats()
+    asyncio.run(loadgen.open_loop(SlowClient(), stats, CORPUS, 50, 0.2, "/slow", "fixed", 1000))
+    assert stats.errors[("POST", "/slow", "测试结束时未完成")] == len(stats.times[("POST", "/slow")]) > 0
+
+
+def test_merge_keeps_longest_elapsed():
+    stats = loadgen.Stats()
+    for elapsed, count in [(10.0, 3), (12.5, 2)]:
+        worker = loadgen.Stats()
+        for _ in range(count):
+            worker.record("POST", "/api/pose", 100.0, 10)
+        worker.elapsed = elapsed
+        stats.merge(worker.to_dict())
+    assert stats.elapsed == 12.5
+    aggregated = stats.rows(stats.elapsed)[-1]
+    assert aggregated["Request Count"] == 5
+    assert aggregated["Requests/s"] == 0.4
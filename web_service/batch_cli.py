@@ -0,0 +1,466 @@
+#!/usr/bin/env python3
+"""
+CloudPose离线批处理工具
+直接基于PoseDetector处理大量图像 (不经过HTTP服务):
+- 从目录 (如 client/inputfolder) 或清单文件流式读取图像，用线程池并行解码
+- 按自动调优的批大小批量推理
+- 结果写入分片的JSONL、Parquet文件或姿态结果归档，每完成一个分片记录检查点，中断后重新运行会跳过已完成的图像
+- 定期报告吞吐量 (图像/秒) 和各阶段耗时
+
+用法:
+    python batch_cli.py --input ../client/inputfolder --output ./batch_output
+    python batch_cli.py --manifest images.txt --output ./batch_output --format parquet --batch-size 8
+"""
+
+import collections
+import json
+import logging
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+import config
+
+logger = logging.getLogger("batch_cli")
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+CHECKPOINT_FILE = "_checkpoint.jsonl"
+SUMMARY_FILE = "_summary.json"
+
+
+def iter_directory(image_dir):
+    """
+    递归列出目录中的图像 (按路径排序，保证多次运行的顺序一致)
+    Yields:
+        (图像ID, 路径)，图像ID为相对于目录的路径
+    """
+    for root, dirs, files in os.walk(image_dir):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                path = os.path.join(root, name)
+                yield os.path.relpath(path, image_dir), path
+
+
+def iter_manifest(manifest):
+    """
+    读取清单文件: 每行一个图像路径，或一个JSON对象 {"id": ..., "path": ...}
+    相对路径相对于清单文件所在目录
+    Yields:
+        (图像ID, 路径)
+    """
+    base_dir = os.path.dirname(os.path.abspath(manifest))
+    with open(manifest) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("{"):
+                entry = json.loads(line)
+                path = entry["path"]
+                image_id = str(entry.get("id", path))
+            else:
+                path = image_id = line
+            yield image_id, os.path.join(base_dir, path)
+
+
+class BatchTuner:
+    """
+    批大小自动调优: 用真实数据依次尝试递增的批大小 (结果照常输出，不浪费推理)，
+    吞吐量不再明显提高时固定为吞吐量最高的批大小
+    """
+
+    def __init__(self, max_batch=32, probe_batches=3, min_gain=0.05):
+        """
+        Args:
+            max_batch: 最大批大小
+            probe_batches: 每个候选批大小计时的批数 (另有一批不计时，用于该形状的预热)
+            min_gain: 吞吐量提高不足该比例时停止尝试更大的批
+        """
+        self.candidates = [size for size in (1, 2, 4, 8, 16, 32, 64, 128) if size <= max_batch] or [max_batch]
+        self.probe_batches = probe_batches
+        self.min_gain = min_gain
+        self.throughput = {}
+        self.chosen = None
+        self._index = 0
+        self._runs = 0
+        self._images = 0
+        self._elapsed = 0.0
+
+    def next_size(self):
+        """下一批的大小"""
+        return self.chosen or self.candidates[self._index]
+
+    def record(self, size, images, elapsed):
+        """记录一批的推理耗时"""
+        if self.chosen is not None or size != self.candidates[self._index]:
+            return
+        self._runs += 1
+        if self._runs == 1:
+            return
+        self._images += images
+        self._elapsed += elapsed
+        if self._runs <= self.probe_batches:
+            return
+
+        rate = self._images / self._elapsed
+        self.throughput[size] = rate
+        logger.info(f"批大小 {size}: {rate:.2f} 图像/秒")
+        previous = self.throughput.get(self.candidates[self._index - 1]) if self._index else None
+        if (previous is not None and rate < previous * (1 + self.min_gain)) or self._index + 1 == len(self.candidates):
+            self.chosen = max(self.throughput, key=self.throughput.get)
+            logger.info(f"自动调优选定批大小: {self.chosen}")
+            return
+        self._index += 1
+        self._runs, self._images, self._elapsed = 0, 0, 0.0
+
+
+class JsonlShardWriter:
+    """JSONL分片"""
+
+    extension = ".jsonl"
+
+    def write(self, path, records):
+        with open(path, "w") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+
+
+class ParquetShardWriter:
+    """Parquet分片 (需要安装pyarrow)"""
+
+    extension = ".parquet"
+
+    def __init__(self):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise RuntimeError("Parquet输出需要安装pyarrow: pip install pyarrow")
+        self._pa = pyarrow
+        self._pq = pyarrow.parquet
+
+    def write(self, path, records):
+        self._pq.write_table(self._pa.Table.from_pylist(records), path)
+
+
+class ArchiveShardWriter:
+    """姿态结果归档分片 (result_archive.py，每个分片是一个归档目录)"""
+
+    extension = ".archive"
+
+    def write(self, path, records):
+        from result_archive import ArchiveWriter
+
+        with ArchiveWriter(path) as writer:
+            for record in records:
+                if record["error"] is None:
+                    writer.append_response(record)
+                else:
+                    # 失败的图像也写入索引 (没有检测结果)
+                    writer.append(record["id"], [], [], [])
+
+
+class ShardedOutput:
+    """分片输出与检查点"""
+
+    def __init__(self, output_dir, writer, shard_size=1000):
+        """
+        Args:
+            output_dir: 输出目录
+            writer: 分片写入器
+            shard_size: 每个分片的记录数
+        """
+        self.output_dir = output_dir
+        self.writer = writer
+        self.shard_size = shard_size
+        self.completed = set()
+        self.shards = 0
+        self._records = []
+        os.makedirs(output_dir, exist_ok=True)
+        self._load_checkpoint()
+
+    def _load_checkpoint(self):
+        """读取检查点，删除上次中断时未完成的分片"""
+        checkpoint = os.path.join(self.output_dir, CHECKPOINT_FILE)
+        if os.path.exists(checkpoint):
+            with open(checkpoint) as f:
+                lines = f.read().split("\n")
+            # 最后一段不以换行结尾说明写入检查点时被中断，丢弃并截断 (该分片会重新处理)
+            complete, partial = lines[:-1], lines[-1]
+            if partial:
+                with open(checkpoint, "w") as f:
+                    f.writelines(line + "\n" for line in complete)
+            for line in complete:
+                entry = json.loads(line)
+                self.completed.update(entry["ids"])
+                self.shards += 1
+        for name in os.listdir(self.output_dir):
+            if name.endswith(".tmp"):
+                _remove(os.path.join(self.output_dir, name))
+        if self.completed:
+            logger.info(f"从检查点恢复: 已完成 {len(self.completed)} 张图像 ({self.shards} 个分片)")
+
+    def add(self, record):
+        """添加一条记录，攒满一个分片时写出"""
+        self._records.append(record)
+        if len(self._records) >= self.shard_size:
+            self.flush()
+
+    def flush(self):
+        """
+        写出当前分片: 先写临时文件再重命名，之后在检查点中追加该分片的图像ID
+        (中断时最多丢失一个未完成的分片，重新运行时重新处理)
+        """
+        if not self._records:
+            return
+        name = f"part-{self.shards:05d}{self.writer.extension}"
+        path = os.path.join(self.output_dir, name)
+        self.writer.write(path + ".tmp", self._records)
+        if os.path.exists(path):
+            # 上次写出后、记录检查点前被中断的分片
+            _remove(path)
+        os.replace(path + ".tmp", path)
+        ids = [record["id"] for record in self._records]
+        with open(os.path.join(self.output_dir, CHECKPOINT_FILE), "a") as f:
+            f.write(json.dumps({"shard": name, "ids": ids}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.completed.update(ids)
+        self.shards += 1
+        self._records = []
+
+
+def _remove(path):
+    """删除文件或目录 (归档分片是目录)"""
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    else:
+        os.remove(path)
+
+
+def read_image(image_id, path):
+    """
+    读取并解码一张图像 (在解码线程池中运行)
+    Returns:
+        (图像ID, 路径, 图像或None, 错误信息或None, 耗时)
+    """
+    start = time.time()
+    try:
+        image = cv2.imread(path, cv2.IMREAD_COLOR)
+        error = None if image is not None else "无法解码图像"
+    except Exception as e:
+        image, error = None, str(e)
+    return image_id, path, image, error, time.time() - start
+
+
+def decode_stream(items, workers, prefetch):
+    """
+    用线程池并行解码，按输入顺序产出，最多预取prefetch张
+    Yields:
+        read_image的返回值
+    """
+    with ThreadPoolExecutor(workers, thread_name_prefix="decode") as executor:
+        pending = collections.deque()
+        for image_id, path in items:
+            pending.append(executor.submit(read_image, image_id, path))
+            if len(pending) >= prefetch:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+class BatchRunner:
+    """离线批处理: 解码、批量推理和输出"""
+
+    def __init__(self, detector, output, tuner, mode="full", report_interval=10.0):
+        """
+        Args:
+            detector: PoseDetector实例
+            output: ShardedOutput实例
+            tuner: BatchTuner实例
+            mode: "full" 整图推理，"tiled" 分块推理，"auto" 按图像尺寸自动选择
+            report_interval: 进度报告间隔(秒)
+        """
+        self.detector = detector
+        self.output = output
+        self.tuner = tuner
+        self.mode = mode
+        self.report_interval = report_interval
+        self.images = 0
+        self.errors = 0
+        self.skipped = 0
+        self.timings = collections.defaultdict(float)
+
+    def _tiled(self, image):
+        if self.mode == "auto":
+            return max(image.shape[:2]) >= config.TILE_AUTO_MIN_SIDE
+        return self.mode == "tiled"
+
+    def run(self, items, decode_workers=4):
+        """
+        处理所有图像
+        Args:
+            items: (图像ID, 路径) 的可迭代对象
+            decode_workers: 解码线程数
+        Returns:
+            dict: 运行统计
+        """
+        start = last_report = time.time()
+        last_images = 0
+        todo = self._skip_completed(items)
+        prefetch = decode_workers * 4 + self.tuner.candidates[-1]
+        batch = []
+
+        wait_start = time.time()
+        for image_id, path, image, error, decode_time in decode_stream(todo, decode_workers, prefetch):
+            self.timings["decode_wait"] += time.time() - wait_start
+            self.timings["decode"] += decode_time
+            if error is not None:
+                self.errors += 1
+                self._write([self._error_record(image_id, path, error)])
+            elif self._tiled(image):
+                self._run_tiled(image_id, path, image)
+            else:
+                batch.append((image_id, path, image))
+                if len(batch) >= self.tuner.next_size():
+                    self._run_batch(batch)
+                    batch = []
+
+            now = time.time()
+            if now - last_report >= self.report_interval:
+                rate = (self.images - last_images) / (now - last_report)
+                logger.info(f"已处理 {self.images} 张, {rate:.2f} 图像/秒")
+                last_report, last_images = now, self.images
+            wait_start = time.time()
+
+        if batch:
+            self._run_batch(batch)
+        write_start = time.time()
+        self.output.flush()
+        self.timings["write"] += time.time() - write_start
+        return self.summary(time.time() - start)
+
+    def _skip_completed(self, items):
+        """跳过检查点中已完成的图像"""
+        for image_id, path in items:
+            if image_id in self.output.completed:
+                self.skipped += 1
+                continue
+            yield image_id, path
+
+    def _run_batch(self, batch):
+        """整图批量推理"""
+        start = time.time()
+        results, preprocess_time, inference_time, postprocess_time = self.detector.detect_batch(
+            [image for _, _, image in batch]
+        )
+        self.tuner.record(len(batch), len(batch), time.time() - start)
+        self.timings["preprocess"] += preprocess_time
+        self.timings["inference"] += inference_time
+
+        start_post = time.time()
+        records = []
+        for (image_id, path, image), result in zip(batch, results):
+            arrays = self.detector.results_to_arrays([result])
+            records.append(self._record(image_id, path, image, arrays, tiled=False))
+        self.timings["postprocess"] += postprocess_time + time.time() - start_post
+        self._write(records)
+        self.images += len(batch)
+
+    def _run_tiled(self, image_id, path, image):
+        """分块推理 (分块本身组成一批)"""
+        arrays, preprocess_time, inference_time, postprocess_time = self.detector.detect_tiled(
+            image, tile_size=config.TILE_SIZE, overlap=config.TILE_OVERLAP, iou_threshold=config.TILE_NMS_IOU
+        )
+        self.timings["preprocess"] += preprocess_time
+        self.timings["inference"] += inference_time
+        self.timings["postprocess"] += postprocess_time
+        self._write([self._record(image_id, path, image, arrays, tiled=True)])
+        self.images += 1
+
+    def _record(self, image_id, path, image, arrays, tiled):
+        record = {"id": image_id, "path": path, "width": image.shape[1], "height": image.shape[0]}
+        record.update(self.detector.format_arrays(*arrays, image_id))
+        record.update({"mode": "tiled" if tiled else "full", "error": None})
+        return record
+
+    def _error_record(self, image_id, path, error):
+        """无法读取的图像也写出一条记录 (字段与正常记录一致)，重新运行时不再重试"""
+        return {"id": image_id, "path": path, "width": None, "height": None, "count": 0,
+                "boxes": [], "keypoints": [], "mode": None, "error": error}
+
+    def _write(self, records):
+        start = time.time()
+        for record in records:
+            self.output.add(record)
+        self.timings["write"] += time.time() - start
+
+    def summary(self, elapsed):
+        """运行统计: 吞吐量和各阶段耗时 (解码为各线程耗时之和，decode_wait为推理线程等待解码的时间)"""
+        return {
+            "images": self.images,
+            "errors": self.errors,
+            "skipped": self.skipped,
+            "elapsed_s": round(elapsed, 2),
+            "images_per_sec": round(self.images / elapsed, 2) if elapsed > 0 else 0.0,
+            "batch_size": self.tuner.chosen or self.tuner.next_size(),
+            "batch_throughput": {size: round(rate, 2) for size, rate in self.tuner.throughput.items()},
+            "stage_seconds": {stage: round(seconds, 2) for stage, seconds in self.timings.items()},
+            "stage_ms_per_image": {
+                stage: round(seconds * 1000 / max(1, self.images), 2) for stage, seconds in self.timings.items()
+            },
+            "shards": self.output.shards,
+        }
+
+
+def main():
+    """命令行入口"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="CloudPose离线批处理工具")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--input", help="图像目录 (递归)")
+    source.add_argument("--manifest", help="清单文件 (每行一个路径或一个JSON对象)")
+    parser.add_argument("--output", required=True, help="输出目录")
+    parser.add_argument("--format", choices=["jsonl", "parquet", "archive"], default="jsonl",
+                        help="输出格式 (archive为可内存映射的float32数组归档)")
+    parser.add_argument("--shard-size", type=int, default=1000, help="每个分片的图像数")
+    parser.add_argument("--model", default=config.MODEL_PATH, help="模型文件路径")
+    parser.add_argument("--mode", choices=["full", "tiled", "auto"], default="full", help="处理方式")
+    parser.add_argument("--batch-size", type=int, default=0, help="批大小 (0表示自动调优)")
+    parser.add_argument("--max-batch", type=int, default=32, help="自动调优的最大批大小")
+    parser.add_argument("--decode-workers", type=int, default=4, help="解码线程数")
+    parser.add_argument("--threads", type=int, default=0, help="推理线程数 (0表示使用torch默认值)")
+    parser.add_argument("--report-interval", type=float, default=10.0, help="进度报告间隔(秒)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(name)s] %(message)s")
+
+    import torch
+    from pose_detector import PoseDetector
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    writers = {"jsonl": JsonlShardWriter, "parquet": ParquetShardWriter, "archive": ArchiveShardWriter}
+    writer = writers[args.format]()
+    output = ShardedOutput(args.output, writer, args.shard_size)
+    tuner = BatchTuner(max_batch=args.batch_size or args.max_batch)
+    if args.batch_size:
+        tuner.chosen = args.batch_size
+
+    detector = PoseDetector(args.model)
+    items = iter_directory(args.input) if args.input else iter_manifest(args.manifest)
+    runner = BatchRunner(detector, output, tuner, mode=args.mode, report_interval=args.report_interval)
+    summary = runner.run(items, decode_workers=args.decode_workers)
+
+    with open(os.path.join(args.output, SUMMARY_FILE), "w") as f:
+        json.dump(summary, f, indent=2)
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
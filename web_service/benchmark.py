@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+CloudPose推理性能基准测试
+直接基于PoseDetector测量不同推理配置的延迟和吞吐量 (不经过HTTP服务)
+"""
+
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+
+
+def load_frames(image_dir=None, size=(640, 480), limit=20, synthetic=True):
+    """
+    加载基准测试图像
+    Args:
+        image_dir: 图像目录，为None或不存在时使用合成图像
+        size: 合成图像的分辨率 (宽, 高)
+        limit: 最多加载的图像数量
+        synthetic: 没有图像时是否使用合成图像 (为False时返回空列表)
+    Returns:
+        list: OpenCV格式的图像列表
+    """
+    frames = []
+    if image_dir and os.path.isdir(image_dir):
+        for name in sorted(os.listdir(image_dir)):
+            if not name.lower().endswith(('.jpg', '.jpeg', '.png')):
+                continue
+            image = cv2.imread(os.path.join(image_dir, name))
+            if image is not None:
+                frames.append(image)
+            if len(frames) >= limit:
+                break
+
+    if not frames and synthetic:
+        rng = np.random.default_rng(0)
+        width, height = size
+        frames = [rng.integers(0, 256, (height, width, 3), dtype=np.uint8) for _ in range(4)]
+    return frames
+
+
+def time_detector(detector, frames, batch_size=1, iterations=20, warmup=3):
+    """
+    测量检测器在指定批大小下的延迟和吞吐量
+    Args:
+        detector: PoseDetector实例
+        frames: 图像列表
+        batch_size: 批大小
+        iterations: 计时的迭代次数
+        warmup: 不计时的预热迭代次数
+    Returns:
+        dict: 延迟统计 (毫秒) 和吞吐量 (图像/秒)
+    """
+    def make_batch(i):
+        return [frames[(i * batch_size + j) % len(frames)] for j in range(batch_size)]
+
+    for i in range(warmup):
+        detector.detect_batch(make_batch(i))
+
+    latencies = []
+    start = time.time()
+    for i in range(iterations):
+        batch = make_batch(i)
+        t = time.time()
+        detector.detect_batch(batch)
+        latencies.append((time.time() - t) * 1000)
+    elapsed = time.time() - start
+
+    latencies = np.array(latencies)
+    return {
+        "batch_size": batch_size,
+        "mean_ms": round(float(latencies.mean()), 2),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+        "images_per_sec": round(iterations * batch_size / elapsed, 2),
+    }
+
+
+def print_table(rows, columns):
+    """打印结果表格"""
+    print(" | ".join(f"{c:>14}" for c in columns))
+    print("-" * (17 * len(columns)))
+    for row in rows:
+        print(" | ".join(f"{str(row.get(c, '')):>14}" for c in columns))
+
+
+def benchmark_graph(args):
+    """比较eager模式和图模式的推理性能"""
+    from pose_detector import PoseDetector
+
+    frames = load_frames(args.images)
+    rows = []
+    for mode in args.modes:
+        detector = PoseDetector(args.model)
+        start = time.time()
+        detector.enable_graph_mode(
+            mode, batch_sizes=args.batch_sizes, imgsz_list=args.imgsz, cache_dir=args.cache_dir
+        )
+        compile_time = time.time() - start
+        for batch_size in args.batch_sizes:
+            stats = time_detector(detector, frames, batch_size, args.iterations)
+            stats.update({"mode": mode, "compile_s": round(compile_time, 2)})
+            rows.append(stats)
+
+    print_table(rows, ["mode", "batch_size", "compile_s", "mean_ms", "p50_ms", "p95_ms", "images_per_sec"])
+    return rows
+
+
+def benchmark_numerics(args):
+    """比较各数值选项相对FP32基线的性能和精度"""
+    from pose_detector import PoseDetector
+    from numerics import detect_cpu_features
+
+    features = detect_cpu_features()
+    print(f"CPU特性: {features['flags']}")
+    print(f"支持的选项: {features['supported']}")
+
+    frames = load_frames(args.images)
+    configs = [[]] + [[option] for option in args.options] + [list(args.options)]
+    rows = []
+    for options in configs:
+        detector = PoseDetector(args.model)
+        report = detector.configure_numerics(
+            options, verify=True, frames=frames, min_iou=args.min_iou,
+            score_tolerance=args.score_tolerance, keypoint_tolerance=args.keypoint_tolerance,
+        )
+        stats = time_detector(detector, frames, args.batch_size, args.iterations)
+        stats.update({
+            "options": "+".join(options) or "fp32",
+            "enabled": "+".join(o for o, e in report.items() if e["enabled"]) or "-",
+            "min_iou": min((e.get("min_iou", 1.0) for e in report.values()), default=1.0),
+            "score_err": max((e.get("max_score_err", 0.0) for e in report.values()), default=0.0),
+            "kpt_err": max((e.get("max_keypoint_err", 0.0) for e in report.values()), default=0.0),
+        })
+        rows.append(stats)
+
+    print_table(rows, ["options", "enabled", "min_iou", "score_err", "kpt_err",
+                       "mean_ms", "p50_ms", "p95_ms", "images_per_sec"])
+    return rows
+
+
+def benchmark_prefilter(args):
+    """
+    在本地图像集上测量人员存在预过滤的精确率和召回率
+    以完整姿态模型的检测结果 (count > 0) 作为参考标签，对每个置信度阈值统计:
+    精确率 = 放行图像中确实有人的比例，召回率 = 有人的图像中被放行的比例
+    (召回率低于1表示会漏检)，以及跳过比例和平均耗时
+    """
+    from pose_detector import PoseDetector
+    from presence_gate import PresenceGate
+
+    frames = load_frames(args.images, limit=args.limit)
+    detector = PoseDetector(args.model)
+    labels, pose_times = [], []
+    for frame in frames:
+        start = time.time()
+        results, _, _, _ = detector.detect(frame)
+        pose_times.append(time.time() - start)
+        labels.append(detector.parse_results(results, "benchmark")["count"] > 0)
+    print(f"图像数: {len(frames)}, 有人: {sum(labels)}, 姿态模型平均耗时: {np.mean(pose_times) * 1000:.2f}ms")
+
+    gate = PresenceGate(args.gate_model, imgsz=args.gate_imgsz, conf=min(args.conf), min_std=args.min_std)
+    gate.warmup()
+    scores, gate_times = [], []
+    for frame in frames:
+        start = time.time()
+        scores.append(gate.score(frame))
+        gate_times.append(time.time() - start)
+
+    rows = []
+    for conf in sorted(args.conf):
+        passed = [score >= conf for score in scores]
+        true_positive = sum(1 for p, l in zip(passed, labels) if p and l)
+        rows.append({
+            "conf": conf,
+            "precision": round(true_positive / max(1, sum(passed)), 3),
+            "recall": round(true_positive / max(1, sum(labels)), 3),
+            "skip_rate": round(1 - sum(passed) / len(frames), 3),
+            "gate_ms": round(float(np.mean(gate_times)) * 1000, 2),
+            "pose_ms": round(float(np.mean(pose_times)) * 1000, 2),
+        })
+
+    print_table(rows, ["conf", "precision", "recall", "skip_rate", "gate_ms", "pose_ms"])
+    return rows
+
+
+def _affinity_worker(model, image_dir, threads, partition, duration, barrier, results):
+    """亲和性基准测试的工作进程: 持续推理指定时间并返回处理的图像数"""
+    import torch
+    from pose_detector import PoseDetector
+
+    if partition is not None:
+        from cpu_affinity import pin_worker
+
+        threads = pin_worker(partition)
+    torch.set_num_threads(threads)
+
+    detector = PoseDetector(model)
+    frames = load_frames(image_dir)
+    for frame in frames[:3]:
+        detector.detect_batch([frame])
+
+    barrier.wait()
+    count = 0
+    deadline = time.time() + duration
+    while time.time() < deadline:
+        detector.detect_batch([frames[count % len(frames)]])
+        count += 1
+    results.put(count)
+
+
+def benchmark_affinity(args):
+    """比较多工作进程在CPU绑定和不绑定时的总吞吐量"""
+    import multiprocessing
+    from cpu_affinity import partition_cpus
+
+    context = multiprocessing.get_context("spawn")
+    partitions = partition_cpus(args.workers)
+    threads = max(1, len(os.sched_getaffinity(0)) // args.workers)
+
+    rows = []
+    for mode in ("unpinned", "pinned"):
+        barrier = context.Barrier(args.workers)
+        results = context.Queue()
+        processes = [
+            context.Process(
+                target=_affinity_worker,
+                args=(args.model, args.images, threads,
+                      partitions[i] if mode == "pinned" else None,
+                      args.duration, barrier, results),
+            )
+            for i in range(args.workers)
+        ]
+        for process in processes:
+            process.start()
+        counts = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+        rows.append({
+            "mode": mode,
+            "workers": args.workers,
+            "images": sum(counts),
+            "images_per_sec": round(sum(counts) / args.duration, 2),
+            "min_worker_ips": round(min(counts) / args.duration, 2),
+        })
+
+    print_table(rows, ["mode", "workers", "images", "images_per_sec", "min_worker_ips"])
+    return rows
+
+
+def main():
+    """命令行入口"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="CloudPose推理基准测试")
+    parser.add_argument("--model", default="yolo11l-pose.pt", help="模型文件路径")
+    parser.add_argument("--images", default="../client/inputfolder", help="图像目录 (不存在时使用合成图像)")
+    parser.add_argument("--iterations", type=int, default=20, help="计时迭代次数")
+    parser.add_argument("--output", help="将结果保存为JSON文件")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    graph_parser = subparsers.add_parser("graph", help="比较eager模式和图模式")
+    graph_parser.add_argument("--modes", nargs="+", default=["eager", "torchscript", "compile"],
+                              help="要比较的推理模式")
+    graph_parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1], help="批大小")
+    graph_parser.add_argument("--imgsz", type=int, nargs="+", default=[640], help="输入分辨率")
+    graph_parser.add_argument("--cache-dir", default="./graph_cache", help="编译缓存目录")
+    graph_parser.set_defaults(func=benchmark_graph)
+
+    numerics_parser = subparsers.add_parser("numerics", help="比较数值选项的性能和精度")
+    numerics_parser.add_argument("--options", nargs="+", default=["inference_mode", "channels_last", "bf16"],
+                                 help="要比较的数值选项")
+    numerics_parser.add_argument("--batch-size", type=int, default=1, help="批大小")
+    numerics_parser.add_argument("--min-iou", type=float, default=0.9, help="配对检测的最小边界框IoU")
+    numerics_parser.add_argument("--score-tolerance", type=float, default=0.05, help="置信度允许的最大误差")
+    numerics_parser.add_argument("--keypoint-tolerance", type=float, default=0.05,
+                                 help="关键点位置允许的最大误差 (相对于边界框对角线)")
+    numerics_parser.set_defaults(func=benchmark_numerics)
+
+    affinity_parser = subparsers.add_parser("affinity", help="比较CPU绑定与不绑定的多进程吞吐量")
+    affinity_parser.add_argument("--workers", type=int, default=2, help="工作进程数")
+    affinity_parser.add_argument("--duration", type=int, default=30, help="每种模式的测试时长(秒)")
+    affinity_parser.set_defaults(func=benchmark_affinity)
+
+    prefilter_parser = subparsers.add_parser("prefilter", help="测量人员存在预过滤的精确率和召回率")
+    prefilter_parser.add_argument("--gate-model", default="yolo11n.pt", help="预过滤检测器模型")
+    prefilter_parser.add_argument("--gate-imgsz", type=int, default=320, help="预过滤检测器输入分辨率")
+    prefilter_parser.add_argument("--conf", type=float, nargs="+", default=[0.1, 0.25, 0.4],
+                                  help="要比较的置信度阈值")
+    prefilter_parser.add_argument("--min-std", type=float, default=2.0, help="纯色图像的灰度标准差阈值")
+    prefilter_parser.add_argument("--limit", type=int, default=200, help="最多使用的图像数量")
+    prefilter_parser.set_defaults(func=benchmark_prefilter)
+
+    args = parser.parse_args()
+    rows = args.func(args)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(rows, f, indent=2)
+        print(f"结果已保存: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+服务配置模块
+所有可调参数均通过环境变量读取，便于在Kubernetes部署中配置
+"""
+
+import os
+
+
+def env_bool(name, default=False):
+    """读取布尔型环境变量"""
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def env_int(name, default):
+    """读取整型环境变量"""
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    return int(value)
+
+
+def env_float(name, default):
+    """读取浮点型环境变量"""
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    return float(value)
+
+
+def env_list(name, default=""):
+    """读取逗号分隔的列表型环境变量"""
+    value = os.getenv(name, default)
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def env_mapping(name, default=""):
+    """
+    读取形如 "键:值,键:值" 的映射型环境变量 (按最后一个冒号切分，键中可以包含冒号)
+    Returns:
+        dict: {键: 值}
+    """
+    mapping = {}
+    for item in env_list(name, default):
+        key, value = item.rsplit(":", 1)
+        mapping[key.strip()] = value.strip()
+    return mapping
+
+
+def parse_sizes(items):
+    """
+    解析分辨率列表
+    Args:
+        items: 形如 ["640x480", "1280x720"] 的字符串列表
+    Returns:
+        list: [(宽, 高), ...]
+    """
+    sizes = []
+    for item in items:
+        width, height = item.lower().split("x")
+        sizes.append((int(width), int(height)))
+    return sizes
+
+
+# 模型文件路径
+MODEL_PATH = os.getenv("MODEL_PATH", "./yolo11l-pose.pt")
+
+# 内容寻址模型仓库: 设置MODEL_SHA256后从仓库加载模型，缺失时从MODEL_SOURCE拉取
+# MODEL_SOURCE可以是HTTP产物服务器地址或挂载的目录
+MODEL_STORE_DIR = os.getenv("MODEL_STORE_DIR", "./model_store")
+MODEL_SHA256 = os.getenv("MODEL_SHA256", "")
+MODEL_SOURCE = os.getenv("MODEL_SOURCE", "")
+# 以mmap方式加载.pt检查点
+MODEL_MMAP = env_bool("MODEL_MMAP", True)
+
+# 预编译TorchScript产物缓存目录，留空则直接加载.pt检查点
+MODEL_ARTIFACT_CACHE_DIR = os.getenv("MODEL_ARTIFACT_CACHE_DIR", "")
+MODEL_ARTIFACT_IMGSZ = env_int("MODEL_ARTIFACT_IMGSZ", 640)
+# 产物缓存未命中时是否在启动时当场导出 (之后同节点的Pod可直接复用)
+MODEL_ARTIFACT_BUILD = env_bool("MODEL_ARTIFACT_BUILD", False)
+
+# 数值选项: inference_mode、channels_last、bf16 (逗号分隔)
+# 启动时检测CPU支持情况，并在真实图像上与FP32基线的检测结果对比，通过后才启用
+NUMERICS_OPTIONS = env_list("NUMERICS_OPTIONS", "")
+NUMERICS_VERIFY = env_bool("NUMERICS_VERIFY", True)
+# 对比用的图像目录 (应包含人物) 和最多使用的图像数
+NUMERICS_IMAGES = os.getenv("NUMERICS_IMAGES", "../client/inputfolder")
+NUMERICS_FRAMES = env_int("NUMERICS_FRAMES", 8)
+# 配对检测的最小边界框IoU、置信度 (0-1) 最大误差、关键点位置最大误差 (相对于边界框对角线)
+NUMERICS_MIN_IOU = env_float("NUMERICS_MIN_IOU", 0.9)
+NUMERICS_SCORE_TOLERANCE = env_float("NUMERICS_SCORE_TOLERANCE", 0.05)
+NUMERICS_KEYPOINT_TOLERANCE = env_float("NUMERICS_KEYPOINT_TOLERANCE", 0.05)
+
+# 图模式推理: eager (默认)、torchscript 或 compile
+GRAPH_MODE = os.getenv("GRAPH_MODE", "eager")
+# 静态形状桶: 允许的批大小和 (正方形) 输入分辨率
+GRAPH_BATCH_SIZES = [int(b) for b in env_list("GRAPH_BATCH_SIZES", "1")]
+GRAPH_IMGSZ = [int(s) for s in env_list("GRAPH_IMGSZ", "640")]
+# 编译缓存目录，挂载到节点本地目录后同节点的Pod可复用编译结果
+GRAPH_CACHE_DIR = os.getenv("GRAPH_CACHE_DIR", "./graph_cache")
+
+# 检测器副本池: 副本数量 (0表示按可用CPU数 / 每副本线程数自动计算) 和每个副本的推理线程数
+POOL_SIZE = env_int("POOL_SIZE", 0)
+POOL_THREADS_PER_REPLICA = env_int("POOL_THREADS_PER_REPLICA", 4)
+
+# 截止时间调度: 剩余时间小于 (平均推理时间 × 该系数) 的请求视为肯定会过期，在到达模型前丢弃
+DEADLINE_SERVICE_FACTOR = env_float("DEADLINE_SERVICE_FACTOR", 0.5)
+
+# 优先级类别与加权公平排队: 类别权重，以及按客户端标识 (X-Client-Key)、请求ID前缀和端点的分类规则
+PRIORITY_WEIGHTS = {k: float(v) for k, v in env_mapping("PRIORITY_WEIGHTS", "interactive:8,bulk:1").items()}
+PRIORITY_DEFAULT_CLASS = os.getenv("PRIORITY_DEFAULT_CLASS", "interactive")
+PRIORITY_CLIENT_CLASSES = env_mapping("PRIORITY_CLIENT_CLASSES", "")
+PRIORITY_ID_PREFIX_CLASSES = env_mapping("PRIORITY_ID_PREFIX_CLASSES", "bulk-:bulk,batch-:bulk")
+PRIORITY_ENDPOINT_CLASSES = env_mapping("PRIORITY_ENDPOINT_CLASSES", "/api/pose:interactive,/api/pose_image:bulk")
+
+# 人员存在预过滤: 先用微型检测器在低分辨率下判断是否有人，无人的图像跳过姿态模型直接返回 count: 0
+# PREFILTER_CONF越低召回率越高 (漏检越少)，但跳过的图像也越少
+PREFILTER_ENABLED = env_bool("PREFILTER_ENABLED", False)
+PREFILTER_MODEL = os.getenv("PREFILTER_MODEL", "./yolo11n.pt")
+PREFILTER_IMGSZ = env_int("PREFILTER_IMGSZ", 320)
+PREFILTER_CONF = env_float("PREFILTER_CONF", 0.25)
+PREFILTER_MIN_STD = env_float("PREFILTER_MIN_STD", 2.0)
+
+# 分块推理: 分块边长 (即每个分块的推理分辨率)、相邻分块的重叠比例和合并接缝处重复检测的IoU阈值
+# 请求 mode 为 "auto" 时，长边不小于TILE_AUTO_MIN_SIDE的图像使用分块推理
+TILE_SIZE = env_int("TILE_SIZE", 640)
+TILE_OVERLAP = env_float("TILE_OVERLAP", 0.2)
+TILE_NMS_IOU = env_float("TILE_NMS_IOU", 0.5)
+TILE_AUTO_MIN_SIDE = env_int("TILE_AUTO_MIN_SIDE", 1920)
+
+# 视频流会话: 关键帧间隔、画面突变阈值、最低跟踪比例和轨迹匹配IoU阈值
+STREAM_KEYFRAME_INTERVAL = env_int("STREAM_KEYFRAME_INTERVAL", 10)
+STREAM_SCENE_CHANGE = env_float("STREAM_SCENE_CHANGE", 0.25)
+STREAM_MIN_TRACK_RATIO = env_float("STREAM_MIN_TRACK_RATIO", 0.5)
+STREAM_MATCH_IOU = env_float("STREAM_MATCH_IOU", 0.3)
+
+# 近重复结果复用: 感知哈希汉明距离不超过阈值的最近请求直接复用其检测结果
+NEAR_DUP_ENABLED = env_bool("NEAR_DUP_ENABLED", False)
+NEAR_DUP_MAX_DISTANCE = env_int("NEAR_DUP_MAX_DISTANCE", 6)
+NEAR_DUP_CAPACITY = env_int("NEAR_DUP_CAPACITY", 1024)
+NEAR_DUP_TTL = env_float("NEAR_DUP_TTL", 300.0)
+
+# 异步作业: 排队作业数上限、工作协程数、单个作业的最大项数、结果保留时间(秒)和作业使用的优先级类别
+JOB_QUEUE_SIZE = env_int("JOB_QUEUE_SIZE", 100)
+JOB_WORKERS = env_int("JOB_WORKERS", 2)
+JOB_MAX_ITEMS = env_int("JOB_MAX_ITEMS", 1000)
+JOB_TTL = env_float("JOB_TTL", 3600.0)
+JOB_PRIORITY_CLASS = os.getenv("JOB_PRIORITY_CLASS", "bulk")
+# 完成的作业结果另存为姿态结果归档的目录 (为空表示不保存)
+JOB_ARCHIVE_DIR = os.getenv("JOB_ARCHIVE_DIR", "")
+
+# 推理层: local (默认，本进程的检测器副本池)、inproc (进程内工作队列 + 推理线程)、
+# manager (本地TCP队列服务) 或 redis。后两种模式下本进程只负责HTTP解析和解码，
+# 推理由独立的 inference_worker.py 进程完成，API层和推理层可以分别扩缩容
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "local")
+WORK_QUEUE_ADDRESS = os.getenv("WORK_QUEUE_ADDRESS", "127.0.0.1:50055")
+WORK_QUEUE_AUTHKEY = os.getenv("WORK_QUEUE_AUTHKEY", "cloudpose")
+WORK_QUEUE_BATCH_SIZE = env_int("WORK_QUEUE_BATCH_SIZE", 8)
+# 整图推理的帧在放入队列前缩小到的最长边
+WORK_QUEUE_MAX_SIDE = env_int("WORK_QUEUE_MAX_SIDE", 640)
+WORK_QUEUE_TIMEOUT = env_float("WORK_QUEUE_TIMEOUT", 60.0)
+# manager后端经共享内存传递帧的槽位数 (0表示不使用，推理工作进程须与前端在同一台机器上)
+WORK_QUEUE_SHM_SLOTS = env_int("WORK_QUEUE_SHM_SLOTS", 0)
+
+# 分阶段流水线: 解码、预处理、推理和后处理/编码各自有工作者和有界队列，不同请求的各阶段并行执行
+PIPELINE_ENABLED = env_bool("PIPELINE_ENABLED", False)
+PIPELINE_DECODE_WORKERS = env_int("PIPELINE_DECODE_WORKERS", 2)
+PIPELINE_PREPROCESS_WORKERS = env_int("PIPELINE_PREPROCESS_WORKERS", 1)
+# 推理阶段的并发数 (同时向副本池或推理工作者提交的请求数)
+PIPELINE_INFERENCE_WORKERS = env_int("PIPELINE_INFERENCE_WORKERS", 8)
+PIPELINE_ENCODE_WORKERS = env_int("PIPELINE_ENCODE_WORKERS", 2)
+PIPELINE_QUEUE_SIZE = env_int("PIPELINE_QUEUE_SIZE", 64)
+# 预处理阶段把整图推理的帧缩小到的最长边 (0表示不缩小)
+PIPELINE_MAX_SIDE = env_int("PIPELINE_MAX_SIDE", 640)
+PIPELINE_REPORT_INTERVAL = env_float("PIPELINE_REPORT_INTERVAL", 5.0)
+
+# 预热配置: 在报告就绪之前，对服务会用到的每个批大小和分辨率执行合成推理
+WARMUP_ENABLED = env_bool("WARMUP_ENABLED", True)
+# 默认批大小取服务实际使用的批大小: 单帧请求，inproc推理线程还会组成最多WORK_QUEUE_BATCH_SIZE帧的批
+WARMUP_BATCH_SIZES = sorted({int(b) for b in env_list(
+    "WARMUP_BATCH_SIZES", f"1,{WORK_QUEUE_BATCH_SIZE}" if INFERENCE_BACKEND == "inproc" else "1"
+)})
+WARMUP_IMAGE_SIZES = parse_sizes(env_list("WARMUP_IMAGE_SIZES", "640x480"))
+# 分块推理按分块网格组批，在这些原图分辨率上各执行一次分块检测 (为空表示不预热分块推理)
+# 默认是达到自动分块阈值的16:9图像
+WARMUP_TILED_SIZES = parse_sizes(env_list(
+    "WARMUP_TILED_SIZES", f"{TILE_AUTO_MIN_SIDE}x{TILE_AUTO_MIN_SIDE * 9 // 16}"
+))
+WARMUP_ROUNDS = env_int("WARMUP_ROUNDS", 2)
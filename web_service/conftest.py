@@ -0,0 +1,6 @@
+"""
+pytest配置
+test_client.py 和 quick_test.py 是需要运行中服务的手动测试脚本，不作为单元测试收集
+"""
+
+collect_ignore = ["test_client.py", "quick_test.py"]
@@ -0,0 +1,152 @@
+"""
+CPU亲和性与NUMA感知的工作进程绑定
+将进程可用的CPU集合 (os.sched_getaffinity) 按NUMA节点划分给各工作进程，
+每个工作进程的推理线程只在自己的CPU切片上运行，并优先使用本节点内存。
+"""
+
+import ctypes
+import ctypes.util
+import glob
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+def parse_cpulist(text):
+    """
+    解析Linux CPU列表格式
+    Args:
+        text: 形如 "0-3,8-11" 的字符串
+    Returns:
+        list: CPU编号列表
+    """
+    cpus = []
+    for part in text.strip().split(","):
+        if not part:
+            continue
+        if "-" in part:
+            start, end = part.split("-")
+            cpus.extend(range(int(start), int(end) + 1))
+        else:
+            cpus.append(int(part))
+    return cpus
+
+
+def numa_nodes(available=None):
+    """
+    读取NUMA拓扑
+    Args:
+        available: 可用CPU集合，默认为当前进程的亲和性集合
+    Returns:
+        dict: {节点编号: 该节点上可用的CPU列表}，无法读取拓扑时视为单节点
+    """
+    if available is None:
+        available = os.sched_getaffinity(0)
+    available = set(available)
+
+    nodes = {}
+    for path in sorted(glob.glob("/sys/devices/system/node/node[0-9]*/cpulist")):
+        node = int(os.path.basename(os.path.dirname(path))[4:])
+        with open(path) as f:
+            cpus = sorted(set(parse_cpulist(f.read())) & available)
+        if cpus:
+            nodes[node] = cpus
+
+    if not nodes:
+        nodes = {0: sorted(available)}
+    return nodes
+
+
+def _split(items, parts):
+    """将列表尽量均匀地切分为连续的若干段"""
+    size, remainder = divmod(len(items), parts)
+    slices, start = [], 0
+    for i in range(parts):
+        end = start + size + (1 if i < remainder else 0)
+        slices.append(items[start:end])
+        start = end
+    return slices
+
+
+def partition_cpus(workers, available=None):
+    """
+    将可用CPU划分给各工作进程
+    工作进程按各节点的CPU数量比例分配到NUMA节点上，切片不跨节点；
+    工作进程数少于节点数时无法保证切片不跨节点，退化为按编号均匀切分
+    Args:
+        workers: 工作进程数
+        available: 可用CPU集合，默认为当前进程的亲和性集合
+    Returns:
+        list: 每个工作进程的 {"node": 节点编号或None, "cpus": CPU列表}
+    """
+    nodes = numa_nodes(available)
+    total = sum(len(cpus) for cpus in nodes.values())
+    if workers > total:
+        raise ValueError(f"工作进程数 ({workers}) 超过可用CPU数 ({total})")
+
+    if workers < len(nodes):
+        all_cpus = sorted(cpu for cpus in nodes.values() for cpu in cpus)
+        return [{"node": None, "cpus": cpus} for cpus in _split(all_cpus, workers)]
+
+    # 按CPU数量比例为每个节点分配工作进程 (最大余数法，每个节点至少一个)
+    quotas = {node: len(cpus) * workers / total for node, cpus in nodes.items()}
+    counts = {node: max(1, int(quota)) for node, quota in quotas.items()}
+    while sum(counts.values()) < workers:
+        node = max(quotas, key=lambda n: quotas[n] - counts[n])
+        counts[node] += 1
+    while sum(counts.values()) > workers:
+        node = max((n for n in counts if counts[n] > 1), key=lambda n: counts[n] - quotas[n])
+        counts[node] -= 1
+
+    partitions = []
+    for node, cpus in sorted(nodes.items()):
+        for cpu_slice in _split(cpus, counts[node]):
+            partitions.append({"node": node, "cpus": cpu_slice})
+    return partitions
+
+
+def pin_process(cpus):
+    """将当前进程 (及之后创建的线程) 绑定到指定CPU"""
+    os.sched_setaffinity(0, cpus)
+
+
+def prefer_node_memory(node):
+    """
+    让当前进程优先从指定NUMA节点分配内存
+    需要libnuma；不可用时依赖Linux默认的首次访问本地分配策略
+    (进程已绑定到本节点CPU，新分配的内存通常也在本节点)
+    Returns:
+        bool: 是否成功设置内存策略
+    """
+    if node is None:
+        return False
+
+    library = ctypes.util.find_library("numa")
+    if not library:
+        logger.info("未找到libnuma，使用默认的首次访问本地内存分配")
+        return False
+
+    try:
+        libnuma = ctypes.CDLL(library)
+        if libnuma.numa_available() < 0:
+            return False
+        libnuma.numa_set_preferred(ctypes.c_int(node))
+        return True
+    except (OSError, AttributeError) as e:
+        logger.warning(f"设置NUMA内存策略失败: {e}")
+        return False
+
+
+def pin_worker(partition):
+    """
+    绑定工作进程到CPU切片并设置内存策略
+    Args:
+        partition: partition_cpus返回的一项
+    Returns:
+        int: 切片中的CPU数量 (用作推理线程数)
+    """
+    pin_process(partition["cpus"])
+    prefer_node_memory(partition["node"])
+    logger.info(f"工作进程已绑定: 节点={partition['node']}, CPU={partition['cpus']}")
+    return len(partition["cpus"])
@@ -0,0 +1,146 @@
+"""
+图模式推理
+将YOLO网络编译为静态形状图 (torch.compile或TorchScript freeze + optimize_for_inference)，
+减少eager模式逐算子分发的开销。每个允许的 (批大小, 分辨率) 组合对应一个静态形状桶，
+编译结果持久化在磁盘缓存中，同一节点上只有第一个Pod需要付出编译时间。
+"""
+
+import logging
+import os
+import time
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+GRAPH_MODES = ("eager", "torchscript", "compile")
+
+
+class _FirstOutput(torch.nn.Module):
+    """只返回网络的第一个输出 (预测张量)，便于追踪为静态图"""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, x):
+        return self.model(x)[0]
+
+
+class GraphRunner:
+    """
+    按静态形状桶分发的图模式网络
+    替换Ultralytics AutoBackend内部的网络对象，调用签名与原网络兼容
+    """
+
+    def __init__(self, module, mode, batch_sizes, imgsz_list, cache_dir, checksum):
+        """
+        Args:
+            module: 原始 (已融合的) PyTorch网络
+            mode: "torchscript" 或 "compile"
+            batch_sizes: 允许的批大小列表
+            imgsz_list: 允许的 (正方形) 输入分辨率列表
+            cache_dir: 编译缓存目录
+            checksum: 模型校验和，用于区分不同模型的缓存
+        """
+        if mode not in ("torchscript", "compile"):
+            raise ValueError(f"不支持的图模式: {mode}")
+
+        self.module = module
+        self.mode = mode
+        self.batch_sizes = sorted(set(batch_sizes))
+        self.imgsz_list = sorted(set(imgsz_list))
+        self.cache_dir = cache_dir
+        self.checksum = checksum
+        self.graphs = {}
+        self.compile_timings = {}
+        self.fallback_count = 0
+        self._compiled = None
+
+        os.makedirs(cache_dir, exist_ok=True)
+        if mode == "compile":
+            self._configure_inductor_cache()
+
+    def _configure_inductor_cache(self):
+        """将Inductor的编译缓存持久化到磁盘缓存目录"""
+        os.environ.setdefault("TORCHINDUCTOR_CACHE_DIR", os.path.join(self.cache_dir, "inductor"))
+        os.environ.setdefault("TORCHINDUCTOR_FX_GRAPH_CACHE", "1")
+        import torch._dynamo
+        import torch._inductor.config
+
+        torch._inductor.config.fx_graph_cache = True
+        # 每个静态形状桶对应一次重新编译
+        limit = len(self.batch_sizes) * len(self.imgsz_list) + 1
+        torch._dynamo.config.cache_size_limit = max(torch._dynamo.config.cache_size_limit, limit)
+        self._compiled = torch.compile(_FirstOutput(self.module), backend="inductor", dynamic=False)
+
+    def _torchscript_path(self, batch_size, imgsz):
+        """TorchScript图的缓存路径 (包含torch版本，避免跨版本加载)"""
+        version = torch.__version__.split("+")[0]
+        name = f"{self.checksum[:16]}-torch{version}-b{batch_size}-s{imgsz}.torchscript"
+        return os.path.join(self.cache_dir, name)
+
+    def _build_torchscript(self, batch_size, imgsz):
+        """加载或构建一个静态形状桶的TorchScript图"""
+        path = self._torchscript_path(batch_size, imgsz)
+        if os.path.exists(path):
+            return torch.jit.load(path, map_location="cpu")
+
+        example = torch.zeros(batch_size, 3, imgsz, imgsz)
+        with torch.no_grad():
+            traced = torch.jit.trace(_FirstOutput(self.module).eval(), example)
+            graph = torch.jit.optimize_for_inference(torch.jit.freeze(traced))
+
+        # 先写临时文件再原子重命名，避免并发启动的Pod读到半成品
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        torch.jit.save(graph, tmp_path)
+        os.replace(tmp_path, path)
+        return graph
+
+    def build(self):
+        """
+        为每个静态形状桶加载或编译图
+        Returns:
+            dict: 每个桶的耗时 {"批大小x分辨率": 秒}
+        """
+        for imgsz in self.imgsz_list:
+            for batch_size in self.batch_sizes:
+                start = time.time()
+                if self.mode == "torchscript":
+                    self.graphs[(batch_size, imgsz, imgsz)] = self._build_torchscript(batch_size, imgsz)
+                else:
+                    with torch.no_grad():
+                        self._compiled(torch.zeros(batch_size, 3, imgsz, imgsz))
+                    self.graphs[(batch_size, imgsz, imgsz)] = self._compiled
+                elapsed = time.time() - start
+                self.compile_timings[f"{batch_size}x{imgsz}"] = elapsed
+                logger.info(f"图模式({self.mode})桶就绪: 批大小={batch_size}, 分辨率={imgsz}, 耗时={elapsed:.2f}s")
+        return self.compile_timings
+
+    def select_bucket(self, images):
+        """
+        为一批图像选择静态形状桶
+        Args:
+            images: 图像列表 (数量不超过最大批大小)
+        Returns:
+            batch_size: 补齐后的批大小
+            imgsz: 输入分辨率 (不小于图像最长边的最小桶，否则取最大桶)
+        """
+        count = len(images)
+        batch_size = next((b for b in self.batch_sizes if b >= count), self.batch_sizes[-1])
+        longest = max(max(image.shape[:2]) for image in images)
+        imgsz = next((s for s in self.imgsz_list if s >= longest), self.imgsz_list[-1])
+        return batch_size, imgsz
+
+    @property
+    def max_batch_size(self):
+        """最大批大小"""
+        return self.batch_sizes[-1]
+
+    def __call__(self, im, *args, **kwargs):
+        graph = self.graphs.get(tuple(im.shape[:1]) + tuple(im.shape[2:]))
+        if graph is None:
+            # 不在任何静态形状桶内，回退到eager模式
+            self.fallback_count += 1
+            return self.module(im, *args, **kwargs)
+        return graph(im)
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+CloudPose推理工作进程
+从工作队列批量取出前端放入的帧，用PoseDetector批量推理后把检测数组放回对应前端的结果队列。
+与API前端 (main.py, INFERENCE_BACKEND=manager/redis) 分开部署，两层可以独立扩缩容。
+
+--local-demo 在一台机器上端到端运行: 启动本地队列服务、推理工作进程和一个前端，
+提交一批图像并报告吞吐量和平均批大小，结果与逐帧提交的参考结果不一致时以非零状态退出。
+"""
+
+import logging
+import sys
+import threading
+import time
+
+import config
+from shm_transport import open_frame
+from work_queue import open_queue
+
+logger = logging.getLogger("inference_worker")
+
+
+class InferenceWorker:
+    """推理工作者: 批量取出任务、推理并返回结果"""
+
+    def __init__(self, detector, work_queue, batch_size=8, poll_timeout=1.0, error_backoff=1.0):
+        """
+        Args:
+            detector: PoseDetector实例
+            work_queue: 工作队列后端
+            batch_size: 每批最多处理的帧数
+            poll_timeout: 等待第一个任务的超时时间(秒)，任务到达时立即返回，
+                之后只取出已经到达的任务组成一批 (不为凑批而等待)
+            error_backoff: 读取队列失败后重试前的等待时间(秒)
+        """
+        self.detector = detector
+        self.queue = work_queue
+        self.batch_size = batch_size
+        self.poll_timeout = poll_timeout
+        self.error_backoff = error_backoff
+        self.frames = 0
+        self.batches = 0
+        self.errors = 0
+        self._stopped = threading.Event()
+
+    def step(self):
+        """
+        取出并处理一批任务
+        Returns:
+            int: 处理的任务数
+        """
+        tasks = self.queue.get_tasks(self.batch_size, self.poll_timeout)
+        if not tasks:
+            return 0
+
+        start = time.time()
+        live, shared = [], []
+        try:
+            for task in tasks:
+                if task.get("frame_ref") is not None:
+                    # 共享内存中的帧: 零拷贝视图，处理完后释放槽位
+                    try:
+                        ring, task["frame"] = open_frame(task["frame_ref"])
+                    except Exception as e:
+                        logger.error(f"读取共享内存帧失败: {e}")
+                        self._reply(task, start, error=f"读取共享内存帧失败: {e}")
+                        continue
+                    shared.append((ring, task["frame_ref"]))
+                # 排队期间已过期的任务不再推理
+                if task["deadline"] is not None and start >= task["deadline"]:
+                    self._reply(task, start, error="deadline")
+                else:
+                    live.append(task)
+
+            batch = [task for task in live if not task["tiled"]]
+            if batch:
+                self._run_batch(batch, start)
+            for task in live:
+                if task["tiled"]:
+                    self._run_tiled(task, start)
+        finally:
+            for task in tasks:
+                task["frame"] = None
+            for ring, ref in shared:
+                ring.release(ref)
+
+        self.frames += len(tasks)
+        self.batches += 1
+        return len(tasks)
+
+    def _run_batch(self, batch, start):
+        """整图推理: 一批帧一次前向"""
+        try:
+            results, preprocess_time, inference_time, postprocess_time = self.detector.detect_batch(
+                [task["frame"] for task in batch]
+            )
+            for task, result in zip(batch, results):
+                self._reply(task, start, arrays=self.detector.results_to_arrays([result]),
+                            timings=(preprocess_time, inference_time, postprocess_time), batch_size=len(batch))
+        except Exception as e:
+            if len(batch) > 1:
+                # 逐帧重试，一帧出错不影响同批的其他帧
+                logger.warning(f"批量推理失败，逐帧重试: {e}")
+                for task in batch:
+                    self._run_batch([task], start)
+                return
+            logger.error(f"推理失败: {e}")
+            self._reply(batch[0], start, error=str(e))
+
+    def _run_tiled(self, task, start):
+        """分块推理: 分块本身组成一批"""
+        try:
+            arrays, *timings = self.detector.detect_tiled(
+                task["frame"], tile_size=config.TILE_SIZE, overlap=config.TILE_OVERLAP,
+                iou_threshold=config.TILE_NMS_IOU,
+            )
+            self._reply(task, start, arrays=arrays, timings=tuple(timings), batch_size=1)
+        except Exception as e:
+            logger.error(f"分块推理失败: {e}")
+            self._reply(task, start, error=str(e))
+
+    def _reply(self, task, start, arrays=None, timings=(0.0, 0.0, 0.0), batch_size=0, error=None):
+        """把结果放回前端的结果队列 (失败时记录日志，前端等待超时)"""
+        if error is not None:
+            self.errors += 1
+        try:
+            self.queue.put_result(task["frontend"], {
+                "task_id": task["task_id"],
+                "arrays": arrays,
+                "timings": timings,
+                "queue_time": start - task["submitted"],
+                "batch_size": batch_size,
+                "error": error,
+            })
+        except Exception as e:
+            logger.error(f"写入结果队列失败: {e}")
+
+    def run_forever(self, report_interval=60):
+        """持续处理任务，定期报告吞吐量 (读取队列失败时等待后重试，直到调用stop)"""
+        last_report, last_frames = time.time(), 0
+        while not self._stopped.is_set():
+            try:
+                self.step()
+            except Exception as e:
+                # 队列或Redis的暂时性故障: 不退出工作循环
+                logger.error(f"读取工作队列失败: {e}")
+                self._stopped.wait(self.error_backoff)
+            now = time.time()
+            if report_interval and now - last_report >= report_interval:
+                rate = (self.frames - last_frames) / (now - last_report)
+                logger.info(f"吞吐量 {rate:.2f} 帧/秒, 平均批大小 {self.frames / max(1, self.batches):.2f}")
+                last_report, last_frames = now, self.frames
+
+    def start_thread(self):
+        """在后台线程中运行 (inproc后端)"""
+        thread = threading.Thread(target=self.run_forever, daemon=True, name="inference-worker")
+        thread.start()
+        return thread
+
+    def stop(self):
+        """让run_forever在当前一批处理完后返回"""
+        self._stopped.set()
+
+
+def load_worker(args):
+    """加载检测器并连接工作队列"""
+    import torch
+    from pose_detector import PoseDetector
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    detector = PoseDetector(args.model)
+    detector.warmup(batch_sizes=sorted({1, args.batch_size}), tiled_image_sizes=config.WARMUP_TILED_SIZES,
+                    tile_size=config.TILE_SIZE, overlap=config.TILE_OVERLAP)
+    work_queue = open_queue(args.backend, args.address, args.authkey)
+    return InferenceWorker(detector, work_queue, args.batch_size, args.poll_timeout)
+
+
+def _demo_worker(args):
+    """演示用的推理工作进程入口"""
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(name)s] %(message)s")
+    load_worker(args).run_forever(report_interval=10)
+
+
+def _check_result(arrays, frame, expected_people):
+    """
+    检查结果是否属于该帧: 人数与逐帧提交的参考结果一致 (批内letterbox不同，允许相差1人)，
+    且边界框都在该帧范围内
+    Returns:
+        str: 问题描述，没有问题时为None
+    """
+    boxes, _, keypoints = arrays
+    height, width = frame.shape[:2]
+    if abs(len(keypoints) - expected_people) > 1:
+        return f"检测到 {len(keypoints)} 人，参考结果为 {expected_people} 人"
+    if len(boxes) and (boxes[:, 2].max() > width + 1 or boxes[:, 3].max() > height + 1):
+        return f"边界框超出 {width}x{height} 的帧范围"
+    return None
+
+
+def local_demo(args):
+    """在一台机器上端到端运行: 本地队列服务 + 推理工作进程 + 前端"""
+    import asyncio
+    import multiprocessing
+
+    from benchmark import load_frames
+    from metrics import metrics
+    from shm_transport import FrameRing
+    from work_queue import RemoteInference, start_manager
+
+    manager = start_manager(args.address, args.authkey)
+    args.backend = "manager"
+    workers = [multiprocessing.Process(target=_demo_worker, args=(args,), daemon=True)
+               for _ in range(args.workers)]
+    for worker in workers:
+        worker.start()
+
+    async def frontend():
+        ring = FrameRing.create(args.shm_slots) if args.shm_slots else None
+        remote = RemoteInference(open_queue("manager", args.address, args.authkey), timeout=300, ring=ring)
+        remote.start()
+        frames = load_frames(args.images, limit=args.frames)
+        # 逐帧提交得到参考结果 (第一帧同时等待工作进程加载模型)
+        reference = []
+        for frame in frames:
+            (arrays, *_), _ = await remote.infer(frame)
+            reference.append(len(arrays[2]))
+
+        start = time.time()
+        responses = await asyncio.gather(*[
+            remote.infer(frames[i % len(frames)]) for i in range(args.frames)
+        ], return_exceptions=True)
+        elapsed = time.time() - start
+
+        # 检查: 每一帧都返回了结果，且结果属于提交的那一帧
+        failures = []
+        for i, response in enumerate(responses):
+            if isinstance(response, Exception):
+                failures.append(f"帧 {i}: {type(response).__name__}: {response}")
+                continue
+            problem = _check_result(response[0][0], frames[i % len(frames)], reference[i % len(frames)])
+            if problem:
+                failures.append(f"帧 {i}: {problem}")
+        completed = [response for response in responses if not isinstance(response, Exception)]
+        if ring is not None:
+            # 工作进程在返回结果之后才释放槽位，稍等片刻
+            for _ in range(50):
+                if ring.free_slots == ring.slots:
+                    break
+                await asyncio.sleep(0.02)
+            else:
+                failures.append(f"共享内存槽位未全部释放: {ring.slots - ring.free_slots} 个仍被占用")
+
+        people = sum(len(arrays[2]) for (arrays, *_), _ in completed)
+        queue_ms = sum(queue_time for _, queue_time in completed) / max(1, len(completed)) * 1000
+        print(f"帧数: {len(responses)}, 检测到的人数: {people}")
+        print(f"吞吐量: {len(completed) / elapsed:.2f} 帧/秒, 平均排队时间: {queue_ms:.2f}ms")
+        for summary in metrics.snapshot()["summaries"]:
+            if summary["name"] == "cloudpose_remote_batch_size":
+                print(f"平均批大小: {summary['sum'] / summary['count']:.2f}")
+        if ring is not None:
+            ring.close()
+        return failures
+
+    try:
+        failures = asyncio.run(frontend())
+    finally:
+        for worker in workers:
+            worker.terminate()
+        manager.shutdown()
+
+    if failures:
+        print(f"端到端检查失败 ({len(failures)} 项):")
+        for failure in failures[:20]:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("端到端检查通过")
+
+
+def main():
+    """命令行入口"""
+    import argparse
+    from work_queue import serve_manager
+
+    parser = argparse.ArgumentParser(description="CloudPose推理工作进程")
+    parser.add_argument("--backend", choices=["manager", "redis"],
+                        default="redis" if config.INFERENCE_BACKEND == "redis" else "manager",
+                        help="工作队列后端")
+    parser.add_argument("--address", default=config.WORK_QUEUE_ADDRESS,
+                        help="队列地址 (manager为host:port，redis为Redis地址)")
+    parser.add_argument("--authkey", default=config.WORK_QUEUE_AUTHKEY, help="manager后端的认证密钥")
+    parser.add_argument("--model", default=config.MODEL_PATH, help="模型文件路径")
+    parser.add_argument("--batch-size", type=int, default=config.WORK_QUEUE_BATCH_SIZE, help="每批最多处理的帧数")
+    parser.add_argument("--poll-timeout", type=float, default=1.0, help="等待任务的超时时间(秒)")
+    parser.add_argument("--threads", type=int, default=0, help="推理线程数 (0表示使用torch默认值)")
+    parser.add_argument("--serve-queue", action="store_true", help="只运行本地队列服务 (manager后端)")
+    parser.add_argument("--local-demo", action="store_true", help="在本机端到端运行队列服务、推理工作进程和前端")
+    parser.add_argument("--workers", type=int, default=1, help="--local-demo 启动的推理工作进程数")
+    parser.add_argument("--images", default="../client/inputfolder", help="--local-demo 使用的图像目录")
+    parser.add_argument("--frames", type=int, default=64, help="--local-demo 提交的帧数")
+    parser.add_argument("--shm-slots", type=int, default=0,
+                        help="--local-demo 经共享内存传递帧的槽位数 (0表示经队列传递)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(name)s] %(message)s")
+    if args.serve_queue:
+        serve_manager(args.address, args.authkey)
+    elif args.local_demo:
+        local_demo(args)
+    else:
+        load_worker(args).run_forever()
+
+
+if __name__ == "__main__":
+    main()
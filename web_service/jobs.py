@@ -0,0 +1,182 @@
+"""
+异步作业
+大图像、批量和分块推理等耗时请求以作业方式提交: 提交后立即返回作业ID，
+作业在有界队列中排队，由服务内的作业工作协程逐项处理，结果保存在带有效期的结果存储中。
+客户端可以轮询作业状态，也可以以NDJSON流的方式逐项接收结果，不必长时间占用HTTP连接。
+"""
+
+import asyncio
+import logging
+import os
+import time
+import uuid
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFull(Exception):
+    """作业队列已满"""
+
+
+class Job:
+    """一个异步作业"""
+
+    def __init__(self, items):
+        """
+        Args:
+            items: 作业包含的请求项列表
+        """
+        self.job_id = uuid.uuid4().hex
+        self.items = items
+        self.total = len(items)
+        self.status = "queued"
+        self.results = []
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.archive = None
+        # 每追加一个结果就触发并替换，NDJSON流据此等待新结果
+        self._changed = asyncio.Event()
+
+    @property
+    def done(self):
+        return self.status in ("completed", "failed")
+
+    def append(self, result):
+        """追加一项结果并通知等待者"""
+        self.results.append(result)
+        self._notify()
+
+    def finish(self, status, error=None):
+        """结束作业"""
+        self.status = status
+        self.error = error
+        self.finished = time.time()
+        self.items = None  # 释放图像数据
+        self._notify()
+
+    def _notify(self):
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def stream(self):
+        """按完成顺序逐项产出结果，作业结束后停止"""
+        index = 0
+        while True:
+            changed = self._changed
+            while index < len(self.results):
+                yield self.results[index]
+                index += 1
+            if self.done:
+                return
+            await changed.wait()
+
+    def summary(self):
+        """作业状态摘要"""
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "completed": len(self.results),
+            "total": self.total,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "error": self.error,
+            "archive": self.archive,
+        }
+
+
+class JobManager:
+    """作业队列、工作协程和带有效期的结果存储"""
+
+    def __init__(self, process_item, queue_size=100, workers=2, ttl=3600.0, archive_dir=None):
+        """
+        Args:
+            process_item: 处理一项的协程函数 process_item(item) -> dict
+            queue_size: 排队作业数上限
+            workers: 工作协程数量
+            ttl: 作业结束后结果的保留时间(秒)
+            archive_dir: 完成的作业结果另存为姿态结果归档的目录 (每个作业一个子目录)，None表示不保存
+        """
+        self.process_item = process_item
+        self.archive_dir = archive_dir
+        self.queue_size = queue_size
+        self.workers = workers
+        self.ttl = ttl
+        self._jobs = {}
+        self._queue = None
+        self._tasks = []
+
+    def start(self):
+        """在事件循环中启动工作协程"""
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+
+    def _purge(self):
+        """清理超过有效期的已结束作业"""
+        now = time.time()
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.done and now - job.finished > self.ttl]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def submit(self, items):
+        """
+        提交作业
+        Returns:
+            Job: 已入队的作业
+        Raises:
+            QueueFull: 队列已满
+        """
+        self._purge()
+        job = Job(items)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            metrics.inc("cloudpose_jobs_total", labels={"status": "rejected"})
+            raise QueueFull(f"作业队列已满 ({self.queue_size})")
+        self._jobs[job.job_id] = job
+        metrics.set_gauge("cloudpose_job_queue_depth", self._queue.qsize())
+        return job
+
+    def get(self, job_id):
+        """按ID查找作业，不存在或已过期时返回None"""
+        self._purge()
+        return self._jobs.get(job_id)
+
+    def _archive(self, job):
+        """把作业结果写入姿态结果归档 (失败的项只写入索引)，返回归档目录"""
+        from result_archive import ArchiveWriter
+
+        path = os.path.join(self.archive_dir, job.job_id)
+        with ArchiveWriter(path) as writer:
+            for result in job.results:
+                if "error" in result:
+                    writer.append(result["id"], [], [], [])
+                else:
+                    writer.append_response(result)
+        return path
+
+    async def _worker(self, index):
+        """工作协程: 从队列取出作业并逐项处理"""
+        while True:
+            job = await self._queue.get()
+            metrics.set_gauge("cloudpose_job_queue_depth", self._queue.qsize())
+            job.status = "running"
+            job.started = time.time()
+            try:
+                for item in job.items:
+                    job.append(await self.process_item(item))
+                if self.archive_dir:
+                    job.archive = await asyncio.get_running_loop().run_in_executor(None, self._archive, job)
+                job.finish("completed")
+            except Exception as e:
+                logger.error(f"作业执行失败，ID: {job.job_id}, 错误: {e}")
+                job.finish("failed", str(e))
+            finally:
+                self._queue.task_done()
+            metrics.inc("cloudpose_jobs_total", labels={"status": job.status})
+            metrics.observe("cloudpose_job_seconds", job.finished - job.created)
@@ -1,15 +1,31 @@
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import JSONResponse
+import time
+
+# 进程启动时间，用于统计从启动到就绪的总耗时
+PROCESS_START = time.time()
+
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
+import asyncio
 import base64
+import json
 import cv2
 import numpy as np
-import time
 import logging
 import threading
-from pose_detector import PoseDetector
-import io
-from PIL import Image
+from typing import List, Literal
+from pose_detector import PoseDetector, draw_poses
+from model_store import ModelStore
+from model_pool import build_pool
+from scheduler import DEFAULT_CLASS, DeadlineExceeded, PriorityClassifier
+from tracking import StreamSession
+from near_duplicate import NearDuplicateIndex, hash_image_bytes, image_size, rescale_arrays
+from jobs import JobManager, QueueFull
+from work_queue import RemoteInference, compact_frame, open_queue
+from shm_transport import FrameRing
+from pipeline import Stage, StagedPipeline
+import config
+from metrics import metrics
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
@@ -20,27 +36,287 @@ app = FastAPI(title="CloudPose API", description="Pose Detection Web Service")
 # 全局姿态检测器实例
 detector = None
 
-@app.on_event("startup")
-async def startup_event():
-    """应用启动时初始化模型"""
+# 检测器副本池 (副本共享网络权重，各自拥有独立的预测器)
+pool = None
+
+# 工作队列前端 (INFERENCE_BACKEND不为local时使用，推理由推理工作者完成)
+remote = None
+
+# 请求优先级分类器
+classifier = PriorityClassifier(
+    default_class=config.PRIORITY_DEFAULT_CLASS,
+    client_classes=config.PRIORITY_CLIENT_CLASSES,
+    id_prefix_classes=config.PRIORITY_ID_PREFIX_CLASSES,
+    endpoint_classes=config.PRIORITY_ENDPOINT_CLASSES,
+)
+
+# 近重复结果索引 (未启用时为None)
+near_duplicates = NearDuplicateIndex(
+    capacity=config.NEAR_DUP_CAPACITY,
+    max_distance=config.NEAR_DUP_MAX_DISTANCE,
+    ttl=config.NEAR_DUP_TTL,
+) if config.NEAR_DUP_ENABLED else None
+
+# 服务状态: 模型加载并预热完成后才报告就绪
+service_state = {
+    "ready": False,
+    "error": None,
+    "warmup_seconds": None,
+    "warmup_timings": {},
+    "startup_phases": {},
+    "numerics": {},
+    "stream_sessions": 0,
+    "in_flight": 0,
+}
+
+def record_startup_phase(phase, seconds):
+    """记录并导出一个启动阶段的耗时"""
+    service_state["startup_phases"][phase] = round(seconds, 3)
+    metrics.set_gauge("cloudpose_startup_phase_seconds", seconds, {"phase": phase})
+    logger.info(f"启动阶段 {phase} 耗时 {seconds:.2f}s")
+
+def load_detector():
+    """
+    拉取并加载模型，应用数值选项和图模式
+    多进程启动器会在fork之前调用本函数，使所有工作进程共享同一份模型内存
+    """
     global detector
+
+    model_path = config.MODEL_PATH
+    if config.MODEL_SHA256:
+        start_fetch = time.time()
+        store = ModelStore(config.MODEL_STORE_DIR)
+        model_path = store.fetch(config.MODEL_SHA256, config.MODEL_SOURCE or None)
+        record_startup_phase("model_fetch", time.time() - start_fetch)
+
+    logger.info("正在加载YOLO姿态检测模型...")
+    start_load = time.time()
+    detector = PoseDetector(
+        model_path,
+        artifact_cache_dir=config.MODEL_ARTIFACT_CACHE_DIR or None,
+        artifact_imgsz=config.MODEL_ARTIFACT_IMGSZ,
+        build_artifact=config.MODEL_ARTIFACT_BUILD,
+        mmap_weights=config.MODEL_MMAP,
+    )
+    for phase, seconds in detector.load_timings.items():
+        record_startup_phase(f"model_{phase}", seconds)
+    metrics.set_gauge("cloudpose_model_load_seconds", time.time() - start_load)
+    logger.info("模型加载完成")
+
+    if config.NUMERICS_OPTIONS:
+        from benchmark import load_frames
+
+        start_numerics = time.time()
+        # 只使用真实图像 (合成噪声图像中没有人，无法确认选项不影响检测结果)
+        frames = load_frames(config.NUMERICS_IMAGES, limit=config.NUMERICS_FRAMES, synthetic=False)
+        report = detector.configure_numerics(
+            config.NUMERICS_OPTIONS,
+            verify=config.NUMERICS_VERIFY,
+            frames=frames,
+            min_iou=config.NUMERICS_MIN_IOU,
+            score_tolerance=config.NUMERICS_SCORE_TOLERANCE,
+            keypoint_tolerance=config.NUMERICS_KEYPOINT_TOLERANCE,
+        )
+        service_state["numerics"] = report
+        for option, entry in report.items():
+            metrics.set_gauge("cloudpose_numerics_enabled", int(entry["enabled"]), {"option": option})
+        record_startup_phase("numerics_verify", time.time() - start_numerics)
+
+    if config.GRAPH_MODE != "eager":
+        start_compile = time.time()
+        detector.enable_graph_mode(
+            config.GRAPH_MODE,
+            batch_sizes=config.GRAPH_BATCH_SIZES,
+            imgsz_list=config.GRAPH_IMGSZ,
+            cache_dir=config.GRAPH_CACHE_DIR,
+        )
+        record_startup_phase("graph_compile", time.time() - start_compile)
+
+    if config.PREFILTER_ENABLED:
+        start_prefilter = time.time()
+        detector.enable_presence_gate(
+            config.PREFILTER_MODEL,
+            imgsz=config.PREFILTER_IMGSZ,
+            conf=config.PREFILTER_CONF,
+            min_std=config.PREFILTER_MIN_STD,
+        )
+        record_startup_phase("prefilter_load", time.time() - start_prefilter)
+    return detector
+
+def initialize_service():
+    """加载模型 (未预加载时)、构建副本池并执行预热 (在后台线程中运行)"""
+    global pool
     try:
-        logger.info("正在加载YOLO姿态检测模型...")
-        detector = PoseDetector()
-        logger.info("模型加载完成")
+        record_startup_phase("app_import", service_state["app_imported_at"] - PROCESS_START)
+
+        if config.INFERENCE_BACKEND in ("manager", "redis"):
+            # 推理由独立的推理工作进程完成，本进程不加载模型
+            service_state["ready"] = True
+            metrics.set_gauge("cloudpose_ready", 1)
+            record_startup_phase("total", time.time() - PROCESS_START)
+            return
+
+        if detector is None:
+            load_detector()
+
+        if config.INFERENCE_BACKEND == "inproc":
+            warmup = detector.warmup
+        else:
+            start_pool = time.time()
+            pool = build_pool(
+                detector, config.POOL_SIZE, config.POOL_THREADS_PER_REPLICA,
+                service_time_factor=config.DEADLINE_SERVICE_FACTOR,
+                class_weights=config.PRIORITY_WEIGHTS,
+            )
+            service_state["pool_size"] = pool.size
+            record_startup_phase("pool_build", time.time() - start_pool)
+            warmup = pool.warmup
+
+        if config.WARMUP_ENABLED:
+            logger.info("正在预热模型...")
+            total_time, timings = warmup(
+                batch_sizes=config.WARMUP_BATCH_SIZES,
+                image_sizes=config.WARMUP_IMAGE_SIZES,
+                rounds=config.WARMUP_ROUNDS,
+                tiled_image_sizes=config.WARMUP_TILED_SIZES,
+                tile_size=config.TILE_SIZE,
+                overlap=config.TILE_OVERLAP,
+            )
+            service_state["warmup_seconds"] = round(total_time, 3)
+            service_state["warmup_timings"] = {k: round(v, 3) for k, v in timings.items()}
+            metrics.set_gauge("cloudpose_warmup_seconds", total_time)
+            record_startup_phase("warmup", total_time)
+            for shape, elapsed in timings.items():
+                metrics.set_gauge("cloudpose_warmup_shape_seconds", elapsed, {"shape": shape})
+            logger.info(f"模型预热完成，耗时 {total_time:.2f}s")
+
+        if config.INFERENCE_BACKEND == "inproc":
+            # 推理线程在预热之后启动 (预测器不支持多线程并发调用)
+            from inference_worker import InferenceWorker
+
+            InferenceWorker(detector, open_queue("inproc"), config.WORK_QUEUE_BATCH_SIZE).start_thread()
+
+        service_state["ready"] = True
+        metrics.set_gauge("cloudpose_ready", 1)
+        record_startup_phase("total", time.time() - PROCESS_START)
     except Exception as e:
+        service_state["error"] = str(e)
         logger.error(f"模型加载失败: {e}")
-        raise e
+
+@app.middleware("http")
+async def report_load(request: Request, call_next):
+    """
+    在响应头中报告本进程的负载，供路由代理 (router.py) 选择后端:
+    X-In-Flight 为正在处理的请求数，X-Queue-Depth 为等待检测器副本 (或推理工作者) 的请求数
+    """
+    service_state["in_flight"] += 1
+    try:
+        response = await call_next(request)
+    finally:
+        service_state["in_flight"] -= 1
+    response.headers["X-In-Flight"] = str(service_state["in_flight"])
+    response.headers["X-Queue-Depth"] = str(queue_depth())
+    return response
+
+def queue_depth():
+    """等待推理的请求数"""
+    if remote is not None:
+        return remote.pending
+    return pool.waiting if pool else 0
+
+@app.on_event("startup")
+async def startup_event():
+    """应用启动时在后台初始化模型，服务端口立即可用但在预热完成前不报告就绪"""
+    service_state["app_imported_at"] = time.time()
+    global remote
+    metrics.set_gauge("cloudpose_ready", 0)
+    job_manager.start()
+    if pipeline is not None:
+        pipeline.start()
+    if config.INFERENCE_BACKEND != "local":
+        ring = None
+        if config.INFERENCE_BACKEND == "manager" and config.WORK_QUEUE_SHM_SLOTS > 0:
+            side = config.WORK_QUEUE_MAX_SIDE
+            ring = FrameRing.create(config.WORK_QUEUE_SHM_SLOTS, slot_bytes=side * side * 3)
+            logger.info(f"共享内存帧传输: {ring.name}, {ring.slots} 个槽位")
+        remote = RemoteInference(
+            open_queue(config.INFERENCE_BACKEND, config.WORK_QUEUE_ADDRESS, config.WORK_QUEUE_AUTHKEY),
+            max_side=config.WORK_QUEUE_MAX_SIDE,
+            timeout=config.WORK_QUEUE_TIMEOUT,
+            ring=ring,
+        )
+        remote.start()
+        logger.info(f"推理层: {config.INFERENCE_BACKEND} 工作队列")
+    asyncio.get_running_loop().run_in_executor(None, initialize_service)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """删除本进程创建的共享内存帧环"""
+    if remote is not None and remote.ring is not None:
+        remote.ring.close()
+
+def require_ready():
+    """模型未就绪时拒绝请求"""
+    if not service_state["ready"]:
+        raise HTTPException(status_code=503, detail="模型尚未就绪")
 
 class ImageRequest(BaseModel):
     id: str
     image: str
+    # 处理方式: "full" 整图推理，"tiled" 分块推理，"auto" 按图像尺寸自动选择
+    mode: Literal["full", "tiled", "auto"] = "full"
+
+class JobRequest(BaseModel):
+    items: List[ImageRequest]
+
+def request_deadline(http_request: Request):
+    """
+    从请求头解析截止时间
+    支持 X-Request-Deadline (Unix时间戳，秒) 和 X-Request-Timeout-Ms (相对超时，毫秒)，
+    同时提供时取较早者
+    Returns:
+        float: 截止时间 (Unix时间戳，秒)，没有截止时间时返回None
+    """
+    deadlines = []
+    absolute = http_request.headers.get("x-request-deadline")
+    relative = http_request.headers.get("x-request-timeout-ms")
+    try:
+        if absolute:
+            deadlines.append(float(absolute))
+        if relative:
+            deadlines.append(time.time() + float(relative) / 1000)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="截止时间请求头格式错误")
+    return min(deadlines) if deadlines else None
+
+def request_class(http_request: Request, request_id):
+    """按客户端标识、请求ID前缀和端点确定请求的优先级类别"""
+    return classifier.classify(
+        http_request.url.path, request_id, http_request.headers.get("x-client-key")
+    )
+
+def check_deadline(deadline, request_id):
+    """请求在解码之前已过期时直接拒绝"""
+    if deadline is not None and time.time() >= deadline:
+        metrics.inc("cloudpose_deadline_dropped_total", labels={"stage": "arrival"})
+        logger.info(f"请求已过期，丢弃，ID: {request_id}")
+        raise HTTPException(status_code=504, detail="请求已超过截止时间")
+
+def decode_base64(base64_string: str) -> bytes:
+    """将base64字符串解码为图像文件字节"""
+    try:
+        return base64.b64decode(base64_string)
+    except Exception as e:
+        logger.error(f"图像解码失败: {e}")
+        raise HTTPException(status_code=400, detail=f"图像解码失败: {str(e)}")
 
 def base64_to_cv2(base64_string: str) -> np.ndarray:
     """将base64字符串转换为OpenCV图像格式"""
+    return bytes_to_cv2(decode_base64(base64_string))
+
+def bytes_to_cv2(image_data: bytes) -> np.ndarray:
+    """将图像文件字节解码为OpenCV图像格式"""
     try:
-        # 解码base64
-        image_data = base64.b64decode(base64_string)
         # 转换为numpy数组
         nparr = np.frombuffer(image_data, np.uint8)
         # 解码为OpenCV图像
@@ -64,59 +340,232 @@ def cv2_to_base64(image: np.ndarray) -> str:
         logger.error(f"图像编码失败: {e}")
         raise HTTPException(status_code=500, detail=f"图像编码失败: {str(e)}")
 
-@app.post("/api/pose")
-async def detect_pose_json(request: ImageRequest):
+def use_tiling(mode, size):
     """
-    姿态检测JSON API端点
-    接收base64编码的图像，返回检测到的关键点数据
+    判断请求是否使用分块推理
+    Args:
+        mode: 请求的处理方式
+        size: 图像的 (宽, 高)
     """
-    try:
-        logger.info(f"收到姿态检测请求，ID: {request.id}")
-        
-        # 解码图像
-        start_time = time.time()
-        image = base64_to_cv2(request.image)
-        decode_time = time.time() - start_time
-        
-        # 执行姿态检测
-        start_detection = time.time()
-        results, preprocess_time, inference_time, postprocess_time = detector.detect(image)
-        detection_time = time.time() - start_detection
-        
-        # 解析结果
-        response_data = detector.parse_results(results, request.id)
+    if mode == "auto":
+        return max(size) >= config.TILE_AUTO_MIN_SIDE
+    return mode == "tiled"
+
+def tile_options():
+    """分块推理参数"""
+    return {
+        "tile_size": config.TILE_SIZE,
+        "overlap": config.TILE_OVERLAP,
+        "iou_threshold": config.TILE_NMS_IOU,
+    }
+
+def run_pose_json(replica, image, tiled=False):
+    """在检测器副本上执行姿态检测，返回检测数组 (边界框, 置信度, 关键点) 和各阶段耗时 (在线程池中运行)"""
+    if tiled:
+        return replica.detect_tiled(image, **tile_options())
+    results, preprocess_time, inference_time, postprocess_time = replica.detect(image)
+    return replica.results_to_arrays(results), preprocess_time, inference_time, postprocess_time
+
+def find_near_duplicate(image_data, mode):
+    """
+    在最近的结果中查找近重复图像
+    Returns:
+        image_hash: 图像的感知哈希 (无法计算时为None)
+        size: 图像的 (宽, 高)
+        tiled: 是否使用分块推理
+        arrays: 复用并缩放后的检测数组，未命中时为None
+    """
+    image_hash = hash_image_bytes(image_data)
+    size = image_size(image_data)
+    if image_hash is None or size is None:
+        return None, None, None, None
+
+    tiled = use_tiling(mode, size)
+    distance, payload = near_duplicates.lookup(image_hash)
+    if payload is None or payload["tiled"] != tiled:
+        metrics.inc("cloudpose_near_duplicate_total", labels={"outcome": "miss"})
+        return image_hash, size, tiled, None
+
+    metrics.inc("cloudpose_near_duplicate_total", labels={"outcome": "hit"})
+    metrics.observe_histogram(
+        "cloudpose_near_duplicate_distance", distance, range(config.NEAR_DUP_MAX_DISTANCE + 1)
+    )
+    boxes, scores, keypoints = payload["arrays"]
+    boxes, keypoints = rescale_arrays(boxes, keypoints, payload["size"], size)
+    return image_hash, size, tiled, (boxes, scores, keypoints)
+
+async def infer(image, tiled=False, deadline=None, priority_class=DEFAULT_CLASS):
+    """
+    执行姿态检测: 本地模式从副本池借出检测器，工作队列模式交给推理工作者
+    Returns:
+        (arrays, preprocess_time, inference_time, postprocess_time), queue_time
+    """
+    if remote is not None:
+        return await remote.infer(image, tiled, deadline=deadline)
+    return await pool.run(run_pose_json, image, tiled, deadline=deadline, priority_class=priority_class)
+
+def run_pose_image(replica, image, tiled=False):
+    """在检测器副本上执行姿态检测并生成标注图像 (在线程池中运行)"""
+    if tiled:
+        return replica.detect_and_annotate(image, tiled=True, **tile_options())
+    return replica.detect_and_annotate(image)
+
+def decode_stage(ctx):
+    """
+    解码阶段: base64解码和图像解码
+    JSON请求启用近重复复用时先用缩小解码计算感知哈希，命中时无需完整解码
+    """
+    start_time = time.time()
+    image_data = decode_base64(ctx["image_b64"])
+    ctx["image_hash"], ctx["arrays"], ctx["image"] = None, None, None
+    if ctx["kind"] == "json" and near_duplicates is not None:
+        ctx["image_hash"], ctx["size"], ctx["tiled"], ctx["arrays"] = find_near_duplicate(image_data, ctx["mode"])
+    if ctx["arrays"] is None:
+        ctx["image"] = bytes_to_cv2(image_data)
+        ctx["size"] = (ctx["image"].shape[1], ctx["image"].shape[0])
+        ctx["tiled"] = use_tiling(ctx["mode"], ctx["size"])
+    ctx["frame"] = ctx["image"]
+    ctx["decode_time"] = time.time() - start_time
+    return ctx
+
+def preprocess_stage(ctx):
+    """预处理阶段 (仅流水线模式): 整图推理的帧缩小到推理分辨率，推理线程只处理小图"""
+    if ctx["image"] is not None and not ctx["tiled"] and config.PIPELINE_MAX_SIDE:
+        ctx["frame"], _ = compact_frame(ctx["image"], config.PIPELINE_MAX_SIDE)
+    return ctx
+
+async def inference_stage(ctx):
+    """推理阶段: 从副本池借出检测器 (或交给推理工作者)，近重复命中时跳过"""
+    ctx["reused"] = ctx["arrays"] is not None
+    if ctx["reused"]:
+        ctx["timings"], ctx["queue_time"] = (0.0, 0.0, 0.0), 0.0
+        return ctx
+
+    frame = ctx["frame"]
+    (arrays, *timings), ctx["queue_time"] = await infer(
+        frame, ctx["tiled"], deadline=ctx["deadline"], priority_class=ctx["priority_class"]
+    )
+    boxes, scores, keypoints = arrays
+    if frame is not ctx["image"]:
+        boxes, keypoints = rescale_arrays(boxes, keypoints, (frame.shape[1], frame.shape[0]), ctx["size"])
+    ctx["arrays"], ctx["timings"] = (boxes, scores, keypoints), tuple(timings)
+    if ctx["image_hash"] is not None:
+        near_duplicates.add(ctx["image_hash"], {"arrays": ctx["arrays"], "size": ctx["size"], "tiled": ctx["tiled"]})
+        metrics.set_gauge("cloudpose_near_duplicate_entries", len(near_duplicates))
+    return ctx
+
+def encode_stage(ctx):
+    """后处理/编码阶段: 生成JSON响应 (序列化在本阶段完成)，或绘制并编码标注图像"""
+    request_id = ctx["id"]
+    if ctx["kind"] == "image":
+        _, _, keypoints = ctx["arrays"]
+        annotated_image = draw_poses(ctx["image"].copy(), keypoints)
+        response_data = {"id": request_id, "annotated_image": cv2_to_base64(annotated_image)}
+    else:
+        preprocess_time, inference_time, postprocess_time = ctx["timings"]
+        response_data = PoseDetector.format_arrays(*ctx["arrays"], request_id)
         response_data.update({
             "speed_preprocess": round(preprocess_time * 1000, 2),  # 转换为毫秒
             "speed_inference": round(inference_time * 1000, 2),
             "speed_postprocess": round(postprocess_time * 1000, 2),
-            "speed_decode": round(decode_time * 1000, 2),
-            "speed_total": round((decode_time + detection_time) * 1000, 2)
+            "speed_decode": round(ctx["decode_time"] * 1000, 2),
+            "speed_queue": round(ctx["queue_time"] * 1000, 2),
+            "speed_total": round((time.time() - ctx["start"]) * 1000, 2),
+            "mode": "tiled" if ctx["tiled"] else "full",
+            "reused": ctx["reused"]
         })
+    ctx["response"] = JSONResponse(content=response_data)
+    ctx["count"] = len(ctx["arrays"][2])
+    metrics.observe("cloudpose_request_seconds", time.time() - ctx["start"], {"class": ctx["priority_class"]})
+    return ctx
+
+async def process_request(ctx):
+    """
+    处理一个姿态检测请求: 启用流水线时交给流水线，否则在本协程中依次执行各阶段
+    Returns:
+        dict: 完成后的请求上下文，ctx["response"] 为响应
+    """
+    if pipeline is not None:
+        return await pipeline.submit(ctx)
+    return encode_stage(await inference_stage(decode_stage(ctx)))
+
+def request_context(request, kind, deadline, priority_class):
+    """创建请求上下文"""
+    return {
+        "id": request.id,
+        "image_b64": request.image,
+        "mode": request.mode,
+        "kind": kind,
+        "deadline": deadline,
+        "priority_class": priority_class,
+        "start": time.time(),
+    }
+
+# 分阶段流水线 (未启用时为None，各阶段的工作者在应用启动时创建)
+pipeline = StagedPipeline([
+    Stage("decode", decode_stage, config.PIPELINE_DECODE_WORKERS, config.PIPELINE_QUEUE_SIZE),
+    Stage("preprocess", preprocess_stage, config.PIPELINE_PREPROCESS_WORKERS, config.PIPELINE_QUEUE_SIZE),
+    Stage("inference", inference_stage, config.PIPELINE_INFERENCE_WORKERS, config.PIPELINE_QUEUE_SIZE),
+    Stage("encode", encode_stage, config.PIPELINE_ENCODE_WORKERS, config.PIPELINE_QUEUE_SIZE),
+], report_interval=config.PIPELINE_REPORT_INTERVAL) if config.PIPELINE_ENABLED else None
+
+@app.post("/api/pose")
+async def detect_pose_json(request: ImageRequest, http_request: Request):
+    """
+    姿态检测JSON API端点
+    接收base64编码的图像，返回检测到的关键点数据
+    """
+    require_ready()
+    deadline = request_deadline(http_request)
+    check_deadline(deadline, request.id)
+    priority_class = request_class(http_request, request.id)
+    try:
+        logger.info(f"收到姿态检测请求，ID: {request.id}")
+        ctx = await process_request(request_context(request, "json", deadline, priority_class))
+        logger.info(f"姿态检测完成，ID: {request.id}, 检测到 {ctx['count']} 人")
+        return ctx["response"]
         
-        logger.info(f"姿态检测完成，ID: {request.id}, 检测到 {response_data['count']} 人")
-        return JSONResponse(content=response_data)
-        
+    except DeadlineExceeded as e:
+        logger.info(f"请求已过期，丢弃，ID: {request.id}, 阶段: {e.stage}")
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         logger.error(f"姿态检测失败，ID: {request.id}, 错误: {e}")
         raise HTTPException(status_code=500, detail=f"姿态检测失败: {str(e)}")
 
 @app.post("/api/pose_image")
-async def detect_pose_image(request: ImageRequest):
+async def detect_pose_image(request: ImageRequest, http_request: Request):
     """
     姿态检测图像API端点
     接收base64编码的图像，返回标注后的图像
     """
+    require_ready()
+    deadline = request_deadline(http_request)
+    check_deadline(deadline, request.id)
+    priority_class = request_class(http_request, request.id)
     try:
         logger.info(f"收到图像标注请求，ID: {request.id}")
+        if pipeline is not None:
+            ctx = await pipeline.submit(request_context(request, "image", deadline, priority_class))
+            logger.info(f"图像标注完成，ID: {request.id}")
+            return ctx["response"]
+        start_time = time.time()
         
         # 解码图像
         image = base64_to_cv2(request.image)
         
         # 执行姿态检测并生成标注图像
-        annotated_image = detector.detect_and_annotate(image)
+        tiled = use_tiling(request.mode, (image.shape[1], image.shape[0]))
+        if remote is not None:
+            ((_, _, keypoints), _, _, _), _ = await infer(image, tiled, deadline=deadline)
+            annotated_image = draw_poses(image.copy(), keypoints)
+        else:
+            annotated_image, _ = await pool.run(
+                run_pose_image, image, tiled, deadline=deadline, priority_class=priority_class
+            )
         
         # 编码标注图像为base64
         annotated_base64 = cv2_to_base64(annotated_image)
+        metrics.observe("cloudpose_request_seconds", time.time() - start_time, {"class": priority_class})
         
         response_data = {
             "id": request.id,
@@ -126,14 +575,197 @@ async def detect_pose_image(request: ImageRequest):
         logger.info(f"图像标注完成，ID: {request.id}")
         return JSONResponse(content=response_data)
         
+    except DeadlineExceeded as e:
+        logger.info(f"请求已过期，丢弃，ID: {request.id}, 阶段: {e.stage}")
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         logger.error(f"图像标注失败，ID: {request.id}, 错误: {e}")
         raise HTTPException(status_code=500, detail=f"图像标注失败: {str(e)}")
 
+async def process_job_item(item):
+    """
+    处理作业中的一项 (以作业优先级类别从副本池借出检测器)
+    单项失败只记录错误，不影响作业中的其他项
+    """
+    try:
+        start_time = time.time()
+        image = base64_to_cv2(item.image)
+        tiled = use_tiling(item.mode, (image.shape[1], image.shape[0]))
+        (arrays, preprocess_time, inference_time, postprocess_time), queue_time = await infer(
+            image, tiled, priority_class=config.JOB_PRIORITY_CLASS
+        )
+        result = PoseDetector.format_arrays(*arrays, item.id)
+        result.update({
+            "speed_preprocess": round(preprocess_time * 1000, 2),
+            "speed_inference": round(inference_time * 1000, 2),
+            "speed_postprocess": round(postprocess_time * 1000, 2),
+            "speed_queue": round(queue_time * 1000, 2),
+            "speed_total": round((time.time() - start_time) * 1000, 2),
+            "mode": "tiled" if tiled else "full"
+        })
+        return result
+    except HTTPException as e:
+        return {"id": item.id, "error": e.detail}
+    except Exception as e:
+        logger.error(f"作业项处理失败，ID: {item.id}, 错误: {e}")
+        return {"id": item.id, "error": f"姿态检测失败: {str(e)}"}
+
+# 异步作业管理器 (工作协程在应用启动时创建)
+job_manager = JobManager(
+    process_job_item,
+    queue_size=config.JOB_QUEUE_SIZE,
+    workers=config.JOB_WORKERS,
+    ttl=config.JOB_TTL,
+    archive_dir=config.JOB_ARCHIVE_DIR or None,
+)
+
+@app.post("/api/jobs", status_code=202)
+async def submit_job(request: JobRequest):
+    """
+    提交异步姿态检测作业
+    立即返回作业ID，之后通过 /api/jobs/{job_id} 轮询状态、通过 /api/jobs/{job_id}/results 获取结果
+    """
+    require_ready()
+    if not request.items:
+        raise HTTPException(status_code=400, detail="作业至少需要一项")
+    if len(request.items) > config.JOB_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"作业最多包含 {config.JOB_MAX_ITEMS} 项")
+    try:
+        job = job_manager.submit(request.items)
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    logger.info(f"收到作业，ID: {job.job_id}, 共 {job.total} 项")
+    return job.summary()
+
+def get_job(job_id):
+    """查找作业，不存在或已过期时返回404"""
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="作业不存在或已过期")
+    return job
+
+@app.get("/api/jobs/{job_id}")
+async def job_status(job_id: str):
+    """查询作业状态和进度"""
+    return get_job(job_id).summary()
+
+@app.get("/api/jobs/{job_id}/results")
+async def job_results(job_id: str, stream: bool = True):
+    """
+    获取作业结果
+    默认以NDJSON流 (每行一项结果) 按完成顺序推送，作业结束后关闭连接；
+    stream=false时立即返回已完成的结果
+    """
+    job = get_job(job_id)
+    if not stream:
+        return {**job.summary(), "results": list(job.results)}
+
+    async def lines():
+        async for result in job.stream():
+            yield json.dumps(result) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@app.websocket("/api/pose_stream")
+async def pose_stream(websocket: WebSocket, keyframe_interval: int = 0):
+    """
+    视频流姿态检测WebSocket端点
+    客户端逐帧发送 {"id": ..., "image": base64}，服务端逐帧返回与 /api/pose 格式一致的结果，
+    另外带有轨迹ID和是否为关键帧。只有关键帧运行完整推理，中间帧用光流传播关键点。
+    """
+    await websocket.accept()
+    if not service_state["ready"]:
+        await websocket.close(code=1013, reason="模型尚未就绪")
+        return
+
+    session = StreamSession(
+        keyframe_interval=keyframe_interval or config.STREAM_KEYFRAME_INTERVAL,
+        scene_change_threshold=config.STREAM_SCENE_CHANGE,
+        min_track_ratio=config.STREAM_MIN_TRACK_RATIO,
+        match_iou=config.STREAM_MATCH_IOU,
+    )
+    client_key = websocket.headers.get("x-client-key")
+    loop = asyncio.get_running_loop()
+    service_state["stream_sessions"] += 1
+    metrics.set_gauge("cloudpose_stream_sessions", service_state["stream_sessions"])
+    logger.info("视频流会话已建立")
+    try:
+        while True:
+            message = await websocket.receive_json()
+            frame_id = str(message.get("id", ""))
+            try:
+                start_time = time.time()
+                image = base64_to_cv2(message.get("image", ""))
+                decode_time = time.time() - start_time
+
+                keyframe = session.needs_keyframe(image)
+                if not keyframe:
+                    # 光流传播在默认线程池中执行，跟踪不可靠时当前帧改为关键帧
+                    keyframe = not await loop.run_in_executor(None, session.propagate, image)
+                if keyframe:
+                    priority_class = classifier.classify("/api/pose_stream", frame_id, client_key)
+                    (arrays, _, inference_time, _), queue_time = await infer(
+                        image, priority_class=priority_class
+                    )
+                    session.update_keyframe(image, *arrays)
+                else:
+                    inference_time = queue_time = 0.0
+                metrics.inc("cloudpose_stream_frames_total", labels={"kind": "keyframe" if keyframe else "tracked"})
+
+                response_data = session.to_response(frame_id)
+                response_data.update({
+                    "keyframe": keyframe,
+                    "speed_decode": round(decode_time * 1000, 2),
+                    "speed_queue": round(queue_time * 1000, 2),
+                    "speed_inference": round(inference_time * 1000, 2),
+                    "speed_total": round((time.time() - start_time) * 1000, 2)
+                })
+            except HTTPException as e:
+                response_data = {"id": frame_id, "error": e.detail}
+            except Exception as e:
+                logger.error(f"视频流帧处理失败，ID: {frame_id}, 错误: {e}")
+                response_data = {"id": frame_id, "error": f"姿态检测失败: {str(e)}"}
+            await websocket.send_json(response_data)
+    except WebSocketDisconnect:
+        logger.info(f"视频流会话结束: {session.frames} 帧, 其中关键帧 {session.keyframes} 帧")
+    finally:
+        service_state["stream_sessions"] -= 1
+        metrics.set_gauge("cloudpose_stream_sessions", service_state["stream_sessions"])
+
 @app.get("/health")
 async def health_check():
-    """健康检查端点"""
-    return {"status": "healthy", "model_loaded": detector is not None}
+    """健康检查端点 (存活探针)，模型加载失败时返回503"""
+    content = {
+        "status": "unhealthy" if service_state["error"] else "healthy",
+        "model_loaded": detector is not None,
+        "ready": service_state["ready"],
+        "warmup_seconds": service_state["warmup_seconds"],
+        "pool_size": service_state.get("pool_size"),
+        "pool_in_use": pool.in_use if pool else 0,
+        "pool_waiting": pool.waiting if pool else 0,
+        "queue_depths": pool.queue_depths() if pool else {},
+        "pipeline": pipeline.status() if pipeline else None,
+    }
+    return JSONResponse(content=content, status_code=503 if service_state["error"] else 200)
+
+@app.get("/ready")
+async def readiness_check():
+    """就绪检查端点 (就绪探针)，模型预热完成前返回503"""
+    content = {
+        "ready": service_state["ready"],
+        "warmup_seconds": service_state["warmup_seconds"],
+        "warmup_timings": service_state["warmup_timings"],
+        "startup_phases": service_state["startup_phases"],
+        "numerics": service_state["numerics"],
+    }
+    return JSONResponse(content=content, status_code=200 if service_state["ready"] else 503)
+
+@app.get("/metrics")
+async def metrics_endpoint(format: str = "prometheus"):
+    """指标导出端点，支持Prometheus文本格式和JSON格式"""
+    if format == "json":
+        return metrics.snapshot()
+    return PlainTextResponse(metrics.render_prometheus())
 
 @app.get("/")
 async def root():
@@ -143,7 +775,11 @@ async def root():
         "endpoints": {
             "pose_json": "/api/pose",
             "pose_image": "/api/pose_image",
-            "health": "/health"
+            "pose_stream": "/api/pose_stream",
+            "jobs": "/api/jobs",
+            "health": "/health",
+            "ready": "/ready",
+            "metrics": "/metrics"
         }
     }
 
@@ -0,0 +1,130 @@
+"""
+服务指标模块
+提供线程安全的计数器、仪表、耗时统计和直方图，并以JSON和Prometheus文本格式导出
+"""
+
+import threading
+
+
+def _label_key(labels):
+    """将标签字典转换为可哈希的键"""
+    if not labels:
+        return ()
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key):
+    """将标签键格式化为Prometheus标签字符串"""
+    if not key:
+        return ""
+    parts = [f'{name}="{value}"' for name, value in key]
+    return "{" + ",".join(parts) + "}"
+
+
+class Metrics:
+    """进程内指标注册表"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._summaries = {}
+        self._histograms = {}
+
+    def inc(self, name, value=1, labels=None):
+        """计数器累加"""
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, labels=None):
+        """设置仪表值"""
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._gauges[key] = value
+
+    def observe(self, name, value, labels=None):
+        """记录一次观测值 (统计次数、总和与最大值)"""
+        key = (name, _label_key(labels))
+        with self._lock:
+            summary = self._summaries.get(key)
+            if summary is None:
+                summary = {"count": 0, "sum": 0.0, "max": 0.0}
+                self._summaries[key] = summary
+            summary["count"] += 1
+            summary["sum"] += value
+            summary["max"] = max(summary["max"], value)
+
+    def observe_histogram(self, name, value, buckets, labels=None):
+        """
+        记录一次直方图观测值
+        Args:
+            buckets: 升序的桶上界 (同一指标每次调用应使用相同的桶)
+        """
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = {"buckets": list(buckets), "counts": [0] * len(buckets), "count": 0, "sum": 0.0}
+                self._histograms[key] = histogram
+            for i, bound in enumerate(histogram["buckets"]):
+                if value <= bound:
+                    histogram["counts"][i] += 1
+                    break
+            histogram["count"] += 1
+            histogram["sum"] += value
+
+    def snapshot(self):
+        """
+        导出当前所有指标
+        Returns:
+            dict: 按指标类型分组的指标数据
+        """
+        with self._lock:
+            def _entries(store):
+                return [
+                    {"name": name, "labels": dict(key), "value": value}
+                    for (name, key), value in sorted(store.items())
+                ]
+
+            return {
+                "counters": _entries(self._counters),
+                "gauges": _entries(self._gauges),
+                "summaries": [
+                    {"name": name, "labels": dict(key), **summary}
+                    for (name, key), summary in sorted(self._summaries.items())
+                ],
+                "histograms": [
+                    {"name": name, "labels": dict(key), "buckets": dict(zip(h["buckets"], h["counts"])),
+                     "count": h["count"], "sum": h["sum"]}
+                    for (name, key), h in sorted(self._histograms.items())
+                ],
+            }
+
+    def render_prometheus(self):
+        """以Prometheus文本格式导出指标"""
+        lines = []
+        with self._lock:
+            for (name, key), value in sorted(self._counters.items()):
+                lines.append(f"{name}{_format_labels(key)} {value}")
+            for (name, key), value in sorted(self._gauges.items()):
+                lines.append(f"{name}{_format_labels(key)} {value}")
+            for (name, key), summary in sorted(self._summaries.items()):
+                labels = _format_labels(key)
+                lines.append(f"{name}_count{labels} {summary['count']}")
+                lines.append(f"{name}_sum{labels} {summary['sum']}")
+                lines.append(f"{name}_max{labels} {summary['max']}")
+            for (name, key), histogram in sorted(self._histograms.items()):
+                # Prometheus直方图的桶计数是累积的
+                cumulative = 0
+                for bound, count in zip(histogram["buckets"], histogram["counts"]):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(key + (('le', bound),))} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(key + (('le', '+Inf'),))} {histogram['count']}")
+                lines.append(f"{name}_count{_format_labels(key)} {histogram['count']}")
+                lines.append(f"{name}_sum{_format_labels(key)} {histogram['sum']}")
+        return "\n".join(lines) + "\n"
+
+
+# 全局指标实例
+metrics = Metrics()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+预编译模型产物管理
+将.pt检查点导出为TorchScript产物，并按源文件校验和缓存在磁盘上。
+启动时直接加载TorchScript产物，避免解pickle检查点和注册安全全局类的开销。
+"""
+
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+logger = logging.getLogger(__name__)
+
+# 校验和计算的读取块大小
+_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+def file_sha256(path):
+    """
+    计算文件的SHA256校验和
+    校验和会缓存到同目录的 .sha256 旁路文件中 (以文件大小和修改时间为键)，
+    避免每次启动都重新读取整个模型文件
+    Args:
+        path: 文件路径
+    Returns:
+        str: 十六进制校验和
+    """
+    stat = os.stat(path)
+    stamp = f"{stat.st_size}:{int(stat.st_mtime)}"
+    sidecar = f"{path}.sha256"
+
+    try:
+        with open(sidecar, "r") as f:
+            cached_stamp, cached_digest = f.read().split()
+        if cached_stamp == stamp:
+            return cached_digest
+    except (OSError, ValueError):
+        pass
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    hexdigest = digest.hexdigest()
+
+    try:
+        with open(sidecar, "w") as f:
+            f.write(f"{stamp} {hexdigest}\n")
+    except OSError:
+        # 只读文件系统上无法写缓存，不影响结果
+        pass
+    return hexdigest
+
+
+def artifact_path(cache_dir, checksum, imgsz, batch):
+    """返回指定校验和与输入形状对应的TorchScript产物路径"""
+    return os.path.join(cache_dir, f"{checksum[:16]}-b{batch}-s{imgsz}.torchscript")
+
+
+def build_torchscript(model_path, cache_dir, imgsz=640, batch=1):
+    """
+    将.pt模型导出为TorchScript产物并原子地写入缓存目录
+    Args:
+        model_path: .pt模型文件路径
+        cache_dir: 产物缓存目录
+        imgsz: 导出的输入分辨率
+        batch: 导出的批大小
+    Returns:
+        str: 产物路径
+    """
+    from ultralytics import YOLO
+
+    checksum = file_sha256(model_path)
+    target = artifact_path(cache_dir, checksum, imgsz, batch)
+    if os.path.exists(target):
+        return target
+
+    os.makedirs(cache_dir, exist_ok=True)
+    logger.info(f"正在导出TorchScript产物: {target}")
+
+    # 在临时目录中导出，完成后再原子重命名，避免并发启动的Pod读到半成品
+    with tempfile.TemporaryDirectory(dir=cache_dir) as tmp_dir:
+        tmp_model = os.path.join(tmp_dir, os.path.basename(model_path))
+        shutil.copyfile(model_path, tmp_model)
+        exported = YOLO(tmp_model).export(format="torchscript", imgsz=imgsz, batch=batch)
+        os.replace(exported, target)
+
+    logger.info(f"TorchScript产物导出完成: {target}")
+    return target
+
+
+def resolve_model_artifact(model_path, cache_dir, imgsz=640, batch=1, build_on_miss=False):
+    """
+    查找与模型文件对应的预编译产物
+    Args:
+        model_path: .pt模型文件路径
+        cache_dir: 产物缓存目录
+        imgsz: 产物的输入分辨率
+        batch: 产物的批大小
+        build_on_miss: 缓存未命中时是否当场导出
+    Returns:
+        path: 产物路径，未找到时返回None
+        timings: 各阶段耗时 {"阶段": 秒}
+    """
+    timings = {}
+
+    start = time.time()
+    checksum = file_sha256(model_path)
+    timings["checksum"] = time.time() - start
+
+    target = artifact_path(cache_dir, checksum, imgsz, batch)
+    if os.path.exists(target):
+        return target, timings
+
+    if not build_on_miss:
+        logger.info(f"未找到预编译产物: {target}")
+        return None, timings
+
+    start = time.time()
+    target = build_torchscript(model_path, cache_dir, imgsz=imgsz, batch=batch)
+    timings["export"] = time.time() - start
+    return target, timings
+
+
+def main():
+    """命令行入口: 预先构建TorchScript产物 (例如在镜像构建或节点初始化时)"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="构建CloudPose预编译模型产物")
+    parser.add_argument("--model", default="yolo11l-pose.pt", help=".pt模型文件路径")
+    parser.add_argument("--cache-dir", default="./model_cache", help="产物缓存目录")
+    parser.add_argument("--imgsz", type=int, default=640, help="输入分辨率")
+    parser.add_argument("--batch", type=int, default=1, help="批大小")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    path = build_torchscript(args.model, args.cache_dir, imgsz=args.imgsz, batch=args.batch)
+    print(f"产物路径: {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+检测器副本池
+Ultralytics预测器不支持多线程并发调用，因此为每个并发推理准备一个独立的
+PoseDetector副本 (共享网络权重)。请求异步借出副本，在线程池中执行推理后归还，
+同一Pod内的并发请求可以真正并行执行。
+"""
+
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import metrics
+from scheduler import DEFAULT_CLASS, DeadlineExceeded, Waiter, WeightedFairQueue
+
+logger = logging.getLogger(__name__)
+
+
+def available_cpus():
+    """当前进程可用的CPU数量"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def auto_pool_size(threads_per_replica):
+    """
+    根据可用CPU数量计算副本数量
+    Args:
+        threads_per_replica: 每个副本的推理线程数
+    Returns:
+        int: 副本数量 (至少为1)
+    """
+    return max(1, available_cpus() // max(1, threads_per_replica))
+
+
+class DetectorPool:
+    """PoseDetector副本池"""
+
+    def __init__(self, replicas, service_time_factor=0.5, class_weights=None):
+        """
+        Args:
+            replicas: PoseDetector副本列表
+            service_time_factor: 剩余时间小于 (平均推理时间 × 该系数) 的请求视为肯定会过期
+            class_weights: 优先级类别的权重 {类别: 权重}
+        """
+        if not replicas:
+            raise ValueError("副本池至少需要一个副本")
+        self.replicas = list(replicas)
+        self.size = len(self.replicas)
+        self.service_time_factor = service_time_factor
+        # 推理时间的指数移动平均 (秒)
+        self.service_time = 0.0
+        self._idle = list(self.replicas)
+        self._waiters = WeightedFairQueue(class_weights)
+        self._executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix="detector")
+        metrics.set_gauge("cloudpose_pool_size", self.size)
+        metrics.set_gauge("cloudpose_pool_in_use", 0)
+
+    @property
+    def in_use(self):
+        """已借出的副本数量"""
+        return self.size - len(self._idle)
+
+    @property
+    def waiting(self):
+        """等待副本的请求数量"""
+        return len(self._waiters)
+
+    def warmup(self, **kwargs):
+        """
+        依次预热所有副本 (每个副本都有自己的预测器需要初始化)
+        副本共享卷积权重，串行预热避免多个预测器同时构建推理后端
+        Returns:
+            total_time: 预热总耗时(秒)
+            timings: 第一个副本每种组合的耗时
+        """
+        start = time.time()
+        results = [replica.warmup(**kwargs) for replica in self.replicas]
+        return time.time() - start, results[0][1]
+
+    def _doomed(self, deadline, now):
+        """截止时间前肯定无法完成推理"""
+        return deadline is not None and now + self.service_time * self.service_time_factor > deadline
+
+    def _drop(self, stage):
+        """记录一次因过期被丢弃的请求"""
+        metrics.inc("cloudpose_deadline_dropped_total", labels={"stage": stage})
+
+    def _expire(self, waiter):
+        """截止时间到达时仍在排队的请求直接失败，不再等待副本"""
+        if not waiter.future.done():
+            waiter.future.set_exception(DeadlineExceeded("queue"))
+            self._drop("queue")
+
+    def queue_depths(self):
+        """每个优先级类别的等待请求数"""
+        return self._waiters.depths()
+
+    async def acquire(self, deadline=None, priority_class=DEFAULT_CLASS):
+        """
+        借出一个副本，没有空闲副本时排队等待
+        类别之间按权重公平排队，同一类别内按截止时间 (EDF) 排序
+        Args:
+            deadline: 请求的截止时间 (Unix时间戳，秒)，None表示没有截止时间
+            priority_class: 请求的优先级类别
+        """
+        now = time.time()
+        if self._doomed(deadline, now):
+            self._drop("admission")
+            raise DeadlineExceeded("admission")
+
+        if self._idle and not self._waiters:
+            replica = self._idle.pop()
+            metrics.set_gauge("cloudpose_pool_in_use", self.in_use)
+            return replica
+
+        loop = asyncio.get_running_loop()
+        waiter = Waiter(loop.create_future(), deadline, self._waiters.next_seq(), priority_class)
+        if deadline is not None:
+            waiter.timer = loop.call_later(max(0.0, deadline - now), self._expire, waiter)
+        self._waiters.push(waiter)
+        try:
+            return await waiter.future
+        except asyncio.CancelledError:
+            # 等待期间请求被取消: 若副本已经分配给本请求，转交给下一个等待者
+            if waiter.future.done() and not waiter.future.cancelled() and waiter.future.exception() is None:
+                self.release(waiter.future.result())
+            raise
+        finally:
+            if waiter.timer is not None:
+                waiter.timer.cancel()
+
+    def release(self, replica):
+        """归还副本，交给截止时间最早且仍来得及完成的等待者"""
+        now = time.time()
+        while True:
+            waiter = self._waiters.pop()
+            if waiter is None:
+                break
+            if self._doomed(waiter.deadline, now):
+                waiter.future.set_exception(DeadlineExceeded("queue"))
+                self._drop("queue")
+                continue
+            waiter.future.set_result(replica)
+            return
+        self._idle.append(replica)
+        metrics.set_gauge("cloudpose_pool_in_use", self.in_use)
+
+    def _record_service_time(self, seconds):
+        """更新推理时间的指数移动平均"""
+        if self.service_time == 0.0:
+            self.service_time = seconds
+        else:
+            self.service_time = 0.9 * self.service_time + 0.1 * seconds
+
+    async def run(self, func, *args, deadline=None, priority_class=DEFAULT_CLASS):
+        """
+        借出副本并在线程池中执行 func(副本, *args)
+        Args:
+            deadline: 请求的截止时间 (Unix时间戳，秒)，过期的请求不会到达模型
+            priority_class: 请求的优先级类别
+        Returns:
+            result: func的返回值
+            wait_time: 等待副本的时间(秒)
+        """
+        start_wait = time.time()
+        replica = await self.acquire(deadline, priority_class)
+        wait_time = time.time() - start_wait
+        metrics.observe("cloudpose_pool_wait_seconds", wait_time, {"class": priority_class})
+
+        start_service = time.time()
+        future = asyncio.get_running_loop().run_in_executor(self._executor, func, replica, *args)
+        try:
+            result = await asyncio.shield(future)
+        except asyncio.CancelledError:
+            # 请求被取消时推理线程仍在使用副本，等其结束后再归还
+            future.add_done_callback(lambda _: self.release(replica))
+            raise
+        except Exception:
+            self.release(replica)
+            raise
+        self._record_service_time(time.time() - start_service)
+        self.release(replica)
+        return result, wait_time
+
+
+def build_pool(detector, size, threads_per_replica, service_time_factor=0.5, class_weights=None):
+    """
+    基于已加载的检测器构建副本池
+    Args:
+        detector: 已加载的PoseDetector
+        size: 副本数量，0表示根据可用CPU自动计算
+        threads_per_replica: 每个副本的推理线程数 (torch intra-op线程)
+        service_time_factor: 判断请求肯定会过期时使用的推理时间系数
+        class_weights: 优先级类别的权重 {类别: 权重}
+    Returns:
+        DetectorPool: 副本池
+    """
+    import torch
+
+    if size <= 0:
+        size = auto_pool_size(threads_per_replica)
+    torch.set_num_threads(max(1, threads_per_replica))
+
+    # 副本在当前线程中依次创建: 第一次clone时在原检测器上构建预测器并融合网络，
+    # 之后的副本共享融合后的卷积权重，各自拥有独立的检测头
+    replicas = [detector] + [detector.clone() for _ in range(size - 1)]
+    logger.info(f"检测器副本池已创建: {size} 个副本, 每个副本 {threads_per_replica} 个推理线程")
+    return DetectorPool(replicas, service_time_factor=service_time_factor, class_weights=class_weights)
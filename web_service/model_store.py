@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+内容寻址的本地模型仓库
+模型文件按SHA256校验和存放在节点本地目录 (hostPath) 中，同一节点上的Pod共享
+同一份磁盘副本和页缓存。缺失时从本地HTTP产物服务器或另一个目录拉取，
+校验通过后原子安装。
+"""
+
+import contextlib
+import fcntl
+import hashlib
+import logging
+import os
+import tempfile
+import urllib.request
+
+logger = logging.getLogger(__name__)
+
+# 拷贝和下载的块大小
+_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+class ChecksumMismatchError(Exception):
+    """拉取的模型文件校验和不匹配"""
+
+
+class ModelStore:
+    """按校验和寻址的模型仓库"""
+
+    def __init__(self, root, suffix=".pt"):
+        """
+        Args:
+            root: 仓库根目录 (通常是节点上的hostPath)
+            suffix: 模型文件后缀，保留后缀便于加载器识别格式
+        """
+        self.root = root
+        self.suffix = suffix
+        self.blob_dir = os.path.join(root, "sha256")
+
+    def path_for(self, digest):
+        """返回指定校验和的模型文件路径"""
+        return os.path.join(self.blob_dir, f"{digest}{self.suffix}")
+
+    def has(self, digest):
+        """模型文件是否已在仓库中"""
+        return os.path.exists(self.path_for(digest))
+
+    @contextlib.contextmanager
+    def _lock(self, digest):
+        """同一校验和的安装操作在节点内串行执行，避免多个Pod重复下载"""
+        os.makedirs(self.blob_dir, exist_ok=True)
+        lock_path = os.path.join(self.blob_dir, f".{digest}.lock")
+        with open(lock_path, "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _install_stream(self, stream, expected_digest=None):
+        """
+        将数据流写入临时文件，边写边计算校验和，校验通过后原子重命名
+        Args:
+            stream: 可读的二进制流
+            expected_digest: 期望的校验和，为None时不校验
+        Returns:
+            str: 实际校验和
+        """
+        os.makedirs(self.blob_dir, exist_ok=True)
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=self.blob_dir, prefix=".incoming-")
+        try:
+            with os.fdopen(fd, "wb") as tmp_file:
+                for chunk in iter(lambda: stream.read(_CHUNK_SIZE), b""):
+                    digest.update(chunk)
+                    tmp_file.write(chunk)
+                tmp_file.flush()
+                os.fsync(tmp_file.fileno())
+
+            actual = digest.hexdigest()
+            if expected_digest and actual != expected_digest:
+                raise ChecksumMismatchError(f"校验和不匹配: 期望 {expected_digest}, 实际 {actual}")
+
+            os.chmod(tmp_path, 0o444)
+            os.replace(tmp_path, self.path_for(actual))
+            return actual
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def add_file(self, path):
+        """
+        将本地文件加入仓库
+        Args:
+            path: 模型文件路径
+        Returns:
+            str: 模型校验和
+        """
+        with open(path, "rb") as f:
+            digest = self._install_stream(f)
+        logger.info(f"模型已加入仓库: {path} -> {digest}")
+        return digest
+
+    def fetch(self, digest, source=None):
+        """
+        确保指定校验和的模型文件在仓库中，缺失时从来源拉取
+        Args:
+            digest: 模型校验和
+            source: 来源，HTTP(S)产物服务器地址 (如 http://10.0.0.10:8081)
+                    或另一个仓库/文件所在目录 (如挂载的hostPath)
+        Returns:
+            str: 仓库中的模型文件路径
+        """
+        target = self.path_for(digest)
+        if os.path.exists(target):
+            return target
+
+        if not source:
+            raise FileNotFoundError(f"仓库中没有模型 {digest}，且未配置拉取来源")
+
+        with self._lock(digest):
+            # 持锁后再次检查，其他Pod可能已完成安装
+            if os.path.exists(target):
+                return target
+
+            if source.startswith(("http://", "https://")):
+                url = f"{source.rstrip('/')}/sha256/{digest}{self.suffix}"
+                logger.info(f"正在从产物服务器拉取模型: {url}")
+                with urllib.request.urlopen(url, timeout=60) as response:
+                    self._install_stream(response, expected_digest=digest)
+            else:
+                source_path = source
+                if os.path.isdir(source):
+                    source_path = ModelStore(source, self.suffix).path_for(digest)
+                logger.info(f"正在从本地路径安装模型: {source_path}")
+                with open(source_path, "rb") as f:
+                    self._install_stream(f, expected_digest=digest)
+
+        return target
+
+
+def serve(root, host="0.0.0.0", port=8081):
+    """
+    启动本地HTTP产物服务器，按 /sha256/<校验和><后缀> 提供仓库中的模型文件
+    Args:
+        root: 仓库根目录
+        host: 监听地址
+        port: 监听端口
+    """
+    import functools
+    from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+    handler = functools.partial(SimpleHTTPRequestHandler, directory=root)
+    server = ThreadingHTTPServer((host, port), handler)
+    print(f"产物服务器已启动: http://{host}:{port} (目录: {root})")
+    server.serve_forever()
+
+
+def main():
+    """命令行入口"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="CloudPose模型仓库")
+    parser.add_argument("--root", default="./model_store", help="仓库根目录")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    add_parser = subparsers.add_parser("add", help="将模型文件加入仓库")
+    add_parser.add_argument("path", help="模型文件路径")
+
+    fetch_parser = subparsers.add_parser("fetch", help="从来源拉取模型到仓库")
+    fetch_parser.add_argument("digest", help="模型校验和")
+    fetch_parser.add_argument("--source", required=True, help="产物服务器地址或目录")
+
+    serve_parser = subparsers.add_parser("serve", help="启动HTTP产物服务器")
+    serve_parser.add_argument("--host", default="0.0.0.0", help="监听地址")
+    serve_parser.add_argument("--port", type=int, default=8081, help="监听端口")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    store = ModelStore(args.root)
+
+    if args.command == "add":
+        digest = store.add_file(args.path)
+        print(digest)
+    elif args.command == "fetch":
+        print(store.fetch(args.digest, args.source))
+    elif args.command == "serve":
+        serve(args.root, args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
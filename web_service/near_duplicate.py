@@ -0,0 +1,183 @@
+"""
+感知哈希近重复结果复用
+同一画面经过不同编码器或不同JPEG质量重新压缩后字节完全不同，精确哈希缓存无法命中。
+本模块在缩小解码的灰度图上计算64位差值哈希 (dHash)，在最近的结果中查找汉明距离
+不超过阈值的图像并复用其检测结果 (图像尺寸不同时按比例缩放坐标)。
+查找使用多索引哈希: 64位哈希切分为若干段，距离不超过r的两个哈希至少有一段的距离
+不超过 r // 段数，只需在每段的哈希表中探测该半径内的取值，而不必遍历所有条目。
+"""
+
+import io
+import itertools
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+HASH_BITS = 64
+
+
+def dhash(gray):
+    """
+    计算64位差值哈希
+    Args:
+        gray: 灰度图 (可以是缩小解码的结果)
+    Returns:
+        int: 64位哈希值
+    """
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hash_image_bytes(data):
+    """
+    对编码后的图像字节计算感知哈希，只做1/8缩小的灰度解码 (JPEG可直接在DCT域缩小，代价很低)
+    Args:
+        data: 编码后的图像字节
+    Returns:
+        int: 64位哈希值，无法解码时返回None
+    """
+    gray = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_REDUCED_GRAYSCALE_8)
+    if gray is None:
+        return None
+    return dhash(gray)
+
+
+def _neighbours(value, bits, radius):
+    """枚举与value汉明距离不超过radius的所有bits位取值"""
+    yield value
+    for distance in range(1, radius + 1):
+        for positions in itertools.combinations(range(bits), distance):
+            flipped = value
+            for position in positions:
+                flipped ^= 1 << position
+            yield flipped
+
+
+class NearDuplicateIndex:
+    """
+    按感知哈希索引的最近结果缓存 (LRU淘汰)
+    线程安全: 流水线模式下解码线程查找，事件循环写入并淘汰
+    """
+
+    def __init__(self, capacity=1024, max_distance=6, chunks=4, ttl=300.0):
+        """
+        Args:
+            capacity: 最多保存的结果数量
+            max_distance: 视为近重复的最大汉明距离
+            chunks: 多索引哈希的分段数 (64需能被其整除)
+            ttl: 结果的有效期(秒)，0表示不过期
+        """
+        if HASH_BITS % chunks:
+            raise ValueError(f"分段数必须能整除{HASH_BITS}")
+        self.capacity = capacity
+        self.max_distance = max_distance
+        self.chunks = chunks
+        self.chunk_bits = HASH_BITS // chunks
+        self.ttl = ttl
+        self._radius = max_distance // chunks
+        self._entries = OrderedDict()  # 条目编号 -> (哈希, 写入时间, 结果)
+        self._tables = [{} for _ in range(chunks)]  # 每段: 段取值 -> 条目编号集合
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    def _split(self, value):
+        """将哈希切分为各段的取值"""
+        mask = (1 << self.chunk_bits) - 1
+        return [(value >> (i * self.chunk_bits)) & mask for i in range(self.chunks)]
+
+    def _remove(self, entry_id):
+        value, _, _ = self._entries.pop(entry_id)
+        for table, part in zip(self._tables, self._split(value)):
+            ids = table.get(part)
+            if ids is not None:
+                ids.discard(entry_id)
+                if not ids:
+                    del table[part]
+
+    def lookup(self, value):
+        """
+        查找距离最近的近重复结果
+        Args:
+            value: 查询图像的哈希
+        Returns:
+            distance: 汉明距离，未命中时为None
+            payload: 缓存的结果，未命中时为None
+        """
+        parts = self._split(value)
+        now = time.time()
+        with self._lock:
+            candidates = set()
+            for table, part in zip(self._tables, parts):
+                for probe in _neighbours(part, self.chunk_bits, self._radius):
+                    ids = table.get(probe)
+                    if ids:
+                        candidates.update(ids)
+
+            best_id, best_distance = None, None
+            for entry_id in candidates:
+                stored, created, _ = self._entries[entry_id]
+                if self.ttl and now - created > self.ttl:
+                    continue
+                distance = bin(stored ^ value).count("1")
+                if distance <= self.max_distance and (best_distance is None or distance < best_distance):
+                    best_id, best_distance = entry_id, distance
+
+            if best_id is None:
+                return None, None
+            self._entries.move_to_end(best_id)
+            return best_distance, self._entries[best_id][2]
+
+    def add(self, value, payload):
+        """保存一个结果，超出容量时淘汰最久未使用的条目"""
+        parts = self._split(value)
+        with self._lock:
+            entry_id = next(self._ids)
+            self._entries[entry_id] = (value, time.time(), payload)
+            for table, part in zip(self._tables, parts):
+                table.setdefault(part, set()).add(entry_id)
+            while len(self._entries) > self.capacity:
+                self._remove(next(iter(self._entries)))
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def rescale_arrays(boxes, keypoints, source_size, target_size):
+    """
+    将检测结果从缓存图像的尺寸缩放到查询图像的尺寸
+    Args:
+        boxes: 边界框 (N, 4)
+        keypoints: 关键点 (N, 17, 3)
+        source_size: 缓存图像的 (宽, 高)
+        target_size: 查询图像的 (宽, 高)
+    Returns:
+        boxes, keypoints: 缩放后的副本
+    """
+    if source_size == target_size:
+        return boxes, keypoints
+    scale_x = target_size[0] / source_size[0]
+    scale_y = target_size[1] / source_size[1]
+    boxes = boxes * np.array([scale_x, scale_y, scale_x, scale_y], dtype=boxes.dtype)
+    keypoints = keypoints.copy()
+    keypoints[:, :, 0] *= scale_x
+    keypoints[:, :, 1] *= scale_y
+    return boxes, keypoints
+
+
+def image_size(data):
+    """
+    只读取图像文件头获取尺寸，不解码像素
+    Returns:
+        tuple: (宽, 高)，无法识别时返回None
+    """
+    from PIL import Image
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            return image.size
+    except Exception:
+        return None
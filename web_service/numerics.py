@@ -0,0 +1,164 @@
+"""
+CPU推理数值配置
+检测主机CPU对各数值选项的支持情况 (inference_mode、channels_last、bfloat16自动混合精度)，
+并在启用前在真实图像上与FP32基线的检测结果对比，确认每个选项
+"""
+
+import contextlib
+import logging
+
+import numpy as np
+import torch
+
+logger = logging.getLogger(__name__)
+
+# 可配置的数值选项
+NUMERICS_OPTIONS = ("inference_mode", "channels_last", "bf16")
+
+
+def read_cpu_flags(path="/proc/cpuinfo"):
+    """
+    读取CPU指令集标志
+    Returns:
+        set: 指令集标志集合，无法读取时为空集合
+    """
+    try:
+        with open(path, "r") as f:
+            for line in f:
+                if line.startswith("flags"):
+                    return set(line.split(":", 1)[1].split())
+    except OSError:
+        pass
+    return set()
+
+
+def detect_cpu_features():
+    """
+    检测主机对各数值选项的支持情况
+    Returns:
+        dict: {"flags": {...}, "supported": {选项: 是否支持}}
+    """
+    flags = read_cpu_flags()
+    mkldnn = torch.backends.mkldnn.is_available()
+
+    bf16_native = bool(flags & {"avx512_bf16", "amx_bf16"})
+    try:
+        bf16_kernels = bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except (AttributeError, RuntimeError):
+        bf16_kernels = False
+
+    return {
+        "flags": {
+            "avx2": "avx2" in flags,
+            "avx512f": "avx512f" in flags,
+            "avx512_bf16": "avx512_bf16" in flags,
+            "amx_bf16": "amx_bf16" in flags,
+            "mkldnn": mkldnn,
+        },
+        "supported": {
+            "inference_mode": True,
+            # channels_last卷积走oneDNN路径
+            "channels_last": mkldnn,
+            # 没有原生BF16指令时BF16只会通过模拟执行，反而更慢
+            "bf16": mkldnn and bf16_kernels and bf16_native,
+        },
+    }
+
+
+def numerics_context(inference_mode=False, bf16=False):
+    """
+    返回推理时使用的上下文管理器
+    Args:
+        inference_mode: 是否启用torch.inference_mode
+        bf16: 是否启用CPU bfloat16自动混合精度
+    """
+    stack = contextlib.ExitStack()
+    if inference_mode:
+        stack.enter_context(torch.inference_mode())
+    if bf16:
+        stack.enter_context(torch.autocast("cpu", dtype=torch.bfloat16))
+    return stack
+
+
+def _to_channels_last(module, inputs):
+    """前向预钩子: 将输入转换为channels_last内存布局"""
+    return tuple(
+        x.contiguous(memory_format=torch.channels_last) if isinstance(x, torch.Tensor) and x.dim() == 4 else x
+        for x in inputs
+    )
+
+
+def apply_channels_last(module):
+    """
+    将网络权重和输入转换为channels_last内存布局
+    Returns:
+        handle: 前向预钩子句柄，调用remove()可撤销输入转换
+    """
+    module.to(memory_format=torch.channels_last)
+    return module.register_forward_pre_hook(_to_channels_last)
+
+
+def remove_channels_last(module, handle):
+    """撤销apply_channels_last: 移除输入转换钩子并恢复连续内存布局"""
+    handle.remove()
+    module.to(memory_format=torch.contiguous_format)
+
+
+def compare_detections(baseline, candidate, min_iou=0.9, score_tolerance=0.05, keypoint_tolerance=0.05,
+                       visible_threshold=0.5):
+    """
+    比较启用数值选项前后在同一组真实图像上的检测结果 (NMS之后)
+    每帧的检测数须相同；基线的每个检测按置信度从高到低与IoU最大的候选检测配对，
+    边界框、置信度和关键点分别按各自的容差检查
+    Args:
+        baseline: FP32基线结果，每帧一个 (边界框 (N, 4), 置信度 (N,), 关键点 (N, 17, 3))
+        candidate: 启用选项后的结果，格式相同
+        min_iou: 配对检测的边界框IoU下限
+        score_tolerance: 边界框置信度和关键点置信度 (0-1) 允许的最大绝对误差
+        keypoint_tolerance: 关键点位置允许的最大误差 (相对于基线边界框对角线长度)
+        visible_threshold: 两边置信度都不低于该值的关键点才比较位置
+    Returns:
+        dict: {"ok": 是否通过, "detections": 基线检测数, "mismatched_frames": 检测数不同或无法配对的帧数,
+               "min_iou": 配对检测的最小IoU, "max_score_err": 置信度最大误差,
+               "max_keypoint_err": 关键点最大相对位置误差}
+    """
+    from tracking import box_iou
+
+    detections, mismatched = 0, 0
+    worst_iou, score_err, keypoint_err = 1.0, 0.0, 0.0
+    for (boxes, scores, keypoints), (c_boxes, c_scores, c_keypoints) in zip(baseline, candidate):
+        detections += len(boxes)
+        if len(boxes) != len(c_boxes):
+            mismatched += 1
+            continue
+        if not len(boxes):
+            continue
+        iou = box_iou(boxes, c_boxes)
+        used = set()
+        for i in np.argsort(-scores):
+            j = next(j for j in np.argsort(-iou[i]) if j not in used)
+            used.add(j)
+            worst_iou = min(worst_iou, float(iou[i, j]))
+            score_err = max(score_err, abs(float(scores[i] - c_scores[j])),
+                            float(np.abs(keypoints[i, :, 2] - c_keypoints[j, :, 2]).max()))
+            visible = (keypoints[i, :, 2] >= visible_threshold) & (c_keypoints[j, :, 2] >= visible_threshold)
+            if visible.any():
+                diagonal = max(float(np.hypot(boxes[i, 2] - boxes[i, 0], boxes[i, 3] - boxes[i, 1])), 1.0)
+                distance = np.hypot(*(keypoints[i, visible, :2] - c_keypoints[j, visible, :2]).T)
+                keypoint_err = max(keypoint_err, float(distance.max()) / diagonal)
+
+    ok = (
+        detections > 0  # 图像中没有人时无法确认选项不影响结果
+        and mismatched == 0
+        and worst_iou >= min_iou
+        and score_err <= score_tolerance
+        and keypoint_err <= keypoint_tolerance
+    )
+    return {
+        "ok": ok,
+        "detections": detections,
+        "mismatched_frames": mismatched,
+        "min_iou": round(worst_iou, 4),
+        "max_score_err": round(score_err, 4),
+        "max_keypoint_err": round(keypoint_err, 4),
+    }
@@ -0,0 +1,145 @@
+"""
+分阶段流水线
+把一个请求的处理拆成解码、预处理、推理和后处理/编码几个阶段，阶段之间用有界队列连接，
+每个阶段有自己的工作者数量。不同请求的各个阶段可以同时进行 (模型推理时解码和编码的CPU不再空闲)，
+吞吐量由最慢的阶段决定，而不是所有阶段耗时之和。
+
+阶段函数接收并返回请求上下文 (dict)。同步阶段函数在该阶段专用的线程池中执行，
+异步阶段函数 (如借出检测器副本的推理阶段) 在事件循环中执行，并发数为工作者数量。
+每个阶段的利用率 (忙碌时间 / 工作者数 / 统计周期) 和队列深度定期导出为指标。
+"""
+
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class Stage:
+    """流水线中的一个阶段"""
+
+    def __init__(self, name, func, workers=1, queue_size=64):
+        """
+        Args:
+            name: 阶段名称 (指标标签)
+            func: 阶段函数 func(ctx) -> ctx，可以是普通函数或协程函数
+            workers: 工作者数量
+            queue_size: 阶段输入队列的容量，队列满时上一阶段等待 (反压)
+        """
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.queue_size = queue_size
+        self.blocking = not asyncio.iscoroutinefunction(func)
+        self.queue = None
+        self.executor = None
+        self.busy = 0.0
+        self.items = 0
+        self.utilization = 0.0
+
+    def status(self):
+        return {
+            "stage": self.name,
+            "workers": self.workers,
+            "queue_depth": self.queue.qsize() if self.queue else 0,
+            "items": self.items,
+            "utilization": round(self.utilization, 3),
+        }
+
+
+class StagedPipeline:
+    """由有界队列连接的多阶段流水线"""
+
+    def __init__(self, stages, report_interval=5.0):
+        """
+        Args:
+            stages: Stage列表 (按执行顺序)
+            report_interval: 利用率统计周期(秒)
+        """
+        self.stages = stages
+        self.report_interval = report_interval
+        self._tasks = []
+
+    def start(self):
+        """在事件循环中启动各阶段的工作者"""
+        for stage in self.stages:
+            stage.queue = asyncio.Queue(maxsize=stage.queue_size)
+            if stage.blocking:
+                stage.executor = ThreadPoolExecutor(stage.workers, thread_name_prefix=f"stage-{stage.name}")
+        for index, stage in enumerate(self.stages):
+            following = self.stages[index + 1] if index + 1 < len(self.stages) else None
+            self._tasks.extend(
+                asyncio.create_task(self._worker(stage, following)) for _ in range(stage.workers)
+            )
+        self._tasks.append(asyncio.create_task(self._report()))
+        logger.info("流水线已启动: " + ", ".join(f"{s.name}x{s.workers}" for s in self.stages))
+
+    async def submit(self, ctx):
+        """
+        提交一个请求并等待它通过所有阶段
+        Args:
+            ctx: 请求上下文
+        Returns:
+            dict: 最后一个阶段返回的上下文
+        Raises:
+            任一阶段抛出的异常
+        """
+        future = asyncio.get_running_loop().create_future()
+        ctx["future"] = future
+        await self.stages[0].queue.put(ctx)
+        return await future
+
+    async def _worker(self, stage, following):
+        """阶段工作者: 取出上下文、执行阶段函数并交给下一阶段"""
+        loop = asyncio.get_running_loop()
+        while True:
+            ctx = await stage.queue.get()
+            future = ctx["future"]
+            if future.done():
+                # 请求已被取消 (如客户端断开)，不再处理
+                continue
+            start = time.time()
+            try:
+                if stage.blocking:
+                    ctx = await loop.run_in_executor(stage.executor, stage.func, ctx)
+                else:
+                    ctx = await stage.func(ctx)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+                continue
+            finally:
+                elapsed = time.time() - start
+                stage.busy += elapsed
+                stage.items += 1
+                metrics.observe("cloudpose_stage_seconds", elapsed, {"stage": stage.name})
+
+            if following is not None:
+                await following.queue.put(ctx)
+            elif not future.done():
+                future.set_result(ctx)
+
+    async def _report(self):
+        """定期计算各阶段的利用率并导出指标"""
+        last = time.time()
+        last_busy = {stage.name: 0.0 for stage in self.stages}
+        while True:
+            await asyncio.sleep(self.report_interval)
+            now = time.time()
+            for stage in self.stages:
+                busy = stage.busy - last_busy[stage.name]
+                last_busy[stage.name] = stage.busy
+                stage.utilization = min(1.0, busy / (stage.workers * (now - last)))
+                metrics.set_gauge("cloudpose_stage_utilization", stage.utilization, {"stage": stage.name})
+                metrics.set_gauge("cloudpose_stage_queue_depth", stage.queue.qsize(), {"stage": stage.name})
+            last = now
+
+    def status(self):
+        """各阶段状态，以及利用率最高 (决定吞吐量) 的阶段"""
+        stages = [stage.status() for stage in self.stages]
+        bottleneck = max(self.stages, key=lambda stage: stage.utilization)
+        return {"stages": stages, "bottleneck": bottleneck.name if bottleneck.utilization > 0 else None}
@@ -1,121 +1,221 @@
-import torch
-from torch.serialization import add_safe_globals
-from ultralytics.nn.tasks import PoseModel
-
-# 添加安全全局设置
-add_safe_globals([PoseModel])
-
-# 修复PyTorch 2.6兼容性问题
-import torch.serialization
-torch.serialization.add_safe_globals([
-    torch.nn.modules.container.Sequential,
-    torch.nn.modules.linear.Linear,
-    torch.nn.modules.conv.Conv2d,
-    torch.nn.modules.batchnorm.BatchNorm2d,
-    torch.nn.modules.activation.ReLU,
-    torch.nn.modules.pooling.MaxPool2d,
-    torch.nn.modules.dropout.Dropout,
-    torch.nn.modules.upsampling.Upsample,
-    torch.nn.modules.padding.ZeroPad2d,
-    torch.nn.modules.normalization.GroupNorm,
-    torch.nn.modules.activation.SiLU,
-    torch.nn.modules.activation.Hardswish,
-    torch.nn.modules.activation.Mish,
-    torch.nn.modules.activation.LeakyReLU,
-    torch.nn.modules.activation.GELU,
-    torch.nn.modules.activation.Swish,
-    torch.nn.modules.activation.HardSigmoid,
-    torch.nn.modules.activation.Tanh,
-    torch.nn.modules.activation.Sigmoid,
-    torch.nn.modules.activation.Softmax,
-    torch.nn.modules.activation.LogSoftmax,
-    torch.nn.modules.activation.PReLU,
-    torch.nn.modules.activation.ELU,
-    torch.nn.modules.activation.CELU,
-    torch.nn.modules.activation.SELU,
-    torch.nn.modules.activation.GLU,
-    torch.nn.modules.activation.Tanhshrink,
-    torch.nn.modules.activation.Hardshrink,
-    torch.nn.modules.activation.Softshrink,
-    torch.nn.modules.activation.Softplus,
-    torch.nn.modules.activation.Softmin,
-    torch.nn.modules.activation.LogSigmoid,
-    torch.nn.modules.activation.Threshold,
-    torch.nn.modules.activation.MultiheadAttention,
-    torch.nn.modules.activation.LayerNorm,
-    torch.nn.modules.activation.InstanceNorm1d,
-    torch.nn.modules.activation.InstanceNorm2d,
-    torch.nn.modules.activation.InstanceNorm3d,
-    torch.nn.modules.activation.LocalResponseNorm,
-    torch.nn.modules.activation.CrossMapLRN2d,
-    torch.nn.modules.activation.AlphaDropout,
-    torch.nn.modules.activation.FeatureAlphaDropout,
-    torch.nn.modules.activation.Dropout1d,
-    torch.nn.modules.activation.Dropout2d,
-    torch.nn.modules.activation.Dropout3d,
-    torch.nn.modules.activation.AlphaDropout,
-    torch.nn.modules.activation.FeatureAlphaDropout,
-    torch.nn.modules.activation.Dropout1d,
-    torch.nn.modules.activation.Dropout2d,
-    torch.nn.modules.activation.Dropout3d,
-    torch.nn.modules.activation.AlphaDropout,
-    torch.nn.modules.activation.FeatureAlphaDropout,
-    torch.nn.modules.activation.Dropout1d,
-    torch.nn.modules.activation.Dropout2d,
-    torch.nn.modules.activation.Dropout3d,
-    torch.nn.modules.activation.AlphaDropout,
-    torch.nn.modules.activation.FeatureAlphaDropout,
-    torch.nn.modules.activation.Dropout1d,
-    torch.nn.modules.activation.Dropout2d,
-    torch.nn.modules.activation.Dropout3d,
-    torch.nn.modules.activation.AlphaDropout,
-    torch.nn.modules.activation.FeatureAlphaDropout,
-    torch.nn.modules.activation.Dropout1d,
-    torch.nn.modules.activation.Dropout2d,
-    torch.nn.modules.activation.Dropout3d,
-])
-
+import contextlib
+import copy
+import inspect
 import cv2
 import numpy as np
 import time
 import logging
 
+from metrics import metrics
+from model_artifacts import file_sha256, resolve_model_artifact
+
 logger = logging.getLogger(__name__)
 
+# 修复PyTorch 2.6兼容性问题: torch.load默认weights_only=True，
+# 解pickle .pt检查点前需要将模型用到的类加入白名单。
+# 仅在加载.pt检查点时注册，加载TorchScript产物时完全跳过
+_SAFE_GLOBAL_NAMES = [
+    "Sequential", "ModuleList", "Linear", "Conv2d", "BatchNorm2d", "ReLU", "MaxPool2d",
+    "Dropout", "Upsample", "ZeroPad2d", "GroupNorm", "SiLU", "Hardswish", "Mish",
+    "LeakyReLU", "GELU", "Hardsigmoid", "Tanh", "Sigmoid", "Softmax", "LogSoftmax",
+    "PReLU", "ELU", "CELU", "SELU", "GLU", "Tanhshrink", "Hardshrink", "Softshrink",
+    "Softplus", "Softmin", "LogSigmoid", "Threshold", "MultiheadAttention", "LayerNorm",
+    "InstanceNorm1d", "InstanceNorm2d", "InstanceNorm3d", "LocalResponseNorm",
+    "CrossMapLRN2d", "AlphaDropout", "FeatureAlphaDropout", "Dropout1d", "Dropout2d",
+    "Dropout3d",
+]
+
+_safe_globals_registered = False
+
+
+def _register_safe_globals():
+    """注册torch.load安全全局类 (只执行一次)"""
+    global _safe_globals_registered
+    if _safe_globals_registered:
+        return
+
+    import torch
+    from ultralytics.nn.tasks import PoseModel
+
+    classes = [PoseModel]
+    for name in _SAFE_GLOBAL_NAMES:
+        cls = getattr(torch.nn, name, None)
+        if cls is not None:
+            classes.append(cls)
+    torch.serialization.add_safe_globals(classes)
+    _safe_globals_registered = True
+
+
+@contextlib.contextmanager
+def _mmap_torch_load():
+    """
+    加载期间让torch.load以mmap方式读取检查点
+    检查点通过页缓存映射而不是读入进程堆，同一节点上的多个Pod共享同一份物理页
+    """
+    import torch
+
+    original_load = torch.load
+    if "mmap" not in inspect.signature(original_load).parameters:
+        # PyTorch 2.1之前不支持mmap
+        yield
+        return
+
+    def load(*args, **kwargs):
+        kwargs.setdefault("mmap", True)
+        return original_load(*args, **kwargs)
+
+    torch.load = load
+    try:
+        yield
+    finally:
+        torch.load = original_load
+
+
+def _shallow_module_copy(module):
+    """浅拷贝对象，nn.Module的子模块/参数/缓冲区字典也复制一份，给副本赋值子模块时不会改动原对象"""
+    replica = copy.copy(module)
+    for name in ("_modules", "_parameters", "_buffers"):
+        if name in replica.__dict__:
+            replica.__dict__[name] = replica.__dict__[name].copy()
+    return replica
+
+
+def share_network(yolo):
+    """
+    创建共享网络权重的Ultralytics YOLO副本 (预测器为空，首次推理时重建)
+    检测头 (Detect/Pose) 在forward中会按输入形状改写 anchors/strides/shape，多个副本同时处理
+    不同形状的输入时会互相覆盖，因此每个副本拥有独立的检测头，其余层的卷积权重仍然共享。
+    调用前原对象应已构建过预测器 (网络已融合)，副本构建预测器时不会再修改共享的网络
+    Args:
+        yolo: Ultralytics YOLO对象
+    Returns:
+        YOLO副本
+    """
+    import torch
+
+    replica = _shallow_module_copy(yolo)
+    replica.predictor = None
+    network = yolo.model
+    if isinstance(network, torch.nn.Module):
+        # TorchScript等导出格式的网络由每个预测器单独加载，不需要处理
+        layers = _shallow_module_copy(network.model)
+        head = list(layers._modules)[-1]
+        layers._modules[head] = copy.deepcopy(network.model[-1])
+        replica_network = _shallow_module_copy(network)
+        replica_network._modules["model"] = layers
+        replica.model = replica_network
+    return replica
+
+# COCO关键点连接定义 (17个关键点)
+KEYPOINT_CONNECTIONS = [
+    [0, 1],   # 鼻子到左眼
+    [0, 2],   # 鼻子到右眼
+    [1, 3],   # 左眼到左耳
+    [2, 4],   # 右眼到右耳
+    [5, 6],   # 左肩到右肩
+    [5, 7],   # 左肩到左肘
+    [7, 9],   # 左肘到左手腕
+    [6, 8],   # 右肩到右肘
+    [8, 10],  # 右肘到右手腕
+    [5, 11],  # 左肩到左臀
+    [6, 12],  # 右肩到右臀
+    [11, 12], # 左臀到右臀
+    [11, 13], # 左臀到左膝
+    [13, 15], # 左膝到左脚踝
+    [12, 14], # 右臀到右膝
+    [14, 16]  # 右膝到右脚踝
+]
+
+
+def draw_poses(image, keypoints, connections=KEYPOINT_CONNECTIONS):
+    """
+    在图像上绘制关键点和骨架连接线 (原地绘制)
+    Args:
+        image: OpenCV格式的图像
+        keypoints: 关键点 (N, 17, 3)，每个关键点为 x, y, 置信度
+        connections: 关键点连接定义
+    Returns:
+        image: 绘制后的图像
+    """
+    # 绘制每个检测到的人
+    for person in keypoints:
+        # 绘制关键点
+        for kp_idx, (x, y, conf) in enumerate(person):
+            if conf > 0.5:  # 只绘制置信度高的关键点
+                # 绘制关键点圆圈
+                cv2.circle(image, (int(x), int(y)), 5, (0, 255, 0), -1)
+                # 添加关键点标签
+                cv2.putText(image, str(kp_idx), 
+                          (int(x) + 5, int(y) - 5), 
+                          cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
+        
+        # 绘制关键点连接线
+        for kp1_idx, kp2_idx in connections:
+            if kp1_idx < len(person) and kp2_idx < len(person):
+                x1, y1, conf1 = person[kp1_idx]
+                x2, y2, conf2 = person[kp2_idx]
+                
+                # 只有当两个关键点都有足够高的置信度时才绘制连接线
+                if conf1 > 0.5 and conf2 > 0.5:
+                    cv2.line(image, 
+                           (int(x1), int(y1)), 
+                           (int(x2), int(y2)), 
+                           (0, 0, 255), 2)
+    return image
+
 class PoseDetector:
-    def __init__(self, model_path='./yolo11l-pose.pt'):
+    def __init__(self, model_path='./yolo11l-pose.pt', artifact_cache_dir=None,
+                 artifact_imgsz=640, build_artifact=False, mmap_weights=True):
         """
         初始化姿态检测器
         Args:
             model_path: YOLO模型文件路径
+            artifact_cache_dir: 预编译TorchScript产物缓存目录，为None时直接加载.pt
+            artifact_imgsz: 预编译产物的输入分辨率
+            build_artifact: 产物缓存未命中时是否当场导出
+            mmap_weights: 是否以mmap方式加载.pt检查点
         """
+        # 各加载阶段耗时 {"阶段": 秒}
+        self.load_timings = {}
         try:
-            logger.info(f"正在加载模型: {model_path}")
-            self.model = YOLO(model_path)
+            start = time.time()
+            from ultralytics import YOLO
+            self.load_timings["import"] = time.time() - start
+
+            load_path = model_path
+            if artifact_cache_dir:
+                artifact, timings = resolve_model_artifact(
+                    model_path, artifact_cache_dir, imgsz=artifact_imgsz,
+                    build_on_miss=build_artifact,
+                )
+                self.load_timings.update(timings)
+                if artifact:
+                    load_path = artifact
+
+            logger.info(f"正在加载模型: {load_path}")
+            start = time.time()
+            if load_path.endswith(".pt"):
+                _register_safe_globals()
+                loader = _mmap_torch_load() if mmap_weights else contextlib.nullcontext()
+                with loader:
+                    self.model = YOLO(load_path)
+            else:
+                self.model = YOLO(load_path, task="pose")
+            self.load_timings["load"] = time.time() - start
+            self.model_path = load_path
+            # 图模式推理 (见enable_graph_mode)，为None时使用eager模式
+            self.graph = None
+            # 已启用的数值选项 (见configure_numerics)
+            self.numerics = {"inference_mode": False, "channels_last": False, "bf16": False}
+            # 人员存在预过滤器 (见enable_presence_gate)，为None时每张图像都运行姿态模型
+            self.gate = None
             logger.info("模型加载成功")
         except Exception as e:
             logger.error(f"模型加载失败: {e}")
             raise e
         
         # COCO关键点连接定义 (17个关键点)
-        self.keypoint_connections = [
-            [0, 1],   # 鼻子到左眼
-            [0, 2],   # 鼻子到右眼
-            [1, 3],   # 左眼到左耳
-            [2, 4],   # 右眼到右耳
-            [5, 6],   # 左肩到右肩
-            [5, 7],   # 左肩到左肘
-            [7, 9],   # 左肘到左手腕
-            [6, 8],   # 右肩到右肘
-            [8, 10],  # 右肘到右手腕
-            [5, 11],  # 左肩到左臀
-            [6, 12],  # 右肩到右臀
-            [11, 12], # 左臀到右臀
-            [11, 13], # 左臀到左膝
-            [13, 15], # 左膝到左脚踝
-            [12, 14], # 右臀到右膝
-            [14, 16]  # 右膝到右脚踝
-        ]
+        self.keypoint_connections = KEYPOINT_CONNECTIONS
         
         # COCO关键点名称
         self.keypoint_names = [
@@ -145,10 +245,19 @@ class PoseDetector:
             else:
                 image_rgb = image
             preprocess_time = time.time() - start_preprocess
+
+            # 预过滤: 判定为无人的图像不运行姿态模型，空结果解析后即为 count: 0
+            if self.gate is not None:
+                present, gate_time = self.gate.check(image)
+                preprocess_time += gate_time
+                metrics.observe("cloudpose_prefilter_seconds", gate_time)
+                metrics.inc("cloudpose_prefilter_total", labels={"outcome": "passed" if present else "skipped"})
+                if not present:
+                    return [], preprocess_time, 0.0, 0.0
             
             # 推理
             start_inference = time.time()
-            results = self.model(image_rgb)
+            results = self._predict([image_rgb])
             inference_time = time.time() - start_inference
             
             # 后处理
@@ -162,6 +271,359 @@ class PoseDetector:
             logger.error(f"姿态检测失败: {e}")
             raise e
 
+    def detect_batch(self, images):
+        """
+        批量执行姿态检测
+        Args:
+            images: OpenCV格式的图像列表
+        Returns:
+            results: YOLO检测结果列表 (与输入一一对应)
+            preprocess_time: 预处理时间
+            inference_time: 推理时间
+            postprocess_time: 后处理时间
+        """
+        try:
+            start_preprocess = time.time()
+            images_rgb = [
+                cv2.cvtColor(image, cv2.COLOR_BGR2RGB) if len(image.shape) == 3 else image
+                for image in images
+            ]
+            preprocess_time = time.time() - start_preprocess
+
+            start_inference = time.time()
+            results = self._predict(images_rgb, verbose=False)
+            inference_time = time.time() - start_inference
+
+            return results, preprocess_time, inference_time, 0.0
+
+        except Exception as e:
+            logger.error(f"批量姿态检测失败: {e}")
+            raise e
+
+    def _predict(self, images, **kwargs):
+        """
+        执行推理
+        图模式下将图像按最大批大小分块，并补齐到静态形状桶的批大小和分辨率
+        Args:
+            images: 图像列表
+        Returns:
+            list: YOLO检测结果 (与输入一一对应)
+        """
+        with self._inference_context():
+            if self.graph is None:
+                return self.model(images, **kwargs)
+
+            # 分辨率由静态形状桶决定
+            kwargs.pop("imgsz", None)
+
+            results = []
+            max_batch = self.graph.max_batch_size
+            for offset in range(0, len(images), max_batch):
+                chunk = images[offset:offset + max_batch]
+                batch_size, imgsz = self.graph.select_bucket(chunk)
+                padded = chunk + [chunk[-1]] * (batch_size - len(chunk))
+                chunk_results = self.model(padded, imgsz=imgsz, rect=False, **kwargs)
+                results.extend(chunk_results[:len(chunk)])
+            return results
+
+    def clone(self):
+        """
+        创建共享网络权重、但拥有独立Ultralytics预测器和检测头的副本
+        预测器不支持多线程并发调用，每个并发推理线程应使用自己的副本。
+        应在单个线程中依次调用: 首次调用时先在本检测器上构建预测器 (融合BN)，副本不再修改共享的网络
+        Returns:
+            PoseDetector: 检测器副本
+        """
+        self._ensure_predictor(self.graph.imgsz_list[0] if self.graph is not None else 640)
+        replica = copy.copy(self)
+        replica.model = share_network(self.model)
+        replica.numerics = dict(self.numerics)
+        replica.gate = self.gate.clone() if self.gate is not None else None
+
+        if self.graph is not None:
+            # 新预测器的推理后端同样使用已编译的图
+            replica._ensure_predictor(self.graph.imgsz_list[0])
+            replica.model.predictor.model.model = self.graph
+        return replica
+
+    def _inference_context(self):
+        """返回推理时的数值上下文 (inference_mode / bfloat16自动混合精度)"""
+        if not (self.numerics["inference_mode"] or self.numerics["bf16"]):
+            return contextlib.nullcontext()
+
+        from numerics import numerics_context
+        return numerics_context(self.numerics["inference_mode"], self.numerics["bf16"])
+
+    def _ensure_predictor(self, imgsz=640):
+        """确保Ultralytics预测器和融合后的网络已构建，返回推理后端 (AutoBackend)"""
+        if self.model.predictor is None:
+            frame = np.zeros((imgsz, imgsz, 3), dtype=np.uint8)
+            self.model(frame, verbose=False)
+        return self.model.predictor.model
+
+    def _parity_detections(self, frames):
+        """逐帧检测 (不经过预过滤)，返回每帧的检测数组，用于数值选项的精度对比"""
+        detections = []
+        for frame in frames:
+            image_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB) if len(frame.shape) == 3 else frame
+            detections.append(self.results_to_arrays(self._predict(image_rgb, verbose=False)))
+        return detections
+
+    def configure_numerics(self, options, verify=True, frames=None, **tolerances):
+        """
+        启用数值选项
+        每个选项先检测主机CPU是否支持，再在真实图像上与FP32基线的检测结果对比，两者都通过才启用
+        Args:
+            options: 请求启用的选项 ("inference_mode", "channels_last", "bf16")
+            verify: 是否在启用前进行精度对比
+            frames: 对比用的图像 (应包含人物，没有检测结果时选项不启用)
+            tolerances: 传给 numerics.compare_detections 的容差 (min_iou、score_tolerance、keypoint_tolerance)
+        Returns:
+            dict: 每个选项的检测和验证结果
+        """
+        from numerics import apply_channels_last, compare_detections, detect_cpu_features, remove_channels_last
+
+        features = detect_cpu_features()
+        backend = self._ensure_predictor()
+        is_pytorch = getattr(backend, "pt", False)
+        baseline = self._parity_detections(frames) if verify and frames else None
+
+        report = {}
+        for option in options:
+            supported = features["supported"].get(option, False)
+            if option == "channels_last" and not is_pytorch:
+                supported = False
+            entry = {"supported": supported, "enabled": False}
+            if supported and verify and baseline is None:
+                entry["ok"] = False
+                entry["reason"] = "没有用于精度对比的图像"
+            elif supported and verify:
+                # 只启用当前选项，与基线对比后恢复
+                self.numerics[option] = True
+                handle = apply_channels_last(backend.model) if option == "channels_last" else None
+                try:
+                    candidate = self._parity_detections(frames)
+                finally:
+                    self.numerics[option] = False
+                    if handle is not None:
+                        remove_channels_last(backend.model, handle)
+                entry.update(compare_detections(baseline, candidate, **tolerances))
+                entry["enabled"] = entry["ok"]
+            elif supported:
+                entry["enabled"] = True
+
+            if entry["enabled"]:
+                self.numerics[option] = True
+                logger.info(f"已启用数值选项: {option}")
+            else:
+                logger.warning(f"数值选项未启用: {option}, {entry}")
+            report[option] = entry
+
+        if self.numerics["channels_last"]:
+            apply_channels_last(backend.model)
+        return report
+
+    def enable_graph_mode(self, mode, batch_sizes=(1,), imgsz_list=(640,), cache_dir="./graph_cache"):
+        """
+        启用图模式推理
+        Args:
+            mode: "eager"、"torchscript" 或 "compile"
+            batch_sizes: 允许的批大小 (静态形状桶)
+            imgsz_list: 允许的输入分辨率 (静态形状桶)
+            cache_dir: 编译缓存目录
+        Returns:
+            dict: 每个桶的编译耗时 {"批大小x分辨率": 秒}
+        """
+        if mode == "eager":
+            return {}
+
+        from graph_mode import GraphRunner
+
+        backend = self._ensure_predictor(imgsz_list[0])
+        if not getattr(backend, "pt", False):
+            logger.warning("图模式只支持PyTorch (.pt) 模型，已保持当前推理后端")
+            return {}
+
+        runner = GraphRunner(
+            backend.model, mode, batch_sizes, imgsz_list, cache_dir, file_sha256(self.model_path)
+        )
+        timings = runner.build()
+        backend.model = runner
+        self.graph = runner
+        return timings
+
+    def enable_presence_gate(self, model_path="yolo11n.pt", imgsz=320, conf=0.25, min_std=2.0):
+        """
+        启用人员存在预过滤: detect 先用微型检测器判断是否有人，无人时直接返回空结果
+        Args:
+            model_path: 微型检测器模型路径
+            imgsz: 检测器输入分辨率
+            conf: person检测的置信度阈值，越低召回率越高
+            min_std: 灰度标准差低于该值的图像视为纯色图像
+        Returns:
+            PresenceGate: 预过滤器
+        """
+        from presence_gate import PresenceGate
+
+        self.gate = PresenceGate(model_path, imgsz=imgsz, conf=conf, min_std=min_std)
+        return self.gate
+
+    def warmup(self, batch_sizes=(1,), image_sizes=((640, 480),), rounds=1,
+               tiled_image_sizes=(), tile_size=640, overlap=0.2):
+        """
+        模型预热
+        对每个批大小和分辨率执行合成推理，使惰性初始化、内存分配器扩容和
+        Ultralytics预测器构建在处理真实请求之前完成
+        Args:
+            batch_sizes: 服务会使用的批大小列表
+            image_sizes: 服务会使用的分辨率列表 [(宽, 高), ...]
+            rounds: 每种组合的推理次数
+            tiled_image_sizes: 分块推理的原图分辨率列表 (分块数即批大小)
+            tile_size: 分块边长
+            overlap: 相邻分块的重叠比例
+        Returns:
+            total_time: 预热总耗时(秒)
+            timings: 每种组合的耗时 {"批大小x宽x高": 秒}
+        """
+        rng = np.random.default_rng(0)
+        timings = {}
+        start_warmup = time.time()
+        if self.gate is not None:
+            self.gate.warmup(image_sizes)
+
+        for width, height in image_sizes:
+            frame = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+            for batch_size in batch_sizes:
+                start = time.time()
+                for _ in range(rounds):
+                    self.detect_batch([frame] * batch_size)
+                elapsed = time.time() - start
+                timings[f"{batch_size}x{width}x{height}"] = elapsed
+                logger.info(f"预热完成: 批大小={batch_size}, 分辨率={width}x{height}, 耗时={elapsed:.2f}s")
+
+        for width, height in tiled_image_sizes:
+            frame = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+            start = time.time()
+            for _ in range(rounds):
+                self.detect_tiled(frame, tile_size=tile_size, overlap=overlap)
+            elapsed = time.time() - start
+            timings[f"tiled-{width}x{height}"] = elapsed
+            logger.info(f"预热完成: 分块推理, 分辨率={width}x{height}, 耗时={elapsed:.2f}s")
+
+        total_time = time.time() - start_warmup
+        return total_time, timings
+
+    def detect_tiled(self, image, tile_size=640, overlap=0.2, iou_threshold=0.5):
+        """
+        分块执行姿态检测
+        将图像切分为相互重叠的分块并作为一个批次推理，检测结果平移回原图坐标后
+        用NMS合并分块接缝处的重复检测 (不经过人员存在预过滤: 低分辨率的整图预过滤会漏掉小目标)
+        Args:
+            image: OpenCV格式的图像
+            tile_size: 分块边长 (即每个分块的推理分辨率)
+            overlap: 相邻分块的重叠比例
+            iou_threshold: 合并重复检测的IoU阈值
+        Returns:
+            arrays: (边界框 (N, 4), 置信度 (N,), 关键点 (N, 17, 3))
+            preprocess_time: 预处理 (切分) 时间
+            inference_time: 推理时间
+            postprocess_time: 后处理 (坐标平移与NMS) 时间
+        """
+        from tiling import nms, offset_detections, seam_mask, tile_grid
+
+        try:
+            start_preprocess = time.time()
+            image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB) if len(image.shape) == 3 else image
+            height, width = image_rgb.shape[:2]
+            tiles = tile_grid(width, height, tile_size, overlap)
+            crops = [image_rgb[y0:y1, x0:x1] for x0, y0, x1, y1 in tiles]
+            preprocess_time = time.time() - start_preprocess
+
+            start_inference = time.time()
+            results = self._predict(crops, imgsz=tile_size, verbose=False)
+            inference_time = time.time() - start_inference
+
+            start_postprocess = time.time()
+            all_boxes, all_scores, all_keypoints, all_tiles = [], [], [], []
+            for index, ((x0, y0, _, _), result) in enumerate(zip(tiles, results)):
+                boxes, scores, keypoints = self.results_to_arrays([result])
+                boxes, keypoints = offset_detections(boxes, keypoints, x0, y0)
+                all_boxes.append(boxes)
+                all_scores.append(scores)
+                all_keypoints.append(keypoints)
+                all_tiles.append(np.full(len(boxes), index, dtype=np.int64))
+            boxes = np.concatenate(all_boxes)
+            scores = np.concatenate(all_scores)
+            keypoints = np.concatenate(all_keypoints)
+            tile_index = np.concatenate(all_tiles)
+            at_seam = seam_mask(boxes, np.asarray(tiles)[tile_index], width, height)
+            keep = nms(boxes, scores, iou_threshold, tile_index=tile_index, at_seam=at_seam)
+            postprocess_time = time.time() - start_postprocess
+
+            return (boxes[keep], scores[keep], keypoints[keep]), preprocess_time, inference_time, postprocess_time
+
+        except Exception as e:
+            logger.error(f"分块姿态检测失败: {e}")
+            raise e
+
+    def results_to_arrays(self, results):
+        """
+        将YOLO检测结果转换为numpy数组
+        Args:
+            results: YOLO检测结果
+        Returns:
+            boxes: 边界框 (N, 4)，格式为 x1, y1, x2, y2
+            scores: 边界框置信度 (N,)
+            keypoints: 关键点 (N, 17, 3)，每个关键点为 x, y, 置信度
+        """
+        boxes = [np.empty((0, 4), dtype=np.float32)]
+        scores = [np.empty(0, dtype=np.float32)]
+        keypoints = [np.empty((0, len(self.keypoint_names), 3), dtype=np.float32)]
+
+        for result in results:
+            if result.keypoints is not None and len(result.keypoints.xy) > 0:
+                # 获取边界框
+                if result.boxes is not None and len(result.boxes.xyxy) > 0:
+                    boxes.append(result.boxes.xyxy.cpu().numpy().astype(np.float32))
+                    scores.append(result.boxes.conf.cpu().numpy().astype(np.float32))
+
+                # 获取关键点
+                keypoints_xy = result.keypoints.xy.cpu().numpy()  # (num_people, num_keypoints, 2)
+                keypoints_conf = result.keypoints.conf.cpu().numpy()  # (num_people, num_keypoints)
+                keypoints.append(
+                    np.concatenate([keypoints_xy, keypoints_conf[..., None]], axis=-1).astype(np.float32)
+                )
+
+        return np.concatenate(boxes), np.concatenate(scores), np.concatenate(keypoints)
+
+    @staticmethod
+    def format_arrays(boxes, scores, keypoints, request_id):
+        """
+        将检测数组格式化为API响应数据
+        Args:
+            boxes: 边界框 (N, 4)
+            scores: 边界框置信度 (N,)
+            keypoints: 关键点 (N, 17, 3)
+            request_id: 请求ID
+        Returns:
+            dict: 响应数据
+        """
+        return {
+            "count": len(keypoints),
+            "boxes": [
+                {
+                    "id": request_id,
+                    "x": float(x1),
+                    "y": float(y1),
+                    "width": float(x2 - x1),
+                    "height": float(y2 - y1),
+                    "probability": float(conf)
+                }
+                for (x1, y1, x2, y2), conf in zip(boxes, scores)
+            ],
+            "keypoints": keypoints.tolist()
+        }
+
     def parse_results(self, results, request_id):
         """
         解析YOLO检测结果
@@ -172,46 +634,8 @@ class PoseDetector:
             dict: 解析后的结果数据
         """
         try:
-            boxes = []
-            keypoints_list = []
-            count = 0
-            
-            for result in results:
-                if result.keypoints is not None and len(result.keypoints.xy) > 0:
-                    # 获取边界框
-                    if result.boxes is not None and len(result.boxes.xyxy) > 0:
-                        for i, box in enumerate(result.boxes.xyxy):
-                            x1, y1, x2, y2 = box.cpu().numpy()
-                            conf = result.boxes.conf[i].cpu().numpy()
-                            
-                            boxes.append({
-                                "id": request_id,
-                                "x": float(x1),
-                                "y": float(y1),
-                                "width": float(x2 - x1),
-                                "height": float(y2 - y1),
-                                "probability": float(conf)
-                            })
-                    
-                    # 获取关键点
-                    keypoints_xy = result.keypoints.xy.cpu().numpy()  # (num_people, num_keypoints, 2)
-                    keypoints_conf = result.keypoints.conf.cpu().numpy()  # (num_people, num_keypoints)
-                    
-                    for person_idx in range(len(keypoints_xy)):
-                        person_keypoints = []
-                        for kp_idx in range(len(keypoints_xy[person_idx])):
-                            x, y = keypoints_xy[person_idx][kp_idx]
-                            conf = keypoints_conf[person_idx][kp_idx]
-                            person_keypoints.append([float(x), float(y), float(conf)])
-                        keypoints_list.append(person_keypoints)
-                        count += 1
-            
-            return {
-                "count": count,
-                "boxes": boxes,
-                "keypoints": keypoints_list
-            }
-            
+            return self.format_arrays(*self.results_to_arrays(results), request_id)
+
         except Exception as e:
             logger.error(f"结果解析失败: {e}")
             return {
@@ -220,11 +644,13 @@ class PoseDetector:
                 "keypoints": []
             }
 
-    def detect_and_annotate(self, image):
+    def detect_and_annotate(self, image, tiled=False, **tile_options):
         """
         执行姿态检测并生成标注图像
         Args:
             image: OpenCV格式的图像
+            tiled: 是否使用分块推理
+            tile_options: 分块推理参数 (见detect_tiled)
         Returns:
             annotated_image: 标注后的图像
         """
@@ -233,46 +659,13 @@ class PoseDetector:
             annotated_image = image.copy()
             
             # 执行检测
-            results, _, _, _ = self.detect(image)
-            
-            # 绘制检测结果
-            for result in results:
-                if result.keypoints is not None and len(result.keypoints.xy) > 0:
-                    keypoints_xy = result.keypoints.xy.cpu().numpy()
-                    keypoints_conf = result.keypoints.conf.cpu().numpy()
-                    
-                    # 绘制每个检测到的人
-                    for person_idx in range(len(keypoints_xy)):
-                        # 绘制关键点
-                        for kp_idx, (x, y) in enumerate(keypoints_xy[person_idx]):
-                            conf = keypoints_conf[person_idx][kp_idx]
-                            if conf > 0.5:  # 只绘制置信度高的关键点
-                                # 绘制关键点圆圈
-                                cv2.circle(annotated_image, (int(x), int(y)), 5, (0, 255, 0), -1)
-                                # 添加关键点标签
-                                cv2.putText(annotated_image, str(kp_idx), 
-                                          (int(x) + 5, int(y) - 5), 
-                                          cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
-                        
-                        # 绘制关键点连接线
-                        for connection in self.keypoint_connections:
-                            kp1_idx, kp2_idx = connection
-                            if (kp1_idx < len(keypoints_xy[person_idx]) and 
-                                kp2_idx < len(keypoints_xy[person_idx])):
-                                
-                                x1, y1 = keypoints_xy[person_idx][kp1_idx]
-                                x2, y2 = keypoints_xy[person_idx][kp2_idx]
-                                conf1 = keypoints_conf[person_idx][kp1_idx]
-                                conf2 = keypoints_conf[person_idx][kp2_idx]
-                                
-                                # 只有当两个关键点都有足够高的置信度时才绘制连接线
-                                if conf1 > 0.5 and conf2 > 0.5:
-                                    cv2.line(annotated_image, 
-                                           (int(x1), int(y1)), 
-                                           (int(x2), int(y2)), 
-                                           (0, 0, 255), 2)
+            if tiled:
+                (_, _, keypoints), _, _, _ = self.detect_tiled(image, **tile_options)
+            else:
+                results, _, _, _ = self.detect(image)
+                _, _, keypoints = self.results_to_arrays(results)
             
-            return annotated_image
+            return draw_poses(annotated_image, keypoints, self.keypoint_connections)
             
         except Exception as e:
             logger.error(f"图像标注失败: {e}")
@@ -0,0 +1,227 @@
+"""
+姿态结果归档
+批量结果以JSON保存时是大量嵌套的浮点数列表，写入、解析和查询都很慢。
+归档目录以列式的原始float32数组保存检测结果，可以用 np.memmap 按需读取而不必加载整个文件:
+
+    keypoints.f32   关键点 (人数, 17, 3)，每个关键点为 (x, y, 置信度)
+    boxes.f32       边界框 (人数, 5)，每行为 (x1, y1, x2, y2, 置信度)
+    offsets.i64     每张图像在上面两个数组中的起始行 (图像数 + 1)
+    ids.jsonl       每行一个图像ID (JSON字符串)
+    meta.json       版本、图像数和总人数 (只有写入meta.json之后追加的数据才算提交)
+
+写入方把结果缓存在内存中，攒够一批后整块追加到各个文件；读取方按ID和置信度过滤时只访问需要的行。
+"""
+
+import json
+import os
+
+import numpy as np
+
+VERSION = 1
+NUM_KEYPOINTS = 17
+KEYPOINTS_FILE = "keypoints.f32"
+BOXES_FILE = "boxes.f32"
+OFFSETS_FILE = "offsets.i64"
+IDS_FILE = "ids.jsonl"
+META_FILE = "meta.json"
+
+
+def _read_meta(path):
+    with open(os.path.join(path, META_FILE)) as f:
+        return json.load(f)
+
+
+class ArchiveWriter:
+    """归档写入: 批量追加"""
+
+    def __init__(self, path, flush_rows=4096):
+        """
+        Args:
+            path: 归档目录，已存在时在其后追加 (丢弃上次未提交的数据)
+            flush_rows: 缓存的人数达到该值时写出
+        """
+        self.path = path
+        self.flush_rows = flush_rows
+        self.images = 0
+        self.rows = 0
+        self._pending = []
+        self._pending_rows = 0
+        os.makedirs(path, exist_ok=True)
+        if os.path.exists(os.path.join(path, META_FILE)):
+            meta = _read_meta(path)
+            self.images, self.rows = meta["images"], meta["rows"]
+        self._truncate()
+
+    def _truncate(self):
+        """把各文件截断到已提交的长度 (写入过程中被中断时会有多余的数据)"""
+        row_bytes = {KEYPOINTS_FILE: NUM_KEYPOINTS * 3 * 4, BOXES_FILE: 5 * 4}
+        for name, size in row_bytes.items():
+            with open(os.path.join(self.path, name), "ab") as f:
+                f.truncate(self.rows * size)
+        offsets_path = os.path.join(self.path, OFFSETS_FILE)
+        with open(offsets_path, "ab") as f:
+            if self.images == 0:
+                # offsets以0开头，第i张图像的行范围为 [offsets[i], offsets[i+1])
+                f.truncate(0)
+                f.write(np.zeros(1, dtype=np.int64).tobytes())
+            else:
+                f.truncate((self.images + 1) * 8)
+        ids_path = os.path.join(self.path, IDS_FILE)
+        ids = []
+        if os.path.exists(ids_path):
+            with open(ids_path) as f:
+                ids = f.read().split("\n")[:self.images]
+        with open(ids_path, "w") as f:
+            f.writelines(line + "\n" for line in ids)
+
+    def append(self, image_id, boxes, scores, keypoints):
+        """
+        添加一张图像的检测结果
+        Args:
+            image_id: 图像ID
+            boxes: 边界框 (N, 4)，格式为 (x1, y1, x2, y2)
+            scores: 边界框置信度 (N,)
+            keypoints: 关键点 (N, 17, 3)
+        """
+        boxes = np.concatenate(
+            [np.asarray(boxes, dtype=np.float32).reshape(-1, 4), np.asarray(scores, dtype=np.float32).reshape(-1, 1)],
+            axis=1,
+        )
+        keypoints = np.asarray(keypoints, dtype=np.float32).reshape(-1, NUM_KEYPOINTS, 3)
+        self._pending.append((str(image_id), boxes, keypoints))
+        self._pending_rows += len(boxes)
+        if self._pending_rows >= self.flush_rows:
+            self.flush()
+
+    def append_response(self, response):
+        """添加一条API响应格式的结果 (PoseDetector.format_arrays 的返回值，带 id 字段)"""
+        boxes = [(b["x"], b["y"], b["x"] + b["width"], b["y"] + b["height"]) for b in response["boxes"]]
+        scores = [b["probability"] for b in response["boxes"]]
+        self.append(response["id"], boxes, scores, response["keypoints"])
+
+    def flush(self):
+        """把缓存的结果整块追加到各文件，再更新meta.json提交"""
+        if not self._pending:
+            return
+        ids, boxes, keypoints = zip(*self._pending)
+        counts = np.array([len(b) for b in boxes], dtype=np.int64)
+        offsets = self.rows + np.cumsum(counts)
+
+        with open(os.path.join(self.path, KEYPOINTS_FILE), "ab") as f:
+            f.write(np.concatenate(keypoints).tobytes())
+        with open(os.path.join(self.path, BOXES_FILE), "ab") as f:
+            f.write(np.concatenate(boxes).tobytes())
+        with open(os.path.join(self.path, OFFSETS_FILE), "ab") as f:
+            f.write(offsets.tobytes())
+        with open(os.path.join(self.path, IDS_FILE), "a") as f:
+            f.writelines(json.dumps(image_id) + "\n" for image_id in ids)
+
+        self.images += len(ids)
+        self.rows = int(offsets[-1])
+        self._pending, self._pending_rows = [], 0
+        self._write_meta()
+
+    def _write_meta(self):
+        meta_path = os.path.join(self.path, META_FILE)
+        with open(meta_path + ".tmp", "w") as f:
+            json.dump({"version": VERSION, "images": self.images, "rows": self.rows}, f)
+        os.replace(meta_path + ".tmp", meta_path)
+
+    def close(self):
+        self.flush()
+        if self.images == 0:
+            self._write_meta()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ArchiveReader:
+    """归档读取: 数组以内存映射方式按需读取"""
+
+    def __init__(self, path):
+        """
+        Args:
+            path: 归档目录
+        """
+        self.path = path
+        meta = _read_meta(path)
+        if meta["version"] != VERSION:
+            raise ValueError(f"不支持的归档版本: {meta['version']}")
+        self.images, self.rows = meta["images"], meta["rows"]
+        self.keypoints = self._map(KEYPOINTS_FILE, (self.rows, NUM_KEYPOINTS, 3))
+        self.boxes = self._map(BOXES_FILE, (self.rows, 5))
+        self.offsets = np.fromfile(os.path.join(path, OFFSETS_FILE), dtype=np.int64, count=self.images + 1)
+        self._ids = None
+        self._positions = None
+
+    def _map(self, name, shape):
+        if shape[0] == 0:
+            return np.empty(shape, dtype=np.float32)
+        return np.memmap(os.path.join(self.path, name), dtype=np.float32, mode="r", shape=shape)
+
+    @property
+    def ids(self):
+        """图像ID列表 (首次访问时读取)"""
+        if self._ids is None:
+            with open(os.path.join(self.path, IDS_FILE)) as f:
+                self._ids = [json.loads(line) for _, line in zip(range(self.images), f)]
+        return self._ids
+
+    def __len__(self):
+        return self.images
+
+    def position(self, image_id):
+        """图像ID在归档中的序号，不存在时返回None"""
+        if self._positions is None:
+            self._positions = {image_id: i for i, image_id in enumerate(self.ids)}
+        return self._positions.get(image_id)
+
+    def __getitem__(self, index):
+        """
+        第index张图像的检测结果 (内存映射的视图)
+        Returns:
+            boxes: (N, 5)
+            keypoints: (N, 17, 3)
+        """
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return self.boxes[start:end], self.keypoints[start:end]
+
+    def get(self, image_id):
+        """按图像ID读取检测结果，不存在时返回None"""
+        index = self.position(image_id)
+        return None if index is None else self[index]
+
+    def filter(self, ids=None, min_score=0.0):
+        """
+        按图像ID和边界框置信度过滤
+        Args:
+            ids: 图像ID集合，None表示全部图像
+            min_score: 最低边界框置信度
+        Yields:
+            (图像ID, boxes (N, 5), keypoints (N, 17, 3))，只包含置信度达到要求的人
+        """
+        indices = range(self.images) if ids is None else sorted(
+            i for i in (self.position(image_id) for image_id in ids) if i is not None
+        )
+        for index in indices:
+            boxes, keypoints = self[index]
+            if min_score > 0:
+                keep = boxes[:, 4] >= min_score
+                boxes, keypoints = boxes[keep], keypoints[keep]
+            yield self.ids[index], boxes, keypoints
+
+    def people(self, min_score=0.0):
+        """
+        所有置信度达到要求的人 (整列向量化过滤，不逐张图像遍历)
+        Returns:
+            image_index: 每个人所属图像的序号 (M,)
+            boxes: (M, 5)
+            keypoints: (M, 17, 3)
+        """
+        rows = np.flatnonzero(self.boxes[:, 4] >= min_score)
+        image_index = np.searchsorted(self.offsets, rows, side="right") - 1
+        return image_index, self.boxes[rows], self.keypoints[rows]
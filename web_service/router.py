@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+CloudPose最少负载路由代理
+位于多个服务副本之前，每个请求用"二选一" (power of two choices) 策略选择后端:
+随机取两个可用后端，选择负载较低的一个。后端负载 = 代理转发给它、尚未完成的请求数
++ 它在最近一次响应头中报告的 X-In-Flight 和 X-Queue-Depth (按半衰期随时间衰减)。
+每个后端保持一个长连接池；连续失败的后端被暂时摘除，恢复就绪后重新加入。
+(WebSocket端点不经过代理，视频流客户端应直接连接服务副本)
+"""
+
+import asyncio
+import logging
+import random
+import subprocess
+import sys
+import time
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
+
+logger = logging.getLogger("router")
+
+# 不应转发的逐跳请求头/响应头
+HOP_BY_HOP = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailers", "transfer-encoding", "upgrade", "host", "content-length",
+}
+
+
+class Backend:
+    """一个服务副本"""
+
+    def __init__(self, url, max_connections=100, load_half_life=2.0):
+        """
+        Args:
+            url: 后端地址，如 http://10.0.0.5:60000
+            max_connections: 到该后端的最大连接数 (长连接池)
+            load_half_life: 报告负载的半衰期(秒)。报告的负载只在该后端被选中时刷新，
+                不衰减时报告过高负载的后端会一直输掉比较、永远得不到刷新的机会
+        """
+        self.url = url.rstrip("/")
+        self.client = httpx.AsyncClient(
+            base_url=self.url,
+            timeout=httpx.Timeout(None, connect=5.0),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+        self.in_flight = 0
+        self.reported_load = 0
+        self.reported_at = 0.0
+        self.load_half_life = load_half_life
+        self.failures = 0
+        self.ejected_until = 0.0
+        self.requests = 0
+        self.errors = 0
+
+    @property
+    def available(self):
+        return time.time() >= self.ejected_until
+
+    @property
+    def load(self):
+        """代理视角的负载估计"""
+        age = max(0.0, time.time() - self.reported_at)
+        return self.in_flight + self.reported_load * 0.5 ** (age / self.load_half_life)
+
+    def update_load(self, headers):
+        """从响应头读取后端报告的负载"""
+        try:
+            self.reported_load = int(headers.get("x-in-flight", 0)) + int(headers.get("x-queue-depth", 0))
+            self.reported_at = time.time()
+        except ValueError:
+            pass
+
+    def status(self):
+        return {
+            "url": self.url,
+            "available": self.available,
+            "in_flight": self.in_flight,
+            "reported_load": self.reported_load,
+            "load": round(self.load, 2),
+            "failures": self.failures,
+            "requests": self.requests,
+            "errors": self.errors,
+        }
+
+
+class Router:
+    """后端选择、失败摘除与恢复"""
+
+    def __init__(self, backends, eject_failures=3, eject_seconds=10.0):
+        """
+        Args:
+            backends: Backend列表
+            eject_failures: 连续失败多少次后摘除后端
+            eject_seconds: 摘除时长(秒)，连续摘除时加倍 (最长5分钟)
+        """
+        self.backends = backends
+        self.eject_failures = eject_failures
+        self.eject_seconds = eject_seconds
+
+    def choose(self, exclude=()):
+        """
+        二选一: 随机取两个可用后端，返回负载较低的一个
+        所有后端都被摘除时退化为在全部后端中选择
+        """
+        candidates = [b for b in self.backends if b.available and b not in exclude]
+        if not candidates:
+            candidates = [b for b in self.backends if b not in exclude] or self.backends
+        if len(candidates) == 1:
+            return candidates[0]
+        first, second = random.sample(candidates, 2)
+        return first if first.load <= second.load else second
+
+    def record_success(self, backend):
+        backend.failures = 0
+
+    def record_failure(self, backend):
+        backend.failures += 1
+        backend.errors += 1
+        if backend.failures >= self.eject_failures:
+            multiplier = 2 ** (backend.failures - self.eject_failures)
+            duration = min(self.eject_seconds * multiplier, 300.0)
+            backend.ejected_until = time.time() + duration
+            logger.warning(f"后端已摘除 {duration:.0f}s: {backend.url} (连续失败 {backend.failures} 次)")
+
+    async def probe(self, interval=2.0):
+        """定期探测被摘除的后端，/ready返回200后立即恢复"""
+        while True:
+            await asyncio.sleep(interval)
+            for backend in self.backends:
+                if backend.available or backend.failures == 0:
+                    continue
+                try:
+                    response = await backend.client.get("/ready", timeout=2.0)
+                    if response.status_code == 200:
+                        backend.failures = 0
+                        backend.ejected_until = 0.0
+                        logger.info(f"后端已恢复: {backend.url}")
+                except httpx.HTTPError:
+                    pass
+
+
+def create_app(router, retries=1):
+    """
+    创建代理应用
+    Args:
+        router: Router实例
+        retries: 连接失败 (请求未到达后端) 时换一个后端重试的次数
+    """
+    app = FastAPI(title="CloudPose Router")
+
+    @app.on_event("startup")
+    async def start_probe():
+        asyncio.create_task(router.probe())
+
+    @app.get("/router/status")
+    async def status():
+        return {"backends": [backend.status() for backend in router.backends]}
+
+    @app.api_route("/{path:path}", methods=["GET", "POST", "PUT", "DELETE"])
+    async def proxy(path: str, request: Request):
+        body = await request.body()
+        headers = {k: v for k, v in request.headers.items() if k.lower() not in HOP_BY_HOP}
+        tried = []
+        for _ in range(retries + 1):
+            backend = router.choose(exclude=tried)
+            tried.append(backend)
+            backend.in_flight += 1
+            backend.requests += 1
+            try:
+                upstream = await backend.client.send(
+                    backend.client.build_request(
+                        request.method, "/" + path, params=request.query_params, headers=headers, content=body
+                    ),
+                    stream=True,
+                )
+            except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+                # 请求没有到达后端，换一个后端重试是安全的
+                backend.in_flight -= 1
+                router.record_failure(backend)
+                logger.warning(f"连接后端失败: {backend.url}, {e}")
+                continue
+            except httpx.HTTPError as e:
+                backend.in_flight -= 1
+                router.record_failure(backend)
+                return JSONResponse({"detail": f"后端请求失败: {e}"}, status_code=502)
+
+            backend.update_load(upstream.headers)
+            if upstream.status_code in (502, 503):
+                router.record_failure(backend)
+            else:
+                router.record_success(backend)
+
+            async def close(upstream=upstream, backend=backend):
+                await upstream.aclose()
+                backend.in_flight -= 1
+
+            response_headers = {k: v for k, v in upstream.headers.items() if k.lower() not in HOP_BY_HOP}
+            response_headers["X-Backend"] = backend.url
+            return StreamingResponse(
+                upstream.aiter_raw(), status_code=upstream.status_code,
+                headers=response_headers, background=BackgroundTask(close),
+            )
+
+        return JSONResponse({"detail": "没有可用的后端"}, status_code=502)
+
+    return app
+
+
+def spawn_local(count, base_port, host="127.0.0.1"):
+    """
+    在本机启动多个服务副本 (uvicorn进程)，用于本地测试
+    Returns:
+        processes: 子进程列表
+        urls: 后端地址列表
+    """
+    processes, urls = [], []
+    for i in range(count):
+        port = base_port + i
+        processes.append(subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--host", host, "--port", str(port)]
+        ))
+        urls.append(f"http://{host}:{port}")
+        logger.info(f"已启动本地服务副本: {urls[-1]}")
+    return processes, urls
+
+
+def main():
+    """命令行入口"""
+    import argparse
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="CloudPose最少负载路由代理")
+    parser.add_argument("--backends", nargs="*", default=[], help="后端地址列表")
+    parser.add_argument("--spawn-local", type=int, default=0, help="在本机启动N个服务副本作为后端")
+    parser.add_argument("--base-port", type=int, default=60001, help="本地服务副本的起始端口")
+    parser.add_argument("--host", default="0.0.0.0", help="代理监听地址")
+    parser.add_argument("--port", type=int, default=60000, help="代理监听端口")
+    parser.add_argument("--max-connections", type=int, default=100, help="到每个后端的最大连接数")
+    parser.add_argument("--eject-failures", type=int, default=3, help="连续失败多少次后摘除后端")
+    parser.add_argument("--eject-seconds", type=float, default=10.0, help="摘除时长(秒)")
+    parser.add_argument("--load-half-life", type=float, default=2.0, help="后端报告负载的半衰期(秒)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(name)s] %(message)s")
+    processes = []
+    urls = list(args.backends)
+    if args.spawn_local:
+        processes, local_urls = spawn_local(args.spawn_local, args.base_port)
+        urls.extend(local_urls)
+    if not urls:
+        print("至少需要一个后端 (--backends 或 --spawn-local)")
+        sys.exit(1)
+
+    router = Router(
+        [Backend(url, args.max_connections, args.load_half_life) for url in urls],
+        eject_failures=args.eject_failures,
+        eject_seconds=args.eject_seconds,
+    )
+    try:
+        uvicorn.run(create_app(router), host=args.host, port=args.port, access_log=False)
+    finally:
+        for process in processes:
+            process.terminate()
+
+
+if __name__ == "__main__":
+    main()
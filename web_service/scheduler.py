@@ -0,0 +1,186 @@
+"""
+推理请求调度
+请求按客户端、请求ID前缀和端点划分为优先级类别，类别之间按权重公平排队 (WFQ)，
+同一类别内按截止时间排序 (最早截止时间优先, EDF)。
+已经过期或肯定无法在截止时间前完成的请求在到达模型之前被丢弃。
+"""
+
+import heapq
+import itertools
+import math
+
+from metrics import metrics
+
+DEFAULT_CLASS = "default"
+
+
+class DeadlineExceeded(Exception):
+    """请求在到达模型之前已过期 (或肯定会过期)"""
+
+    def __init__(self, stage):
+        """
+        Args:
+            stage: 丢弃请求的阶段 ("admission": 入队前, "queue": 排队期间)
+        """
+        super().__init__(f"请求已超过截止时间 ({stage})")
+        self.stage = stage
+
+
+class Waiter:
+    """一个等待检测器副本的请求"""
+
+    __slots__ = ("future", "deadline", "seq", "timer", "priority_class")
+
+    def __init__(self, future, deadline, seq, priority_class=DEFAULT_CLASS):
+        self.future = future
+        self.deadline = deadline
+        self.seq = seq
+        self.timer = None
+        self.priority_class = priority_class
+
+    def sort_key(self):
+        """没有截止时间的请求排在所有有截止时间的请求之后，同截止时间按到达顺序"""
+        return (self.deadline if self.deadline is not None else math.inf, self.seq)
+
+
+class EDFQueue:
+    """按截止时间排序的等待队列"""
+
+    def __init__(self):
+        self._heap = []
+        self._seq = itertools.count()
+
+    def next_seq(self):
+        """分配到达序号"""
+        return next(self._seq)
+
+    def push(self, waiter):
+        """加入等待队列"""
+        heapq.heappush(self._heap, (waiter.sort_key(), waiter))
+
+    def pop(self):
+        """
+        取出截止时间最早、仍在等待的请求
+        Returns:
+            Waiter: 等待者，队列为空时返回None
+        """
+        while self._heap:
+            _, waiter = heapq.heappop(self._heap)
+            if not waiter.future.done():
+                return waiter
+        return None
+
+    def __bool__(self):
+        """是否还有仍在等待的请求 (顺带清理堆顶已结束的等待者)"""
+        while self._heap and self._heap[0][1].future.done():
+            heapq.heappop(self._heap)
+        return bool(self._heap)
+
+    def __len__(self):
+        return sum(1 for _, waiter in self._heap if not waiter.future.done())
+
+
+class WeightedFairQueue:
+    """
+    按类别权重公平排队的等待队列
+    使用步长调度近似WFQ: 每个类别维护一个虚拟时间，每次出队选择虚拟时间最小的
+    非空类别，并将其虚拟时间增加 1/权重。类别在空闲后重新活跃时，虚拟时间
+    追平到全局虚拟时间，避免空闲期间积攒额度后突发占满副本。
+    """
+
+    def __init__(self, weights=None):
+        """
+        Args:
+            weights: {类别: 权重}，未配置的类别权重为1
+        """
+        self.weights = dict(weights or {})
+        self._queues = {}
+        self._pass = {}
+        self._virtual_time = 0.0
+        self._seq = itertools.count()
+
+    def next_seq(self):
+        """分配到达序号"""
+        return next(self._seq)
+
+    def _weight(self, priority_class):
+        return max(self.weights.get(priority_class, 1.0), 1e-6)
+
+    def push(self, waiter):
+        """加入所属类别的等待队列"""
+        priority_class = waiter.priority_class
+        queue = self._queues.get(priority_class)
+        if queue is None:
+            queue = self._queues[priority_class] = EDFQueue()
+        if not queue:
+            self._pass[priority_class] = max(self._pass.get(priority_class, 0.0), self._virtual_time)
+        queue.push(waiter)
+        metrics.set_gauge("cloudpose_queue_depth", len(queue), {"class": priority_class})
+
+    def pop(self):
+        """
+        取出下一个应当获得副本的请求
+        Returns:
+            Waiter: 等待者，队列为空时返回None
+        """
+        while True:
+            active = [c for c, queue in self._queues.items() if queue]
+            if not active:
+                return None
+            priority_class = min(active, key=lambda c: (self._pass[c], c))
+            waiter = self._queues[priority_class].pop()
+            if waiter is None:
+                continue
+            self._virtual_time = self._pass[priority_class]
+            self._pass[priority_class] += 1.0 / self._weight(priority_class)
+            metrics.set_gauge("cloudpose_queue_depth", len(self._queues[priority_class]),
+                              {"class": priority_class})
+            return waiter
+
+    def depths(self):
+        """每个类别的等待请求数"""
+        return {c: len(queue) for c, queue in self._queues.items()}
+
+    def __bool__(self):
+        return any(self._queues.values())
+
+    def __len__(self):
+        return sum(len(queue) for queue in self._queues.values())
+
+
+class PriorityClassifier:
+    """
+    将请求划分到优先级类别
+    匹配顺序: 客户端标识 > 请求ID前缀 > 端点 > 默认类别
+    """
+
+    def __init__(self, default_class=DEFAULT_CLASS, client_classes=None,
+                 id_prefix_classes=None, endpoint_classes=None):
+        """
+        Args:
+            default_class: 未匹配任何规则时的类别
+            client_classes: {客户端标识: 类别}
+            id_prefix_classes: {请求ID前缀: 类别}
+            endpoint_classes: {端点路径: 类别}
+        """
+        self.default_class = default_class
+        self.client_classes = dict(client_classes or {})
+        # 前缀按长度从长到短匹配
+        self.id_prefix_classes = sorted((id_prefix_classes or {}).items(), key=lambda item: -len(item[0]))
+        self.endpoint_classes = dict(endpoint_classes or {})
+
+    def classify(self, endpoint, request_id="", client_key=None):
+        """
+        Args:
+            endpoint: 请求的端点路径
+            request_id: 请求体中的ID字段
+            client_key: 客户端标识 (X-Client-Key请求头)
+        Returns:
+            str: 优先级类别
+        """
+        if client_key and client_key in self.client_classes:
+            return self.client_classes[client_key]
+        for prefix, priority_class in self.id_prefix_classes:
+            if request_id.startswith(prefix):
+                return priority_class
+        return self.endpoint_classes.get(endpoint, self.default_class)
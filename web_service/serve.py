@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+CloudPose 生产环境多进程启动器
+主进程预加载应用和模型后调用gc.freeze()，再fork出N个uvicorn工作进程，
+模型内存以写时复制的方式在工作进程间共享。主进程负责监控工作进程、
+异常退出时重启、收到SIGHUP时滚动重启，并定期报告每个工作进程的内存和吞吐量。
+"""
+
+import gc
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+
+logger = logging.getLogger("serve")
+
+# 当前工作进程在共享计数数组中的下标 (主进程中为None)
+_worker_slot = None
+
+
+def read_memory(pid):
+    """
+    读取进程内存占用
+    Returns:
+        dict: {"rss_mb": 常驻内存, "pss_mb": 按共享比例分摊后的内存} (MB)
+    """
+    memory = {"rss_mb": None, "pss_mb": None}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    memory["rss_mb"] = round(int(line.split()[1]) / 1024, 1)
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    memory["pss_mb"] = round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return memory
+
+
+def create_socket(host, port, backlog):
+    """在主进程中创建监听套接字，所有工作进程共享同一个accept队列"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+class Launcher:
+    """多进程启动器 (主进程)"""
+
+    def __init__(self, args):
+        self.args = args
+        self.workers = {}  # pid -> 工作进程下标
+        self.shutting_down = False
+        self.rolling_restart = False
+        # fork之前创建的共享计数: 每个工作进程的请求数和就绪标志
+        self.request_counts = multiprocessing.RawArray("Q", args.workers)
+        self.ready_flags = multiprocessing.RawArray("b", args.workers)
+        self._last_counts = [0] * args.workers
+        self._last_report = time.time()
+        # 每个工作进程的CPU切片 (未启用绑定时为None)
+        self.partitions = [None] * args.workers
+        if args.pin_cpus:
+            from cpu_affinity import partition_cpus
+
+            self.partitions = partition_cpus(args.workers)
+            for slot, partition in enumerate(self.partitions):
+                logger.info(f"工作进程 {slot} CPU切片: 节点={partition['node']}, CPU={partition['cpus']}")
+
+    def preload(self):
+        """预加载应用和模型，然后冻结GC使这些对象在工作进程中保持共享"""
+        import torch
+
+        # 主进程只用单线程加载，避免在fork之前启动OpenMP线程池
+        torch.set_num_threads(1)
+
+        import main
+
+        install_request_counter(main.app, self.request_counts)
+        if not self.args.no_preload:
+            main.load_detector()
+
+        gc.collect()
+        gc.freeze()
+        logger.info(f"预加载完成，已冻结 {gc.get_freeze_count()} 个对象")
+        self.main = main
+
+    def spawn_worker(self, slot):
+        """fork一个工作进程"""
+        self.ready_flags[slot] = 0
+        pid = os.fork()
+        if pid == 0:
+            run_worker(self.main, self.sock, slot, self.args, self.ready_flags, self.partitions[slot])
+            os._exit(0)
+        self.workers[pid] = slot
+        logger.info(f"工作进程 {slot} 已启动 (pid={pid})")
+        return pid
+
+    def handle_signal(self, signum, frame):
+        """SIGTERM/SIGINT优雅关闭，SIGHUP滚动重启"""
+        if signum == signal.SIGHUP:
+            self.rolling_restart = True
+        else:
+            self.shutting_down = True
+
+    def restart_all(self):
+        """逐个重启工作进程，新进程就绪后再重启下一个，始终保持N-1个进程在服务"""
+        logger.info("开始滚动重启工作进程")
+        for pid, slot in list(self.workers.items()):
+            os.kill(pid, signal.SIGTERM)
+            os.waitpid(pid, 0)
+            del self.workers[pid]
+            self.spawn_worker(slot)
+            deadline = time.time() + self.args.ready_timeout
+            while not self.ready_flags[slot] and time.time() < deadline and not self.shutting_down:
+                time.sleep(0.5)
+        logger.info("滚动重启完成")
+
+    def report(self):
+        """报告每个工作进程的内存占用和吞吐量"""
+        now = time.time()
+        interval = now - self._last_report
+        rows = []
+        for pid, slot in sorted(self.workers.items(), key=lambda item: item[1]):
+            count = self.request_counts[slot]
+            rows.append({
+                "worker": slot,
+                "pid": pid,
+                "ready": bool(self.ready_flags[slot]),
+                "requests": count,
+                "rps": round((count - self._last_counts[slot]) / interval, 2) if interval > 0 else 0.0,
+                "cpus": self.partitions[slot]["cpus"] if self.partitions[slot] else None,
+                **read_memory(pid),
+            })
+            self._last_counts[slot] = count
+        self._last_report = now
+
+        master = {"worker": "master", "pid": os.getpid(), **read_memory(os.getpid())}
+        for row in [master] + rows:
+            logger.info(f"工作进程统计: {row}")
+        if self.args.stats_file:
+            with open(self.args.stats_file, "w") as f:
+                json.dump({"time": now, "master": master, "workers": rows}, f, indent=2)
+        return rows
+
+    def shutdown(self):
+        """优雅关闭: 通知所有工作进程处理完在途请求后退出，超时后强制结束"""
+        logger.info("正在关闭工作进程...")
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.time() + self.args.graceful_timeout
+        while self.workers and time.time() < deadline:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+            if pid:
+                self.workers.pop(pid, None)
+            else:
+                time.sleep(0.1)
+        for pid in list(self.workers):
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        logger.info("所有工作进程已退出")
+
+    def run(self):
+        """启动并监控工作进程"""
+        self.preload()
+        self.sock = create_socket(self.args.host, self.args.port, self.args.backlog)
+        logger.info(f"监听 {self.args.host}:{self.args.port} (backlog={self.args.backlog})")
+
+        for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+            signal.signal(sig, self.handle_signal)
+
+        for slot in range(self.args.workers):
+            self.spawn_worker(slot)
+
+        while not self.shutting_down:
+            if self.rolling_restart:
+                self.rolling_restart = False
+                self.restart_all()
+
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                pid, status = 0, 0
+            if pid and pid in self.workers:
+                slot = self.workers.pop(pid)
+                # 工作进程达到最大请求数或异常退出时重启
+                logger.warning(f"工作进程 {slot} 已退出 (pid={pid}, status={status})，正在重启")
+                self.spawn_worker(slot)
+
+            if self.args.report_interval and time.time() - self._last_report >= self.args.report_interval:
+                self.report()
+            time.sleep(0.5)
+
+        self.shutdown()
+
+
+def install_request_counter(app, request_counts):
+    """注册中间件，统计每个工作进程处理的请求数"""
+    @app.middleware("http")
+    async def count_requests(request, call_next):
+        response = await call_next(request)
+        if _worker_slot is not None:
+            request_counts[_worker_slot] += 1
+        return response
+
+
+def run_worker(main, sock, slot, args, ready_flags, partition=None):
+    """工作进程入口 (fork之后执行)"""
+    global _worker_slot
+    import torch
+    import uvicorn
+
+    _worker_slot = slot
+    for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+        signal.signal(sig, signal.SIG_DFL)
+
+    # 每个工作进程固定自己的推理线程数，避免进程间线程超额订阅；
+    # 启用CPU绑定时线程数等于切片中的CPU数，推理线程创建后只在本切片上运行
+    threads = args.threads_per_worker
+    if partition is not None:
+        from cpu_affinity import pin_worker
+
+        threads = pin_worker(partition)
+    torch.set_num_threads(threads)
+    main.config.POOL_SIZE = args.replicas_per_worker
+    main.config.POOL_THREADS_PER_REPLICA = max(1, threads // args.replicas_per_worker)
+    main.PROCESS_START = time.time()
+
+    def report_ready():
+        while not main.service_state["ready"] and not main.service_state["error"]:
+            time.sleep(0.2)
+        ready_flags[slot] = 1 if main.service_state["ready"] else 0
+
+    threading.Thread(target=report_ready, daemon=True).start()
+
+    config = uvicorn.Config(
+        main.app,
+        timeout_keep_alive=args.keep_alive,
+        backlog=args.backlog,
+        limit_max_requests=args.max_requests or None,
+        log_level=args.log_level,
+        access_log=False,
+    )
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def main():
+    """命令行入口"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="CloudPose生产环境多进程启动器")
+    parser.add_argument("--host", default="0.0.0.0", help="监听地址")
+    parser.add_argument("--port", type=int, default=60000, help="监听端口")
+    parser.add_argument("--workers", type=int, default=2, help="工作进程数")
+    parser.add_argument("--threads-per-worker", type=int, default=0,
+                        help="每个工作进程的推理线程数 (0表示可用CPU数 / 工作进程数)")
+    parser.add_argument("--replicas-per-worker", type=int, default=1, help="每个工作进程的检测器副本数")
+    parser.add_argument("--backlog", type=int, default=2048, help="监听队列长度")
+    parser.add_argument("--keep-alive", type=int, default=75, help="HTTP keep-alive超时(秒)")
+    parser.add_argument("--max-requests", type=int, default=0,
+                        help="工作进程处理多少请求后重启 (0表示不限制)")
+    parser.add_argument("--graceful-timeout", type=int, default=30, help="优雅关闭的超时时间(秒)")
+    parser.add_argument("--ready-timeout", type=int, default=300, help="滚动重启时等待新进程就绪的时间(秒)")
+    parser.add_argument("--pin-cpus", action="store_true",
+                        help="按NUMA节点划分CPU并将每个工作进程绑定到自己的切片")
+    parser.add_argument("--no-preload", action="store_true",
+                        help="不在fork之前预加载模型 (多NUMA节点时可让每个工作进程在本节点内存中加载权重)")
+    parser.add_argument("--report-interval", type=int, default=60, help="统计报告间隔(秒)，0表示不报告")
+    parser.add_argument("--stats-file", help="将统计报告写入JSON文件")
+    parser.add_argument("--log-level", default="info", help="uvicorn日志级别")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(name)s] %(message)s")
+    if args.workers < 1:
+        print("工作进程数至少为1")
+        sys.exit(1)
+    if args.threads_per_worker <= 0:
+        # 所有工作进程的推理线程合计不超过可用CPU数
+        args.threads_per_worker = max(1, len(os.sched_getaffinity(0)) // args.workers)
+
+    Launcher(args).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+共享内存帧传输
+多进程之间通过multiprocessing队列传递解码后的帧时，每个请求都要pickle并复制几MB数据。
+FrameRing把帧写入一块共享内存中的固定大小槽位，只有槽位编号和形状等元数据经过队列传递，
+读取方直接以零拷贝的NumPy视图访问帧，用完后释放槽位。
+
+每个环形缓冲区只有一个写入方 (创建它的进程) 负责分配槽位，读取方可以有多个:
+槽位状态保存在共享内存头部，写入方只分配状态为空闲的槽位，读取方释放时把状态写回空闲。
+批量推理、异步作业和离线处理流水线都可以复用同一个传输层。
+"""
+
+import itertools
+import os
+import struct
+import uuid
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# 头部: 魔数、槽位数、每个槽位的字节数，之后是每个槽位的状态字节
+_HEADER = struct.Struct("<4sQQ")
+_MAGIC = b"CPFR"
+_FREE, _USED = 0, 1
+
+# 默认槽位大小: 640x640的BGR帧
+DEFAULT_SLOT_BYTES = 640 * 640 * 3
+
+
+class RingFull(Exception):
+    """没有空闲槽位 (或帧大于槽位)，调用方应退回到直接传递帧"""
+
+
+def _attach_shared_memory(name):
+    """
+    连接到已有的共享内存，不让本进程的resource_tracker接管它
+    (否则读取方退出时会删除写入方仍在使用的共享内存)
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python 3.13之前没有track参数
+        from multiprocessing import resource_tracker
+
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+class FrameRing:
+    """共享内存中的帧槽位环"""
+
+    def __init__(self, shm, slots, slot_bytes, owner):
+        self.shm = shm
+        self.name = shm.name
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.owner = owner
+        self._data_offset = _align(_HEADER.size + slots)
+        self._state = np.ndarray((slots,), dtype=np.uint8, buffer=shm.buf, offset=_HEADER.size)
+        self._cursor = itertools.cycle(range(slots))
+
+    @classmethod
+    def create(cls, slots=32, slot_bytes=DEFAULT_SLOT_BYTES, name=None):
+        """
+        创建环形缓冲区 (写入方)
+        Args:
+            slots: 槽位数量，应不少于同时在途的帧数
+            slot_bytes: 每个槽位的字节数
+            name: 共享内存名称，默认自动生成
+        """
+        name = name or f"cloudpose-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        size = _align(_HEADER.size + slots) + slots * slot_bytes
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        _HEADER.pack_into(shm.buf, 0, _MAGIC, slots, slot_bytes)
+        shm.buf[_HEADER.size:_HEADER.size + slots] = bytes(slots)
+        return cls(shm, slots, slot_bytes, owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        """连接到已有的环形缓冲区 (读取方)"""
+        shm = _attach_shared_memory(name)
+        magic, slots, slot_bytes = _HEADER.unpack_from(shm.buf, 0)
+        if magic != _MAGIC:
+            shm.close()
+            raise ValueError(f"不是帧环形缓冲区: {name}")
+        return cls(shm, slots, slot_bytes, owner=False)
+
+    def write(self, frame, **meta):
+        """
+        把帧复制到一个空闲槽位
+        Args:
+            frame: NumPy数组
+            meta: 随帧一起传递的元数据
+        Returns:
+            dict: 帧引用 (环名称、槽位编号、形状、数据类型和元数据)，可以放入任意队列
+        Raises:
+            RingFull: 没有空闲槽位或帧大于槽位
+        """
+        if frame.nbytes > self.slot_bytes:
+            raise RingFull(f"帧大小 {frame.nbytes} 超过槽位大小 {self.slot_bytes}")
+        for _ in range(self.slots):
+            slot = next(self._cursor)
+            if self._state[slot] == _FREE:
+                break
+        else:
+            raise RingFull("没有空闲槽位")
+
+        self._state[slot] = _USED
+        view = self._slot_view(slot, frame.shape, frame.dtype)
+        view[...] = frame
+        return {"ring": self.name, "slot": slot, "shape": frame.shape, "dtype": frame.dtype.str, "meta": meta}
+
+    def view(self, ref):
+        """
+        以零拷贝方式访问帧 (在release之前有效)
+        Args:
+            ref: write返回的帧引用
+        Returns:
+            np.ndarray: 指向共享内存的只读视图
+        """
+        view = self._slot_view(ref["slot"], ref["shape"], np.dtype(ref["dtype"]))
+        view.flags.writeable = False
+        return view
+
+    def release(self, ref):
+        """释放帧所在的槽位"""
+        self._state[ref["slot"]] = _FREE
+
+    @property
+    def free_slots(self):
+        return int(np.count_nonzero(self._state == _FREE))
+
+    def _slot_view(self, slot, shape, dtype):
+        offset = self._data_offset + slot * self.slot_bytes
+        return np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=offset)
+
+    def close(self):
+        """断开连接，写入方同时删除共享内存"""
+        self._state = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def _align(offset, alignment=64):
+    """按缓存行对齐"""
+    return (offset + alignment - 1) // alignment * alignment
+
+
+# 读取方已连接的环形缓冲区 {名称: FrameRing}
+_attached = {}
+
+
+def open_frame(ref):
+    """
+    读取方: 按帧引用获得零拷贝视图 (自动连接并缓存对应的环形缓冲区)
+    Returns:
+        ring: 帧所在的环形缓冲区 (处理完后调用 ring.release(ref))
+        frame: 帧的只读视图
+    """
+    ring = _attached.get(ref["ring"])
+    if ring is None:
+        ring = _attached[ref["ring"]] = FrameRing.attach(ref["ring"])
+    return ring, ring.view(ref)
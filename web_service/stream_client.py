@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+视频流测试客户端 - 通过WebSocket逐帧发送视频，统计吞吐量和关键帧比例
+需要安装websockets: pip install websockets
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import time
+
+import cv2
+
+
+def read_frames(source, limit):
+    """
+    读取视频帧
+    Args:
+        source: 视频文件路径或摄像头编号
+        limit: 最多读取的帧数
+    Returns:
+        list: JPEG编码后的base64字符串列表
+    """
+    capture = cv2.VideoCapture(int(source) if source.isdigit() else source)
+    frames = []
+    while len(frames) < limit:
+        ok, frame = capture.read()
+        if not ok:
+            break
+        _, buffer = cv2.imencode('.jpg', frame)
+        frames.append(base64.b64encode(buffer).decode('utf-8'))
+    capture.release()
+    return frames
+
+
+async def stream(url, frames):
+    """逐帧发送并等待结果，返回每帧的响应"""
+    import websockets
+
+    responses = []
+    async with websockets.connect(url, max_size=None) as websocket:
+        for i, image in enumerate(frames):
+            await websocket.send(json.dumps({"id": f"frame-{i}", "image": image}))
+            responses.append(json.loads(await websocket.recv()))
+    return responses
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="CloudPose视频流测试客户端")
+    parser.add_argument("source", help="视频文件路径或摄像头编号")
+    parser.add_argument("--url", default="ws://localhost:60000/api/pose_stream", help="WebSocket端点")
+    parser.add_argument("--keyframe-interval", type=int, default=0, help="关键帧间隔 (0表示使用服务端默认值)")
+    parser.add_argument("--frames", type=int, default=300, help="最多发送的帧数")
+    args = parser.parse_args()
+
+    frames = read_frames(args.source, args.frames)
+    if not frames:
+        print("无法读取视频帧")
+        return
+
+    url = args.url
+    if args.keyframe_interval:
+        url += f"?keyframe_interval={args.keyframe_interval}"
+
+    start = time.time()
+    responses = asyncio.run(stream(url, frames))
+    elapsed = time.time() - start
+
+    errors = [r for r in responses if "error" in r]
+    keyframes = sum(1 for r in responses if r.get("keyframe"))
+    track_ids = {tid for r in responses for tid in r.get("track_ids", [])}
+    print(f"帧数: {len(responses)}, 错误: {len(errors)}")
+    print(f"吞吐量: {len(responses) / elapsed:.2f} 帧/秒")
+    print(f"关键帧: {keyframes} ({keyframes / len(responses) * 100:.1f}%)")
+    print(f"轨迹数: {len(track_ids)}")
+
+
+if __name__ == "__main__":
+    main()
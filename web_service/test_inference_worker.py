@@ -0,0 +1,128 @@
+"""
+推理工作者端到端测试: inproc队列 + 桩检测器，结果经队列和共享内存两种方式往返
+"""
+
+import asyncio
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+
+from inference_worker import InferenceWorker  # noqa: E402
+from shm_transport import FrameRing  # noqa: E402
+from work_queue import QueueBackend, RemoteInference, _LocalQueues  # noqa: E402
+
+# 左上角像素为该值的帧推理失败
+BAD = 255
+
+
+class StubDetector:
+    """把每帧左上角的像素值当作检测结果"""
+
+    def detect_batch(self, frames):
+        if any(frame[0, 0, 0] == BAD for frame in frames):
+            raise ValueError("损坏的帧")
+        return [int(frame[0, 0, 0]) for frame in frames], 0.001, 0.002, 0.0
+
+    def results_to_arrays(self, results):
+        value = results[0]
+        return (
+            np.full((1, 4), value, dtype=np.float32),
+            np.array([value / 255], dtype=np.float32),
+            np.zeros((1, 17, 3), dtype=np.float32),
+        )
+
+
+class FlakyBackend(QueueBackend):
+    """前几次读取任务时抛出异常 (模拟Redis等队列的暂时性故障)"""
+
+    def __init__(self, tasks, results, failures=2):
+        super().__init__(tasks, results)
+        self.failures = failures
+
+    def get_tasks(self, max_items, timeout):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("队列暂时不可用")
+        return super().get_tasks(max_items, timeout)
+
+
+def frame(value):
+    return np.full((48, 64, 3), value, dtype=np.uint8)
+
+
+@pytest.fixture
+def backend():
+    queues = _LocalQueues()
+    return FlakyBackend(queues.tasks, queues.results)
+
+
+@pytest.fixture
+def worker(backend):
+    worker = InferenceWorker(StubDetector(), backend, batch_size=4, poll_timeout=0.05, error_backoff=0.01)
+    thread = worker.start_thread()
+    yield worker
+    worker.stop()
+    thread.join(timeout=5)
+
+
+async def submit(backend, frames, ring=None):
+    remote = RemoteInference(backend, timeout=10, ring=ring)
+    remote.start()
+    return await asyncio.gather(*[remote.infer(f) for f in frames], return_exceptions=True)
+
+
+@pytest.mark.parametrize("shm_slots", [0, 32])
+def test_results_round_trip(backend, worker, shm_slots):
+    ring = FrameRing.create(shm_slots, slot_bytes=48 * 64 * 3) if shm_slots else None
+    sent = []
+    put_task = backend.put_task
+    backend.put_task = lambda task: sent.append(task["frame"] is None) or put_task(task)
+    try:
+        responses = asyncio.run(submit(backend, [frame(i) for i in range(20)], ring))
+
+        for i, response in enumerate(responses):
+            (boxes, scores, keypoints), *_ = response[0]
+            assert boxes[0, 0] == i
+            assert keypoints.shape == (1, 17, 3)
+        # 共享内存方式下队列中只传递槽位引用，推理后槽位全部释放
+        assert all(sent) if ring is not None else not any(sent)
+        if ring is not None:
+            deadline = time.time() + 2
+            while ring.free_slots != ring.slots and time.time() < deadline:
+                time.sleep(0.01)
+            assert ring.free_slots == ring.slots
+    finally:
+        if ring is not None:
+            ring.close()
+
+
+def test_bad_frame_fails_alone_and_worker_keeps_running(backend, worker):
+    frames = [frame(1), frame(BAD), frame(3)]
+    responses = asyncio.run(submit(backend, frames))
+
+    assert isinstance(responses[1], RuntimeError)
+    assert responses[0][0][0][0][0, 0] == 1
+    assert responses[2][0][0][0][0, 0] == 3
+    assert worker.errors == 1
+
+    responses = asyncio.run(submit(backend, [frame(7)]))
+    assert responses[0][0][0][0][0, 0] == 7
+
+
+def test_unreadable_shared_frame_is_reported():
+    queues = _LocalQueues()
+    backend = QueueBackend(queues.tasks, queues.results)
+    worker = InferenceWorker(StubDetector(), backend, poll_timeout=0.05)
+    backend.put_task({
+        "task_id": 0, "frontend": "test", "frame": None, "tiled": False, "deadline": None,
+        "submitted": time.time(),
+        "frame_ref": {"ring": "cloudpose-missing", "slot": 0, "shape": (1, 1, 3), "dtype": "|u1", "meta": {}},
+    })
+
+    assert worker.step() == 1
+    result = backend.get_result("test", timeout=1)
+    assert result["task_id"] == 0
+    assert "共享内存" in result["error"]
@@ -0,0 +1,111 @@
+"""
+近重复结果复用测试: 多索引哈希查找、LRU淘汰、有效期和并发访问
+"""
+
+import random
+import threading
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+
+from near_duplicate import HASH_BITS, NearDuplicateIndex, rescale_arrays  # noqa: E402
+
+
+def flip(value, *positions):
+    for position in positions:
+        value ^= 1 << position
+    return value
+
+
+def test_lookup_returns_nearest_within_distance():
+    index = NearDuplicateIndex(max_distance=6)
+    base = 0x0123456789ABCDEF
+    index.add(flip(base, 1, 2, 3), "far")
+    index.add(flip(base, 40), "near")
+
+    assert index.lookup(base) == (1, "near")
+    assert index.lookup(flip(base, 10, 20, 30, 50, 60, 62, 63)) == (None, None)
+
+
+def test_multi_index_finds_every_hash_within_distance():
+    rng = random.Random(0)
+    index = NearDuplicateIndex(capacity=10000, max_distance=6, chunks=4)
+    stored = [rng.getrandbits(HASH_BITS) for _ in range(500)]
+    for value in stored:
+        index.add(value, value)
+
+    for value in stored[:100]:
+        query = flip(value, *rng.sample(range(HASH_BITS), rng.randint(0, 6)))
+        distance, payload = index.lookup(query)
+        # 与暴力查找的最近距离一致
+        assert distance == min(bin(other ^ query).count("1") for other in stored)
+        assert bin(payload ^ query).count("1") == distance
+
+
+def test_capacity_evicts_least_recently_used():
+    index = NearDuplicateIndex(capacity=2)
+    index.add(0x1, "a")
+    index.add(0xF0F0 << 32, "b")
+    assert index.lookup(0x1) == (0, "a")
+    index.add(0xFFFF << 16, "c")
+
+    assert len(index) == 2
+    assert index.lookup(0xF0F0 << 32) == (None, None)
+    assert index.lookup(0x1) == (0, "a")
+    # 淘汰的条目也从各段的哈希表中清除
+    assert sum(len(ids) for table in index._tables for ids in table.values()) == 2 * index.chunks
+
+
+def test_expired_entries_are_not_returned(monkeypatch):
+    import near_duplicate
+
+    now = [1000.0]
+    monkeypatch.setattr(near_duplicate.time, "time", lambda: now[0])
+    index = NearDuplicateIndex(ttl=10.0)
+    index.add(0x1234, "old")
+    now[0] += 11.0
+
+    assert index.lookup(0x1234) == (None, None)
+
+
+def test_concurrent_lookup_and_eviction():
+    # 流水线模式: 解码线程查找的同时事件循环写入并淘汰
+    index = NearDuplicateIndex(capacity=16, max_distance=6)
+    values = [random.Random(seed).getrandbits(HASH_BITS) for seed in range(64)]
+    errors = []
+
+    def writer():
+        for _ in range(50):
+            for value in values:
+                index.add(value, value)
+
+    def reader():
+        try:
+            for _ in range(50):
+                for value in values:
+                    distance, payload = index.lookup(value)
+                    assert payload is None or bin(payload ^ value).count("1") == distance
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(index) == 16
+
+
+def test_rescale_arrays_scales_coordinates_only():
+    boxes = np.array([[10, 20, 30, 40]], dtype=np.float32)
+    keypoints = np.array([[[10, 20, 0.9]] * 17], dtype=np.float32)
+
+    scaled_boxes, scaled_keypoints = rescale_arrays(boxes, keypoints, (100, 100), (200, 50))
+
+    assert scaled_boxes.tolist() == [[20, 10, 60, 20]]
+    assert scaled_keypoints[0, 0].tolist() == pytest.approx([20, 10, 0.9])
+    assert keypoints[0, 0, 0] == 10
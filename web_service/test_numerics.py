@@ -0,0 +1,92 @@
+"""
+数值选项精度对比测试: 检测数、边界框IoU、置信度和关键点位置分别检查
+"""
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+pytest.importorskip("torch")
+
+from numerics import compare_detections
+
+
+def person(x, y, score=0.9, size=100.0):
+    """一个检测: 边界框、置信度和17个可见关键点"""
+    box = np.array([x, y, x + size, y + 2 * size], dtype=np.float32)
+    keypoints = np.zeros((17, 3), dtype=np.float32)
+    keypoints[:, 0] = x + np.linspace(10, size - 10, 17)
+    keypoints[:, 1] = y + np.linspace(10, 2 * size - 10, 17)
+    keypoints[:, 2] = 0.8
+    return box, score, keypoints
+
+
+def frame(*people):
+    if not people:
+        return np.empty((0, 4), np.float32), np.empty(0, np.float32), np.empty((0, 17, 3), np.float32)
+    boxes, scores, keypoints = zip(*people)
+    return np.stack(boxes), np.array(scores, dtype=np.float32), np.stack(keypoints)
+
+
+BASELINE = [frame(person(0, 0), person(300, 50, 0.7)), frame(person(50, 50))]
+
+
+def test_identical_results_pass():
+    report = compare_detections(BASELINE, BASELINE)
+    assert report["ok"]
+    assert report["detections"] == 3
+    assert report["min_iou"] == 1.0
+
+
+def test_order_of_candidate_detections_does_not_matter():
+    boxes, scores, keypoints = BASELINE[0]
+    swapped = [(boxes[::-1], scores[::-1], keypoints[::-1]), BASELINE[1]]
+    assert compare_detections(BASELINE, swapped)["ok"]
+
+
+def test_shifted_box_fails_iou():
+    # 15像素的平移按整个输出的最大值 (像素坐标) 归一化时察觉不到，按IoU检查则不通过
+    moved = [frame(person(0, 0), person(315, 50, 0.7)), BASELINE[1]]
+    report = compare_detections(BASELINE, moved)
+    assert not report["ok"]
+    assert report["min_iou"] < 0.9
+
+
+def test_confidence_change_fails():
+    boxes, scores, keypoints = BASELINE[1]
+    keypoints = keypoints.copy()
+    keypoints[0, 3, 2] = 0.6
+    report = compare_detections(BASELINE, [BASELINE[0], (boxes, scores, keypoints)])
+    assert not report["ok"]
+    assert report["max_score_err"] == pytest.approx(0.2, abs=1e-4)
+
+
+def test_keypoint_drift_fails():
+    boxes, scores, keypoints = BASELINE[1]
+    keypoints = keypoints.copy()
+    keypoints[0, 5, :2] += 20
+    report = compare_detections(BASELINE, [BASELINE[0], (boxes, scores, keypoints)])
+    assert not report["ok"]
+    assert report["max_keypoint_err"] > 0.05
+
+
+def test_invisible_keypoints_are_not_compared():
+    boxes, scores, keypoints = BASELINE[1]
+    base_keypoints, keypoints = keypoints.copy(), keypoints.copy()
+    # 两边都不可见的关键点: 位置不同 (如被置为0) 不算误差
+    base_keypoints[0, 5] = [0, 0, 0.1]
+    keypoints[0, 5] = [70, 90, 0.1]
+    report = compare_detections([(boxes, scores, base_keypoints)], [(boxes, scores, keypoints)])
+    assert report["ok"]
+
+
+def test_missing_detection_fails():
+    report = compare_detections(BASELINE, [frame(person(0, 0)), BASELINE[1]])
+    assert not report["ok"]
+    assert report["mismatched_frames"] == 1
+
+
+def test_frames_without_people_cannot_confirm():
+    report = compare_detections([frame(), frame()], [frame(), frame()])
+    assert not report["ok"]
+    assert report["detections"] == 0
@@ -0,0 +1,115 @@
+"""
+分阶段流水线测试: 同步/异步阶段、异常传递、阶段重叠和瓶颈统计
+"""
+
+import asyncio
+import threading
+import time
+
+from pipeline import Stage, StagedPipeline
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_context_flows_through_sync_and_async_stages():
+    loop_thread = threading.get_ident()
+
+    def decode(ctx):
+        ctx["decode_thread"] = threading.get_ident()
+        ctx["value"] += 1
+        return ctx
+
+    async def infer(ctx):
+        ctx["infer_thread"] = threading.get_ident()
+        await asyncio.sleep(0)
+        ctx["value"] *= 10
+        return ctx
+
+    async def scenario():
+        pipeline = StagedPipeline([Stage("decode", decode, workers=2), Stage("inference", infer, workers=4)])
+        pipeline.start()
+        return await asyncio.gather(*[pipeline.submit({"value": i}) for i in range(20)])
+
+    results = run(scenario())
+    assert [ctx["value"] for ctx in results] == [(i + 1) * 10 for i in range(20)]
+    # 同步阶段在线程池中执行，异步阶段在事件循环中执行
+    assert all(ctx["decode_thread"] != loop_thread for ctx in results)
+    assert all(ctx["infer_thread"] == loop_thread for ctx in results)
+
+
+def test_stage_error_fails_only_that_request():
+    def check(ctx):
+        if ctx["value"] == 3:
+            raise ValueError("bad request")
+        return ctx
+
+    async def scenario():
+        pipeline = StagedPipeline([Stage("check", check), Stage("encode", lambda ctx: ctx)])
+        pipeline.start()
+        return await asyncio.gather(*[pipeline.submit({"value": i}) for i in range(5)], return_exceptions=True)
+
+    results = run(scenario())
+    assert isinstance(results[3], ValueError)
+    assert [ctx["value"] for i, ctx in enumerate(results) if i != 3] == [0, 1, 2, 4]
+
+
+def test_stages_overlap_across_requests():
+    def slow(ctx):
+        time.sleep(0.05)
+        return ctx
+
+    async def scenario():
+        pipeline = StagedPipeline([Stage("decode", slow), Stage("encode", slow)])
+        pipeline.start()
+        start = time.time()
+        await asyncio.gather(*[pipeline.submit({}) for _ in range(10)])
+        return time.time() - start
+
+    # 两个阶段各1个工作者: 串行需要1.0秒，流水线约 (10 + 1) × 0.05 秒
+    assert run(scenario()) < 0.85
+
+
+def test_status_reports_bottleneck_stage():
+    def fast(ctx):
+        return ctx
+
+    def slow(ctx):
+        time.sleep(0.02)
+        return ctx
+
+    async def scenario():
+        pipeline = StagedPipeline([Stage("decode", fast), Stage("inference", slow)], report_interval=0.1)
+        assert pipeline.stages[0].status()["queue_depth"] == 0
+        pipeline.start()
+        await asyncio.gather(*[pipeline.submit({}) for _ in range(10)])
+        await asyncio.sleep(0.15)
+        return pipeline.status()
+
+    status = run(scenario())
+    assert status["bottleneck"] == "inference"
+    assert [stage["items"] for stage in status["stages"]] == [10, 10]
+
+
+def test_cancelled_request_is_skipped():
+    calls = []
+
+    async def stage(ctx):
+        calls.append(ctx["value"])
+        await asyncio.sleep(0.05)
+        return ctx
+
+    async def scenario():
+        pipeline = StagedPipeline([Stage("inference", stage)])
+        pipeline.start()
+        first = asyncio.ensure_future(pipeline.submit({"value": "first"}))
+        cancelled = asyncio.ensure_future(pipeline.submit({"value": "cancelled"}))
+        await asyncio.sleep(0)
+        # 客户端断开: 排队中的请求被取消后不再执行阶段函数
+        cancelled.cancel()
+        await first
+        await asyncio.sleep(0.1)
+
+    run(scenario())
+    assert calls == ["first"]
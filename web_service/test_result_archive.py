@@ -0,0 +1,86 @@
+"""
+姿态结果归档测试: 写入、内存映射读取、追加和中断恢复
+"""
+
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from result_archive import BOXES_FILE, KEYPOINTS_FILE, ArchiveReader, ArchiveWriter  # noqa: E402
+
+
+def people(count, score):
+    boxes = np.tile(np.array([[0, 0, 10, 20]], dtype=np.float32), (count, 1))
+    keypoints = np.full((count, 17, 3), score, dtype=np.float32)
+    return boxes, np.full(count, score, dtype=np.float32), keypoints
+
+
+def test_round_trip_and_filters(tmp_path):
+    with ArchiveWriter(str(tmp_path), flush_rows=2) as writer:
+        writer.append("a", *people(2, 0.9))
+        writer.append("empty", *people(0, 0.0))
+        writer.append("b", *people(1, 0.3))
+
+    reader = ArchiveReader(str(tmp_path))
+    assert len(reader) == 3
+    assert reader.ids == ["a", "empty", "b"]
+
+    boxes, keypoints = reader.get("a")
+    assert boxes.shape == (2, 5) and keypoints.shape == (2, 17, 3)
+    assert boxes[0].tolist() == pytest.approx([0, 0, 10, 20, 0.9])
+    assert len(reader.get("empty")[0]) == 0
+    assert reader.get("missing") is None
+
+    filtered = {image_id: len(boxes) for image_id, boxes, _ in reader.filter(min_score=0.5)}
+    assert filtered == {"a": 2, "empty": 0, "b": 0}
+    assert [image_id for image_id, _, _ in reader.filter(ids=["b", "missing"])] == ["b"]
+
+    image_index, boxes, keypoints = reader.people(min_score=0.5)
+    assert image_index.tolist() == [0, 0]
+    assert keypoints.shape == (2, 17, 3)
+
+
+def test_append_response_converts_api_format(tmp_path):
+    response = {
+        "id": "req-1",
+        "boxes": [{"x": 5, "y": 6, "width": 10, "height": 20, "probability": 0.8}],
+        "keypoints": [[[1, 2, 0.5]] * 17],
+    }
+    with ArchiveWriter(str(tmp_path)) as writer:
+        writer.append_response(response)
+
+    boxes, keypoints = ArchiveReader(str(tmp_path)).get("req-1")
+    assert boxes[0].tolist() == pytest.approx([5, 6, 15, 26, 0.8])
+    assert keypoints[0, 0].tolist() == pytest.approx([1, 2, 0.5])
+
+
+def test_reopen_appends_and_drops_uncommitted_data(tmp_path):
+    with ArchiveWriter(str(tmp_path)) as writer:
+        writer.append("a", *people(1, 0.9))
+
+    # 模拟写入中途被中断: 数据文件多出未提交的行
+    with open(os.path.join(tmp_path, KEYPOINTS_FILE), "ab") as f:
+        f.write(b"\0" * 17 * 3 * 4)
+    with open(os.path.join(tmp_path, BOXES_FILE), "ab") as f:
+        f.write(b"\0" * 5 * 4)
+
+    with ArchiveWriter(str(tmp_path)) as writer:
+        assert writer.images == 1
+        writer.append("b", *people(3, 0.7))
+
+    reader = ArchiveReader(str(tmp_path))
+    assert reader.ids == ["a", "b"]
+    assert reader.offsets.tolist() == [0, 1, 4]
+    assert reader.get("b")[0][:, 4].tolist() == pytest.approx([0.7] * 3)
+    assert os.path.getsize(os.path.join(tmp_path, BOXES_FILE)) == 4 * 5 * 4
+
+
+def test_empty_archive_is_readable(tmp_path):
+    ArchiveWriter(str(tmp_path)).close()
+
+    reader = ArchiveReader(str(tmp_path))
+    assert len(reader) == 0
+    assert list(reader.filter()) == []
+    assert reader.people()[1].shape == (0, 5)
@@ -0,0 +1,87 @@
+"""
+路由代理测试: 二选一负载选择、失败摘除与退避
+"""
+
+import time
+
+import pytest
+
+pytest.importorskip("httpx")
+pytest.importorskip("fastapi")
+
+from router import Backend, Router  # noqa: E402
+
+
+def make_backends(*loads):
+    backends = []
+    for i, load in enumerate(loads):
+        backend = Backend(f"http://10.0.0.{i}:60000/")
+        backend.in_flight = load
+        backends.append(backend)
+    return backends
+
+
+def test_choose_prefers_less_loaded_of_two():
+    busy, idle = make_backends(5, 1)
+    router = Router([busy, idle])
+
+    assert all(router.choose() is idle for _ in range(20))
+
+
+def test_choose_skips_ejected_and_excluded_backends():
+    a, b, c = make_backends(0, 3, 4)
+    router = Router([a, b, c])
+    a.ejected_until = time.time() + 60
+
+    assert {router.choose() for _ in range(20)} <= {b, c}
+    assert router.choose(exclude=[b]) is c
+    # 全部被摘除时退化为在全部后端中选择，而不是拒绝请求
+    b.ejected_until = c.ejected_until = time.time() + 60
+    assert router.choose(exclude=[a, b]) is c
+
+
+def test_consecutive_failures_eject_with_backoff():
+    (backend,) = make_backends(0)
+    router = Router([backend], eject_failures=2, eject_seconds=10.0)
+
+    router.record_failure(backend)
+    assert backend.available
+    router.record_failure(backend)
+    assert 9 < backend.ejected_until - time.time() <= 10
+    router.record_failure(backend)
+    assert 19 < backend.ejected_until - time.time() <= 20
+
+    router.record_success(backend)
+    assert backend.failures == 0
+    assert backend.errors == 3
+
+
+def test_reported_load_from_headers():
+    (backend,) = make_backends(2)
+    backend.update_load({"x-in-flight": "3", "x-queue-depth": "4"})
+    assert backend.load == pytest.approx(9, abs=0.01)
+
+    backend.update_load({"x-in-flight": "abc"})
+    assert backend.load == pytest.approx(9, abs=0.01)
+    assert backend.url == "http://10.0.0.0:60000"
+
+
+def test_stale_high_load_decays_so_backend_is_chosen_again():
+    recovered, other = make_backends(0, 0)
+    recovered.load_half_life = other.load_half_life = 1.0
+    router = Router([recovered, other])
+    # 曾经报告高负载的后端: 只要不被选中，报告的负载就不会刷新
+    recovered.update_load({"x-in-flight": "50"})
+    other.update_load({"x-in-flight": "2"})
+    assert all(router.choose() is other for _ in range(20))
+
+    # 10秒 (10个半衰期) 之后过时的报告衰减到低于另一个后端当前的负载
+    recovered.reported_at -= 10
+    other.reported_at = time.time()
+    assert recovered.load < 0.1
+    assert all(router.choose() is recovered for _ in range(20))
+
+    # 被选中后响应头报告的负载已经下降
+    recovered.update_load({"x-in-flight": "1"})
+    assert recovered.load == pytest.approx(1, abs=0.01)
+    assert all(router.choose() is recovered for _ in range(20))
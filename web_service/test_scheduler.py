@@ -0,0 +1,144 @@
+"""
+调度测试: 最早截止时间优先 (EDF)、副本池的过期丢弃、按权重公平排队 (WFQ) 和优先级分类
+"""
+
+import asyncio
+import time
+from concurrent.futures import Future
+
+import pytest
+
+from model_pool import DetectorPool
+from scheduler import DeadlineExceeded, EDFQueue, PriorityClassifier, Waiter, WeightedFairQueue
+
+
+def make_waiter(queue, deadline, priority_class="default"):
+    return Waiter(Future(), deadline, queue.next_seq(), priority_class)
+
+
+def drain(queue):
+    order = []
+    while True:
+        waiter = queue.pop()
+        if waiter is None:
+            return order
+        order.append(waiter)
+
+
+def test_edf_orders_by_deadline_then_arrival():
+    queue = EDFQueue()
+    late = make_waiter(queue, 30.0)
+    none = make_waiter(queue, None)
+    early = make_waiter(queue, 10.0)
+    tie_first = make_waiter(queue, 20.0)
+    tie_second = make_waiter(queue, 20.0)
+    for waiter in (late, none, early, tie_first, tie_second):
+        queue.push(waiter)
+
+    # 没有截止时间的请求排在最后，同截止时间按到达顺序
+    assert drain(queue) == [early, tie_first, tie_second, late, none]
+
+
+def test_edf_skips_finished_waiters():
+    queue = EDFQueue()
+    cancelled = make_waiter(queue, 1.0)
+    waiting = make_waiter(queue, 2.0)
+    queue.push(cancelled)
+    queue.push(waiting)
+    cancelled.future.cancel()
+
+    assert len(queue) == 1
+    assert queue.pop() is waiting
+    assert not queue
+
+
+def test_pool_hands_replica_to_earliest_deadline():
+    async def scenario():
+        pool = DetectorPool(["replica"])
+        held = await pool.acquire()
+        now = time.time()
+        late = asyncio.ensure_future(pool.acquire(deadline=now + 60))
+        early = asyncio.ensure_future(pool.acquire(deadline=now + 30))
+        await asyncio.sleep(0)
+
+        pool.release(held)
+        assert await early == "replica"
+        assert not late.done()
+        pool.release("replica")
+        assert await late == "replica"
+
+    asyncio.run(scenario())
+
+
+def test_pool_rejects_doomed_requests():
+    async def scenario():
+        pool = DetectorPool(["replica"], service_time_factor=1.0)
+        pool.service_time = 10.0
+        # 剩余时间小于平均推理时间的请求在入队前就被丢弃
+        with pytest.raises(DeadlineExceeded) as error:
+            await pool.acquire(deadline=time.time() + 1.0)
+        assert error.value.stage == "admission"
+
+        held = await pool.acquire()
+        pool.service_time = 0.0
+        waiter = asyncio.ensure_future(pool.acquire(deadline=time.time() + 0.05))
+        # 排队期间到达截止时间的请求直接失败，不再等待副本
+        with pytest.raises(DeadlineExceeded) as error:
+            await waiter
+        assert error.value.stage == "queue"
+        pool.release(held)
+        assert pool.in_use == 0
+
+    asyncio.run(scenario())
+
+
+def test_wfq_serves_classes_in_proportion_to_weight():
+    queue = WeightedFairQueue({"interactive": 3, "bulk": 1})
+    for _ in range(40):
+        queue.push(make_waiter(queue, None, "interactive"))
+        queue.push(make_waiter(queue, None, "bulk"))
+
+    served = [waiter.priority_class for waiter in drain(queue)[:40]]
+    assert served.count("interactive") == 30
+    assert served.count("bulk") == 10
+
+
+def test_wfq_keeps_edf_within_class():
+    queue = WeightedFairQueue()
+    late = make_waiter(queue, 20.0, "bulk")
+    early = make_waiter(queue, 10.0, "bulk")
+    queue.push(late)
+    queue.push(early)
+
+    assert drain(queue) == [early, late]
+
+
+def test_wfq_idle_class_does_not_bank_credit():
+    queue = WeightedFairQueue()
+    for _ in range(10):
+        queue.push(make_waiter(queue, None, "bulk"))
+    for _ in range(10):
+        queue.pop()
+
+    # 空闲后重新活跃的类别从当前虚拟时间开始，不会一次占满接下来的所有出队
+    for _ in range(10):
+        queue.push(make_waiter(queue, None, "interactive"))
+        queue.push(make_waiter(queue, None, "bulk"))
+    served = [queue.pop().priority_class for _ in range(10)]
+    assert served.count("interactive") == 5
+    assert queue.depths() == {"bulk": 5, "interactive": 5}
+
+
+def test_classifier_precedence():
+    classifier = PriorityClassifier(
+        default_class="default",
+        client_classes={"key-1": "interactive"},
+        id_prefix_classes={"batch": "bulk", "batch-vip": "interactive"},
+        endpoint_classes={"/api/pose_image": "bulk"},
+    )
+
+    assert classifier.classify("/api/pose_image", "batch-1", "key-1") == "interactive"
+    assert classifier.classify("/api/pose", "batch-vip-7") == "interactive"
+    assert classifier.classify("/api/pose", "batch-7") == "bulk"
+    assert classifier.classify("/api/pose_image", "x") == "bulk"
+    assert classifier.classify("/api/pose", "x") == "default"
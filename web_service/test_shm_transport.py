@@ -0,0 +1,63 @@
+"""
+共享内存帧传输测试: 写入、零拷贝读取、槽位分配与释放
+"""
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from shm_transport import FrameRing, RingFull, open_frame  # noqa: E402
+
+
+@pytest.fixture
+def ring():
+    ring = FrameRing.create(slots=2, slot_bytes=4 * 4 * 3)
+    yield ring
+    ring.close()
+
+
+def frame(value):
+    return np.full((4, 4, 3), value, dtype=np.uint8)
+
+
+def test_frame_round_trips_through_attached_ring(ring):
+    ref = ring.write(frame(7), image_id="a")
+    reader = FrameRing.attach(ring.name)
+    try:
+        view = reader.view(ref)
+        assert view.shape == (4, 4, 3)
+        assert (view == 7).all()
+        assert ref["meta"] == {"image_id": "a"}
+        # 读取方得到的是只读视图
+        with pytest.raises(ValueError):
+            view[0, 0, 0] = 1
+    finally:
+        del view
+        reader.close()
+
+
+def test_full_ring_and_oversized_frames_raise(ring):
+    first = ring.write(frame(1))
+    ring.write(frame(2))
+    assert ring.free_slots == 0
+    with pytest.raises(RingFull):
+        ring.write(frame(3))
+
+    ring.release(first)
+    assert ring.free_slots == 1
+    ref = ring.write(frame(4))
+    assert ref["slot"] == first["slot"]
+
+    with pytest.raises(RingFull):
+        ring.write(np.zeros((8, 8, 3), dtype=np.uint8))
+
+
+def test_open_frame_releases_slot_for_writer(ring):
+    ref = ring.write(np.arange(48, dtype=np.uint8).reshape(4, 4, 3))
+    reader, view = open_frame(ref)
+
+    assert view.tolist() == np.arange(48).reshape(4, 4, 3).tolist()
+    assert open_frame(ref)[0] is reader
+    del view
+    reader.release(ref)
+    assert ring.free_slots == ring.slots
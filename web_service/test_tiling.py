@@ -0,0 +1,72 @@
+"""
+分块推理测试: 分块网格、接缝判断和NMS合并
+"""
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from tiling import nms, offset_detections, seam_mask, tile_grid  # noqa: E402
+
+# 被前面的人部分遮挡的人: 边界框完全落在前者框内，IoU很低
+FRONT = [100, 100, 300, 500]
+OCCLUDED = [200, 250, 290, 480]
+
+
+def test_tile_grid_covers_image_and_aligns_last_tile():
+    tiles = tile_grid(1500, 700, tile_size=640, overlap=0.2)
+
+    assert tiles[0] == (0, 0, 640, 640)
+    assert max(x1 for _, _, x1, _ in tiles) == 1500
+    assert max(y1 for _, _, _, y1 in tiles) == 700
+    assert all(x1 - x0 == 640 and y1 - y0 == 640 for x0, y0, x1, y1 in tiles)
+
+
+def test_offset_keeps_invisible_keypoints_at_origin():
+    boxes = np.array([[10, 20, 110, 220]], dtype=np.float32)
+    keypoints = np.array([[[50, 60, 0.9], [0, 0, 0.2], [0, 30, 0.7]]], dtype=np.float32)
+
+    boxes, keypoints = offset_detections(boxes, keypoints, 512, 440)
+
+    assert boxes.tolist() == [[522, 460, 622, 660]]
+    # 不可见的关键点 (坐标为0) 与整图推理一样保持 (0, 0)，而不是移到分块原点
+    assert keypoints[0, :, :2].tolist() == [[562, 500], [0, 0], [512, 470]]
+    assert keypoints[0, :, 2].tolist() == pytest.approx([0.9, 0.2, 0.7])
+
+
+def test_seam_mask_ignores_image_border():
+    tiles = np.array([[0, 0, 640, 640]] * 3)
+    boxes = np.array([
+        [500, 100, 640, 300],  # 贴在右侧接缝
+        [0, 100, 200, 300],  # 贴在图像左边缘，不是接缝
+        [100, 100, 300, 300],  # 不贴边
+    ])
+
+    assert seam_mask(boxes, tiles, width=1200, height=640).tolist() == [True, False, False]
+
+
+def test_iou_duplicates_are_suppressed():
+    boxes = np.array([FRONT, [105, 100, 305, 505]], dtype=np.float32)
+    scores = np.array([0.9, 0.8])
+
+    assert nms(boxes, scores).tolist() == [0]
+
+
+def test_occluded_person_in_same_tile_is_kept():
+    boxes = np.array([FRONT, OCCLUDED], dtype=np.float32)
+    scores = np.array([0.9, 0.8])
+    tile_index = np.array([0, 0])
+    at_seam = np.array([False, True])
+
+    assert nms(boxes, scores, tile_index=tile_index, at_seam=at_seam).tolist() == [0, 1]
+    assert nms(boxes, scores).tolist() == [0, 1]
+
+
+def test_partial_detection_across_seam_is_suppressed():
+    boxes = np.array([FRONT, OCCLUDED], dtype=np.float32)
+    scores = np.array([0.9, 0.8])
+    tile_index = np.array([0, 1])
+
+    assert nms(boxes, scores, tile_index=tile_index, at_seam=np.array([False, True])).tolist() == [0]
+    # 来自不同分块但都不贴接缝: 是两个人，不按包含比例抑制
+    assert nms(boxes, scores, tile_index=tile_index, at_seam=np.array([False, False])).tolist() == [0, 1]
@@ -0,0 +1,131 @@
+"""
+视频流跟踪测试: 轨迹ID匹配、关键帧触发条件和光流的前后向校验 (合成图像)
+"""
+
+import pytest
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+
+from tracking import StreamSession, box_iou  # noqa: E402
+
+
+def texture(seed=0, size=(240, 320)):
+    """带纹理的合成帧 (模糊后的噪声，光流可以稳定跟踪)"""
+    rng = np.random.default_rng(seed)
+    gray = rng.integers(0, 256, size).astype(np.uint8)
+    gray = cv2.GaussianBlur(gray, (0, 0), 2)
+    gray = cv2.normalize(gray, None, 0, 255, cv2.NORM_MINMAX)
+    return cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
+
+
+def shifted(image, dx, dy):
+    """整体平移的帧 (模拟镜头或人物的小幅移动)"""
+    return np.roll(image, (dy, dx), axis=(0, 1))
+
+
+def detections(*boxes, visible=True):
+    """由边界框生成检测: 每个人的17个关键点均匀分布在框内部"""
+    boxes = np.array(boxes, dtype=np.float32)
+    keypoints = np.zeros((len(boxes), 17, 3), dtype=np.float32)
+    for i, (x1, y1, x2, y2) in enumerate(boxes):
+        keypoints[i, :, 0] = np.linspace(x1 + 10, x2 - 10, 17)
+        keypoints[i, :, 1] = np.linspace(y1 + 10, y2 - 10, 17)
+        keypoints[i, :, 2] = 0.9 if visible else 0.1
+    return boxes, np.full(len(boxes), 0.9, dtype=np.float32), keypoints
+
+
+def test_box_iou():
+    a = np.array([[0, 0, 10, 10]], dtype=np.float32)
+    b = np.array([[0, 0, 10, 10], [5, 0, 15, 10], [20, 20, 30, 30]], dtype=np.float32)
+
+    assert box_iou(a, b)[0].tolist() == pytest.approx([1.0, 1 / 3, 0.0])
+
+
+def test_track_ids_persist_across_keyframes():
+    session = StreamSession(match_iou=0.3)
+    frame = texture()
+    session.update_keyframe(frame, *detections([40, 40, 100, 200], [200, 40, 260, 200]))
+    assert [t.track_id for t in session.tracks] == [1, 2]
+
+    # 检测顺序变化、位置略有移动，另有一个新出现的人
+    session.update_keyframe(frame, *detections([205, 45, 265, 205], [150, 20, 190, 100], [42, 38, 102, 198]))
+    assert [t.track_id for t in session.tracks] == [2, 3, 1]
+
+    # 离开画面的人的ID不再复用
+    session.update_keyframe(frame, *detections([40, 40, 100, 200], [150, 20, 190, 100]))
+    session.update_keyframe(frame, *detections([40, 40, 100, 200], [150, 20, 190, 100], [205, 45, 265, 205]))
+    assert [t.track_id for t in session.tracks] == [1, 3, 4]
+    assert session.keyframes == 4
+
+
+def test_greedy_match_prefers_highest_iou():
+    session = StreamSession(match_iou=0.3)
+    frame = texture()
+    session.update_keyframe(frame, *detections([0, 0, 100, 100], [40, 0, 140, 100]))
+
+    # 新检测与两条轨迹都重叠，分配给IoU更高的轨迹2，另一条轨迹没有匹配
+    session.update_keyframe(frame, *detections([35, 0, 135, 100]))
+    assert [t.track_id for t in session.tracks] == [2]
+
+
+def test_first_frame_and_keyframe_interval():
+    session = StreamSession(keyframe_interval=3)
+    frame = texture()
+    assert session.needs_keyframe(frame)
+
+    session.update_keyframe(frame, *detections([40, 40, 100, 200]))
+    assert not session.needs_keyframe(frame)
+    assert session.propagate(frame)
+    assert not session.needs_keyframe(frame)
+    assert session.propagate(frame)
+    # 距离上一个关键帧已有3帧
+    assert session.needs_keyframe(frame)
+
+
+def test_scene_change_triggers_keyframe():
+    session = StreamSession(keyframe_interval=100, scene_change_threshold=0.25)
+    frame = texture()
+    session.update_keyframe(frame, *detections([40, 40, 100, 200]))
+
+    assert not session.needs_keyframe(shifted(frame, 2, 1))
+    # 画面变黑 (如镜头切换)
+    assert session.needs_keyframe(np.zeros_like(frame))
+    # 分辨率变化同样视为画面突变
+    assert session.needs_keyframe(cv2.resize(frame, (160, 120)))
+
+
+def test_propagate_follows_motion():
+    session = StreamSession(keyframe_interval=100)
+    frame = texture()
+    boxes, scores, keypoints = detections([80, 60, 160, 200])
+    session.update_keyframe(frame, boxes, scores, keypoints)
+
+    assert session.propagate(shifted(frame, 3, 2))
+    track = session.tracks[0]
+    assert track.keypoints[:, :2] - keypoints[0, :, :2] == pytest.approx(np.tile([3, 2], (17, 1)), abs=0.5)
+    assert track.box == pytest.approx(boxes[0] + [3, 2, 3, 2], abs=0.5)
+    assert session.frames == 2
+
+
+def test_invisible_keypoints_are_not_tracked():
+    session = StreamSession(keyframe_interval=100)
+    frame = texture()
+    boxes, scores, keypoints = detections([80, 60, 160, 200], visible=False)
+    session.update_keyframe(frame, boxes, scores, keypoints)
+
+    # 没有可见关键点时不运行光流，轨迹保持不变
+    assert session.propagate(shifted(frame, 3, 2))
+    assert session.tracks[0].keypoints.tolist() == keypoints[0].tolist()
+
+
+def test_forward_backward_check_rejects_unrelated_frame():
+    session = StreamSession(keyframe_interval=100, min_track_ratio=0.5)
+    frame = texture(seed=0)
+    boxes, scores, keypoints = detections([80, 60, 160, 200])
+    session.update_keyframe(frame, boxes, scores, keypoints)
+
+    # 内容完全不同的帧: 反向光流回不到原来的位置，跟踪不可靠，应对该帧运行完整推理
+    assert not session.propagate(texture(seed=1))
+    assert session.tracks[0].keypoints.tolist() == keypoints[0].tolist()
+    assert session.frames == 1
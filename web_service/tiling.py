@@ -0,0 +1,125 @@
+"""
+分块推理
+将大尺寸图像切分为相互重叠的正方形分块，作为一个批次推理后把各分块的检测结果
+平移回原图坐标，再用NMS合并分块接缝处的重复检测。
+与把整张图像缩放到一个很大的imgsz相比，分块推理对小目标的召回率更高，
+且耗时与分块数量成正比、可以按批处理。
+"""
+
+import numpy as np
+
+
+def tile_positions(length, tile_size, stride):
+    """
+    计算一个维度上各分块的起点，最后一个分块与图像边缘对齐
+    Args:
+        length: 图像在该维度的长度
+        tile_size: 分块边长
+        stride: 相邻分块的步长
+    Returns:
+        list: 分块起点列表
+    """
+    if length <= tile_size:
+        return [0]
+    positions = list(range(0, length - tile_size + 1, stride))
+    if positions[-1] != length - tile_size:
+        positions.append(length - tile_size)
+    return positions
+
+
+def tile_grid(width, height, tile_size=640, overlap=0.2):
+    """
+    计算覆盖整张图像的分块网格
+    Args:
+        width: 图像宽度
+        height: 图像高度
+        tile_size: 分块边长
+        overlap: 相邻分块的重叠比例
+    Returns:
+        list: 分块 [(x0, y0, x1, y1), ...]
+    """
+    stride = max(1, int(tile_size * (1 - overlap)))
+    return [
+        (x, y, min(x + tile_size, width), min(y + tile_size, height))
+        for y in tile_positions(height, tile_size, stride)
+        for x in tile_positions(width, tile_size, stride)
+    ]
+
+
+def offset_detections(boxes, keypoints, x, y):
+    """
+    将分块坐标系下的边界框 (N, 4) 和关键点 (N, K, 3) 平移回原图坐标
+    Ultralytics把置信度低于0.5的关键点坐标置为 (0, 0) 表示不可见，这些关键点保持 (0, 0)，与整图推理的输出一致
+    """
+    boxes = boxes.copy()
+    keypoints = keypoints.copy()
+    boxes[:, [0, 2]] += x
+    boxes[:, [1, 3]] += y
+    visible = (keypoints[:, :, 0] != 0) | (keypoints[:, :, 1] != 0)
+    keypoints[:, :, 0] += np.where(visible, x, 0)
+    keypoints[:, :, 1] += np.where(visible, y, 0)
+    return boxes, keypoints
+
+
+def seam_mask(boxes, tiles, width, height, margin=2.0):
+    """
+    判断每个检测框是否贴在所属分块的接缝上 (分块边缘中不是图像边缘的部分)
+    被接缝切断的人在该分块中的边界框会被裁剪到分块边缘
+    Args:
+        boxes: 原图坐标的边界框 (N, 4)
+        tiles: 每个检测所属的分块 (N, 4)，格式为 x0, y0, x1, y1
+        width: 图像宽度
+        height: 图像高度
+        margin: 距分块边缘不超过该像素数时视为贴边
+    Returns:
+        np.ndarray: (N,) 布尔数组
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    tiles = np.asarray(tiles, dtype=np.float64).reshape(-1, 4)
+    return (
+        ((tiles[:, 0] > 0) & (boxes[:, 0] - tiles[:, 0] <= margin))
+        | ((tiles[:, 1] > 0) & (boxes[:, 1] - tiles[:, 1] <= margin))
+        | ((tiles[:, 2] < width) & (tiles[:, 2] - boxes[:, 2] <= margin))
+        | ((tiles[:, 3] < height) & (tiles[:, 3] - boxes[:, 3] <= margin))
+    )
+
+
+def nms(boxes, scores, iou_threshold=0.5, containment_threshold=0.8, tile_index=None, at_seam=None):
+    """
+    非极大值抑制
+    被接缝切断的人在相邻分块中只剩一部分，其边界框几乎完全落在完整检测框内，但IoU可能很低，
+    因此来自不同分块、且至少一方贴在分块接缝上的两个检测额外按包含比例 (交集 / 较小框面积) 抑制。
+    同一分块内只按IoU抑制: 人群中被前面的人部分遮挡的人，边界框大部分落在前者框内，但并不是重复检测
+    Args:
+        boxes: 边界框 (N, 4)，格式为 x1, y1, x2, y2
+        scores: 置信度 (N,)
+        iou_threshold: IoU阈值
+        containment_threshold: 包含比例阈值
+        tile_index: 每个检测所属分块的序号 (N,)，为None时只按IoU抑制
+        at_seam: 每个检测是否贴在分块接缝上 (N,)，见seam_mask
+    Returns:
+        np.ndarray: 保留的检测下标 (按置信度降序)
+    """
+    if len(boxes) == 0:
+        return np.empty(0, dtype=np.int64)
+
+    areas = np.maximum(boxes[:, 2] - boxes[:, 0], 0) * np.maximum(boxes[:, 3] - boxes[:, 1], 0)
+    order = np.argsort(-scores)
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        x1 = np.maximum(boxes[i, 0], boxes[rest, 0])
+        y1 = np.maximum(boxes[i, 1], boxes[rest, 1])
+        x2 = np.minimum(boxes[i, 2], boxes[rest, 2])
+        y2 = np.minimum(boxes[i, 3], boxes[rest, 3])
+        intersection = np.maximum(x2 - x1, 0) * np.maximum(y2 - y1, 0)
+        iou = intersection / np.maximum(areas[i] + areas[rest] - intersection, 1e-9)
+        suppress = iou > iou_threshold
+        if tile_index is not None:
+            containment = intersection / np.maximum(np.minimum(areas[i], areas[rest]), 1e-9)
+            across_seam = (tile_index[rest] != tile_index[i]) & (at_seam[rest] | at_seam[i])
+            suppress |= across_seam & (containment > containment_threshold)
+        order = rest[~suppress]
+    return np.array(keep, dtype=np.int64)
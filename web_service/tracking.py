@@ -0,0 +1,200 @@
+"""
+视频流会话与关键点跟踪
+视频流中只有关键帧运行完整的YOLO推理，中间帧用稀疏光流 (Lucas-Kanade) 将上一帧的
+关键点传播到当前帧。出现以下情况时下一帧重新作为关键帧:
+1. 距离上一个关键帧已达到关键帧间隔
+2. 画面突变 (相邻帧缩略图的平均像素差超过阈值)
+3. 跟踪置信度过低 (光流成功跟踪的可见关键点比例过低)
+关键帧的检测结果按IoU与已有轨迹匹配，同一个人在整个会话中保持相同的轨迹ID。
+"""
+
+import itertools
+
+import cv2
+import numpy as np
+
+# Lucas-Kanade光流参数
+LK_PARAMS = dict(
+    winSize=(21, 21),
+    maxLevel=3,
+    criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 30, 0.01),
+)
+
+# 置信度高于该值的关键点才参与光流跟踪
+VISIBLE_THRESHOLD = 0.3
+
+
+def box_iou(a, b):
+    """
+    计算两组边界框的IoU矩阵
+    Args:
+        a: 边界框 (N, 4)，格式为 x1, y1, x2, y2
+        b: 边界框 (M, 4)
+    Returns:
+        np.ndarray: IoU矩阵 (N, M)
+    """
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    intersection = np.maximum(x2 - x1, 0) * np.maximum(y2 - y1, 0)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return intersection / np.maximum(area_a[:, None] + area_b[None, :] - intersection, 1e-9)
+
+
+class Track:
+    """一个被跟踪的人"""
+
+    __slots__ = ("track_id", "box", "score", "keypoints")
+
+    def __init__(self, track_id, box, score, keypoints):
+        self.track_id = track_id
+        self.box = box
+        self.score = score
+        self.keypoints = keypoints
+
+
+class StreamSession:
+    """一个视频流会话的跟踪状态"""
+
+    def __init__(self, keyframe_interval=10, scene_change_threshold=0.25,
+                 min_track_ratio=0.5, match_iou=0.3):
+        """
+        Args:
+            keyframe_interval: 关键帧间隔 (每隔多少帧运行一次完整推理)
+            scene_change_threshold: 画面突变阈值 (相邻帧缩略图平均像素差占255的比例)
+            min_track_ratio: 光流成功跟踪的可见关键点比例低于该值时重新推理
+            match_iou: 关键帧检测与已有轨迹匹配的IoU阈值
+        """
+        self.keyframe_interval = keyframe_interval
+        self.scene_change_threshold = scene_change_threshold
+        self.min_track_ratio = min_track_ratio
+        self.match_iou = match_iou
+        self.tracks = []
+        self.frames = 0
+        self.keyframes = 0
+        self._ids = itertools.count(1)
+        self._prev_gray = None
+        self._prev_thumb = None
+        self._since_keyframe = 0
+
+    @staticmethod
+    def _prepare(image):
+        """转换为灰度图和用于检测画面突变的缩略图"""
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+        thumb = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+        return gray, thumb
+
+    def needs_keyframe(self, image):
+        """
+        判断当前帧是否需要运行完整推理
+        Args:
+            image: OpenCV格式的图像
+        Returns:
+            bool: 是否为关键帧
+        """
+        if self._prev_gray is None or self._since_keyframe >= self.keyframe_interval:
+            return True
+        if image.shape[:2] != self._prev_gray.shape[:2]:
+            return True
+        _, thumb = self._prepare(image)
+        change = float(np.abs(thumb - self._prev_thumb).mean()) / 255
+        return change > self.scene_change_threshold
+
+    def update_keyframe(self, image, boxes, scores, keypoints):
+        """
+        用关键帧的检测结果更新轨迹
+        检测结果按IoU从高到低贪心地与已有轨迹匹配，匹配上的沿用轨迹ID，其余分配新ID
+        Args:
+            image: OpenCV格式的图像
+            boxes: 边界框 (N, 4)
+            scores: 边界框置信度 (N,)
+            keypoints: 关键点 (N, 17, 3)
+        """
+        assigned = [None] * len(boxes)
+        if self.tracks and len(boxes):
+            iou = box_iou(np.array([t.box for t in self.tracks]), boxes)
+            for flat in np.argsort(-iou, axis=None):
+                t, d = np.unravel_index(flat, iou.shape)
+                if iou[t, d] < self.match_iou:
+                    break
+                if assigned[d] is None and self.tracks[t].track_id not in assigned:
+                    assigned[d] = self.tracks[t].track_id
+
+        self.tracks = [
+            Track(track_id if track_id is not None else next(self._ids),
+                  boxes[i].copy(), float(scores[i]), keypoints[i].copy())
+            for i, track_id in enumerate(assigned)
+        ]
+        self._prev_gray, self._prev_thumb = self._prepare(image)
+        self._since_keyframe = 1
+        self.frames += 1
+        self.keyframes += 1
+
+    def propagate(self, image):
+        """
+        用稀疏光流将上一帧的关键点传播到当前帧
+        Args:
+            image: OpenCV格式的图像
+        Returns:
+            bool: 跟踪是否可靠 (False表示应对当前帧运行完整推理，轨迹保持不变)
+        """
+        gray, thumb = self._prepare(image)
+        visible = [t.keypoints[:, 2] > VISIBLE_THRESHOLD for t in self.tracks]
+        points = [t.keypoints[mask, :2] for t, mask in zip(self.tracks, visible)]
+        total = sum(len(p) for p in points)
+
+        if total:
+            previous = np.concatenate(points).astype(np.float32).reshape(-1, 1, 2)
+            current, status, _ = cv2.calcOpticalFlowPyrLK(self._prev_gray, gray, previous, None, **LK_PARAMS)
+            # 反向光流校验: 反向跟踪回上一帧的位置偏差过大的点视为跟丢
+            backward, back_status, _ = cv2.calcOpticalFlowPyrLK(gray, self._prev_gray, current, None, **LK_PARAMS)
+            error = np.linalg.norm((previous - backward).reshape(-1, 2), axis=1)
+            tracked = (status.ravel() == 1) & (back_status.ravel() == 1) & (error < 1.0)
+            if tracked.sum() / total < self.min_track_ratio:
+                return False
+
+            current = current.reshape(-1, 2)
+            offset = 0
+            for track, mask in zip(self.tracks, visible):
+                count = int(mask.sum())
+                ok = tracked[offset:offset + count]
+                moved = current[offset:offset + count]
+                indices = np.flatnonzero(mask)
+                if ok.any():
+                    shift = np.median(moved[ok] - track.keypoints[indices[ok], :2], axis=0)
+                    track.box = track.box + np.array([shift[0], shift[1], shift[0], shift[1]], dtype=track.box.dtype)
+                track.keypoints[indices[ok], :2] = moved[ok]
+                # 跟丢的关键点置信度置零，不再绘制也不再跟踪
+                track.keypoints[indices[~ok], 2] = 0.0
+                offset += count
+
+        self._prev_gray, self._prev_thumb = gray, thumb
+        self._since_keyframe += 1
+        self.frames += 1
+        return True
+
+    def to_response(self, request_id):
+        """
+        将当前轨迹格式化为响应数据 (与 /api/pose 的格式一致，另外带有轨迹ID)
+        Returns:
+            dict: 响应数据
+        """
+        return {
+            "count": len(self.tracks),
+            "boxes": [
+                {
+                    "id": request_id,
+                    "track_id": t.track_id,
+                    "x": float(t.box[0]),
+                    "y": float(t.box[1]),
+                    "width": float(t.box[2] - t.box[0]),
+                    "height": float(t.box[3] - t.box[1]),
+                    "probability": float(t.score)
+                }
+                for t in self.tracks
+            ],
+            "keypoints": [t.keypoints.tolist() for t in self.tracks],
+            "track_ids": [t.track_id for t in self.tracks],
+        }
@@ -39,6 +39,7 @@ def test_and_save_image(image_path, server_url="http://localhost:60000"):
                 "id": "test-view",
                 "image": image_base64
             },
+            headers={"X-Request-Timeout-Ms": "60000"},  # 超时后服务端不再处理该请求
             timeout=60
         )
         
@@ -0,0 +1,334 @@
+"""
+API层与推理层之间的工作队列
+前端 (main.py) 负责HTTP解析、校验和解码，把压缩后的帧放入工作队列；独立的推理工作进程
+(inference_worker.py) 批量取出帧、运行PoseDetector，再把结果放回该前端的结果队列。
+队列后端可插拔:
+- inproc: 进程内队列，推理工作线程与前端在同一进程中 (单机调试)
+- manager: multiprocessing管理器提供的本地TCP队列服务 (单机多进程，相当于本地的Redis替身)
+- redis: Redis列表 (需要安装redis包)，前端和推理工作进程可以分别扩缩容
+manager后端的前端和推理工作进程在同一台机器上时，帧可以经共享内存传递 (见 shm_transport.py)。
+"""
+
+import asyncio
+import itertools
+import logging
+import os
+import pickle
+import queue
+import threading
+import time
+import uuid
+from multiprocessing.managers import BaseManager
+
+import cv2
+
+from metrics import metrics
+from scheduler import DeadlineExceeded
+from shm_transport import RingFull
+
+logger = logging.getLogger(__name__)
+
+TASK_KEY = "cloudpose:tasks"
+RESULT_KEY = "cloudpose:results:{}"
+
+
+class _LocalQueues:
+    """任务队列和按前端划分的结果队列 (inproc后端和manager服务端共用)"""
+
+    def __init__(self):
+        self.tasks = queue.Queue()
+        self._results = {}
+        self._lock = threading.Lock()
+
+    def results(self, frontend):
+        with self._lock:
+            if frontend not in self._results:
+                self._results[frontend] = queue.Queue()
+            return self._results[frontend]
+
+
+class QueueBackend:
+    """基于 queue.Queue 接口的后端 (inproc和manager)"""
+
+    def __init__(self, tasks, results):
+        """
+        Args:
+            tasks: 任务队列
+            results: 返回某个前端结果队列的函数
+        """
+        self._tasks = tasks
+        self._open_results = results
+        self._results_cache = {}
+
+    def _results(self, frontend):
+        """结果队列 (manager后端每次获取都会创建新的代理，因此缓存)"""
+        results = self._results_cache.get(frontend)
+        if results is None:
+            results = self._results_cache[frontend] = self._open_results(frontend)
+        return results
+
+    def put_task(self, task):
+        """放入一个任务"""
+        self._tasks.put(task)
+
+    def get_tasks(self, max_items, timeout):
+        """
+        批量取出任务: 阻塞等待第一个任务，再不等待地取出已到达的其余任务
+        Returns:
+            list: 任务列表，超时时为空
+        """
+        try:
+            tasks = [self._tasks.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while len(tasks) < max_items:
+            try:
+                tasks.append(self._tasks.get_nowait())
+            except queue.Empty:
+                break
+        return tasks
+
+    def put_result(self, frontend, result):
+        """把结果放回前端的结果队列"""
+        self._results(frontend).put(result)
+
+    def get_result(self, frontend, timeout):
+        """取出一个结果，超时返回None"""
+        try:
+            return self._results(frontend).get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+# inproc后端的队列，以及manager服务端进程中的队列
+_inproc = _LocalQueues()
+_server_queues = _LocalQueues()
+
+
+def _serve_tasks():
+    return _server_queues.tasks
+
+
+def _serve_results(frontend):
+    return _server_queues.results(frontend)
+
+
+class QueueManager(BaseManager):
+    """本地TCP队列服务"""
+
+
+QueueManager.register("tasks", callable=_serve_tasks)
+QueueManager.register("results", callable=_serve_results)
+
+
+def parse_address(address):
+    """解析 host:port 形式的地址"""
+    host, port = address.rsplit(":", 1)
+    return host, int(port)
+
+
+def serve_manager(address, authkey):
+    """
+    在当前进程中运行本地队列服务 (阻塞)
+    Args:
+        address: 监听地址 host:port
+        authkey: 认证密钥
+    """
+    manager = QueueManager(address=parse_address(address), authkey=authkey.encode())
+    server = manager.get_server()
+    logger.info(f"本地队列服务已启动: {address}")
+    server.serve_forever()
+
+
+def start_manager(address, authkey):
+    """在子进程中启动本地队列服务，返回管理器 (调用shutdown()停止)"""
+    manager = QueueManager(address=parse_address(address), authkey=authkey.encode())
+    manager.start()
+    logger.info(f"本地队列服务已启动: {address}")
+    return manager
+
+
+class RedisBackend:
+    """基于Redis列表的后端"""
+
+    def __init__(self, url, result_ttl=300):
+        """
+        Args:
+            url: Redis地址，如 redis://localhost:6379/0
+            result_ttl: 结果列表的过期时间(秒)，前端退出后遗留的结果会被自动清理
+        """
+        import redis
+
+        self._redis = redis.Redis.from_url(url)
+        self.result_ttl = result_ttl
+
+    def put_task(self, task):
+        self._redis.lpush(TASK_KEY, pickle.dumps(task, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def get_tasks(self, max_items, timeout):
+        item = self._redis.brpop(TASK_KEY, timeout=timeout)
+        if item is None:
+            return []
+        tasks = [pickle.loads(item[1])]
+        if max_items > 1:
+            rest = self._redis.rpop(TASK_KEY, max_items - 1) or []
+            tasks.extend(pickle.loads(data) for data in rest)
+        return tasks
+
+    def put_result(self, frontend, result):
+        key = RESULT_KEY.format(frontend)
+        pipeline = self._redis.pipeline()
+        pipeline.lpush(key, pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL))
+        pipeline.expire(key, self.result_ttl)
+        pipeline.execute()
+
+    def get_result(self, frontend, timeout):
+        item = self._redis.brpop(RESULT_KEY.format(frontend), timeout=timeout)
+        return pickle.loads(item[1]) if item is not None else None
+
+
+def open_queue(backend, address="", authkey="cloudpose"):
+    """
+    打开工作队列
+    Args:
+        backend: "inproc"、"manager" 或 "redis"
+        address: manager后端为 host:port，redis后端为Redis地址
+        authkey: manager后端的认证密钥
+    Returns:
+        队列后端
+    """
+    if backend == "inproc":
+        return QueueBackend(_inproc.tasks, _inproc.results)
+    if backend == "manager":
+        manager = QueueManager(address=parse_address(address), authkey=authkey.encode())
+        manager.connect()
+        return QueueBackend(manager.tasks(), manager.results)
+    if backend == "redis":
+        return RedisBackend(address)
+    raise ValueError(f"不支持的工作队列后端: {backend}")
+
+
+def compact_frame(image, max_side):
+    """
+    把帧缩小到推理分辨率，减小队列中传输的数据量
+    (模型本身会把图像缩放到imgsz，缩小到该尺寸不损失精度)
+    Returns:
+        frame: 缩小后的帧
+        scale: 原图尺寸 / 缩小后尺寸
+    """
+    height, width = image.shape[:2]
+    scale = max(height, width) / max_side
+    if scale <= 1:
+        return image, 1.0
+    frame = cv2.resize(image, (round(width / scale), round(height / scale)), interpolation=cv2.INTER_AREA)
+    return frame, scale
+
+
+class RemoteInference:
+    """前端侧: 把帧放入工作队列并等待推理工作进程返回结果"""
+
+    def __init__(self, work_queue, max_side=640, timeout=60.0, ring=None):
+        """
+        Args:
+            work_queue: 工作队列后端
+            max_side: 整图推理时帧的最长边 (超过时缩小后再放入队列)
+            timeout: 没有截止时间的请求最长等待时间(秒)
+            ring: 共享内存帧环 (shm_transport.FrameRing)，推理工作进程在同一台机器上时使用，
+                帧写入共享内存，队列中只传递槽位引用；槽位已满或帧过大时退回到直接传递帧
+        """
+        self.queue = work_queue
+        self.max_side = max_side
+        self.timeout = timeout
+        self.ring = ring
+        # 每个前端进程有自己的结果队列
+        self.frontend = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._ids = itertools.count()
+        self._pending = {}
+        self._loop = None
+
+    @property
+    def pending(self):
+        """已提交、尚未返回结果的请求数"""
+        return len(self._pending)
+
+    def start(self):
+        """启动结果分发线程 (须在事件循环中调用)"""
+        self._loop = asyncio.get_running_loop()
+        threading.Thread(target=self._dispatch, daemon=True, name="result-dispatch").start()
+
+    def _dispatch(self):
+        """结果分发线程: 从结果队列取出结果并唤醒等待的请求"""
+        while True:
+            try:
+                result = self.queue.get_result(self.frontend, timeout=1)
+            except Exception as e:
+                logger.error(f"读取结果队列失败: {e}")
+                time.sleep(1)
+                continue
+            if result is not None:
+                self._loop.call_soon_threadsafe(self._resolve, result)
+
+    def _resolve(self, result):
+        future = self._pending.pop(result["task_id"], None)
+        if future is not None and not future.done():
+            future.set_result(result)
+
+    async def infer(self, image, tiled=False, deadline=None):
+        """
+        提交一帧并等待推理结果
+        Args:
+            image: OpenCV格式的图像
+            tiled: 是否使用分块推理 (分块推理发送原始分辨率的帧)
+            deadline: 截止时间 (Unix时间戳，秒)
+        Returns:
+            (arrays, preprocess_time, inference_time, postprocess_time), queue_time
+            与 DetectorPool.run(run_pose_json, ...) 的返回值格式相同
+        """
+        from near_duplicate import rescale_arrays
+
+        frame, scale = (image, 1.0) if tiled else compact_frame(image, self.max_side)
+        task_id = next(self._ids)
+        future = self._loop.create_future()
+        self._pending[task_id] = future
+        task = {
+            "task_id": task_id,
+            "frontend": self.frontend,
+            "frame": frame,
+            "tiled": tiled,
+            "deadline": deadline,
+            "submitted": time.time(),
+        }
+        if self.ring is not None:
+            try:
+                task["frame_ref"] = self.ring.write(frame)
+                task["frame"] = None
+                metrics.inc("cloudpose_shm_frames_total", labels={"transport": "shm"})
+            except RingFull:
+                metrics.inc("cloudpose_shm_frames_total", labels={"transport": "queue"})
+        await self._loop.run_in_executor(None, self.queue.put_task, task)
+
+        timeout = self.timeout if deadline is None else max(0.0, deadline - time.time())
+        try:
+            result = await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self._pending.pop(task_id, None)
+            metrics.inc("cloudpose_remote_requests_total", labels={"outcome": "timeout"})
+            raise DeadlineExceeded("queue")
+
+        if result.get("error") == "deadline":
+            metrics.inc("cloudpose_remote_requests_total", labels={"outcome": "expired"})
+            raise DeadlineExceeded("queue")
+        if result.get("error"):
+            metrics.inc("cloudpose_remote_requests_total", labels={"outcome": "error"})
+            raise RuntimeError(result["error"])
+        metrics.inc("cloudpose_remote_requests_total", labels={"outcome": "ok"})
+        metrics.observe("cloudpose_remote_batch_size", result["batch_size"])
+
+        boxes, scores, keypoints = result["arrays"]
+        if scale != 1.0:
+            height, width = frame.shape[:2]
+            boxes, keypoints = rescale_arrays(
+                boxes, keypoints, (width, height), (image.shape[1], image.shape[0])
+            )
+        preprocess_time, inference_time, postprocess_time = result["timings"]
+        return ((boxes, scores, keypoints), preprocess_time, inference_time, postprocess_time), result["queue_time"]